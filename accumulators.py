@@ -0,0 +1,186 @@
+"""Накопители статистики фиксированного размера
+
+Накопитель хранит число значений, их сумму, сумму квадратов отклонений от
+среднего, число значений в заданных группах (например, 100% и 75-100%) и
+гистограмму с фиксированным шагом для медианы и процентилей. Память не зависит
+от числа строк; накопители блоков строк, листов и файлов объединяются.
+
+Сумма - обычная сумма float встроенной sum() в порядке добавления значений, как
+в исходном алгоритме (sum(список) / len(список)): при добавлении строк листа по
+порядку, в том числе блоками, средние совпадают с ним до последнего бита.
+Объединение двух накопителей коммутативно (a + b); при объединении нескольких
+накопителей сумма зависит от порядка объединения лишь в последних битах, поэтому
+части объединяются в фиксированном порядке (листы - в порядке книги), а не в
+порядке завершения процессов. Счетчики, группы, минимум, максимум и гистограмма
+объединяются точно при любом порядке.
+"""
+import math
+
+import numpy as np
+
+
+class QuantileSketch:
+    """Гистограмма с фиксированным шагом на отрезке [low, high]: квантили с точностью до шага
+
+    Значения вне отрезка учитываются отдельно (для них квантиль - наименьшее или
+    наибольшее значение). Объединение - сложение счетчиков, поэтому оно точное.
+    """
+
+    def __init__(self, low, high, step):
+        self.low = low
+        self.step = step
+        self.counts = np.zeros(int(round((high - low) / step)) + 1, dtype=np.int64)
+        self.below = 0
+        self.above = 0
+
+    def add(self, values):
+        with np.errstate(over='ignore'):
+            bins = np.rint((values - self.low) / self.step)
+        inside = (bins >= 0) & (bins < len(self.counts))
+        self.counts += np.bincount(bins[inside].astype(np.int64), minlength=len(self.counts))
+        self.below += int(np.count_nonzero(bins < 0))
+        self.above += int(np.count_nonzero(bins >= len(self.counts)))
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.below += other.below
+        self.above += other.above
+
+    def quantile(self, q, minimum, maximum):
+        """Значение с рангом ceil(q * n) (по правилу ближайшего ранга)"""
+        count = self.below + int(self.counts.sum()) + self.above
+        if not count:
+            return None
+        rank = max(1, math.ceil(q * count))
+        if rank <= self.below:
+            return minimum
+        rank -= self.below
+        cumulative = np.cumsum(self.counts)
+        if rank > cumulative[-1]:
+            return maximum
+        value = round(self.low + int(np.searchsorted(cumulative, rank)) * self.step, 10)
+        return min(max(value, minimum), maximum)
+
+
+class StatsAccumulator:
+    """Число, сумма и сумма квадратов отклонений, минимум и максимум, группы значений и гистограмма
+
+    buckets - {название группы: (нижняя, верхняя граница включительно)};
+    sketch - (low, high, step) гистограммы для квантилей.
+    """
+
+    def __init__(self, buckets=None, sketch=(0, 100, 0.1)):
+        self.buckets = dict(buckets or {})
+        self.count = 0
+        self.total = 0.0  # Сумма конечных значений в порядке добавления
+        self.squares = 0.0  # Сумма квадратов отклонений конечных значений от их среднего
+        self.nan_count = 0
+        self.positive_inf = 0
+        self.negative_inf = 0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.bucket_counts = {name: 0 for name in self.buckets}
+        self.sketch = QuantileSketch(*sketch)
+
+    def add(self, values):
+        """Добавляет массив значений"""
+        values = np.asarray(values, dtype=float)
+        if not len(values):
+            return
+        finite = values[np.isfinite(values)]
+        if len(finite):
+            mean = finite.mean()
+            # Встроенная sum() продолжает прежнюю сумму: значения складываются по порядку, как в исходном алгоритме
+            self.join(len(finite), mean, float(np.sum((finite - mean) ** 2)), sum(finite.tolist(), self.total))
+            self.minimum = min(self.minimum, float(finite.min()))
+            self.maximum = max(self.maximum, float(finite.max()))
+            for name, (low, high) in self.buckets.items():
+                self.bucket_counts[name] += int(np.count_nonzero((finite >= low) & (finite <= high)))
+            self.sketch.add(finite)
+        self.count += len(values)
+        if len(finite) < len(values):
+            self.nan_count += int(np.count_nonzero(np.isnan(values)))
+            self.positive_inf += int(np.count_nonzero(values == math.inf))
+            self.negative_inf += int(np.count_nonzero(values == -math.inf))
+
+    def join(self, count, mean, squares, total):
+        """Добавляет часть из count конечных значений со средним mean и суммой квадратов отклонений squares
+
+        total - сумма значений вместе с частью. Вызывается до обновления счетчиков.
+        """
+        finite_count = self.finite_count
+        if finite_count:
+            # Формула Чана и др. для объединения сумм квадратов отклонений (симметрична относительно частей)
+            delta = mean - self.total / finite_count
+            squares = self.squares + squares + delta * delta * (finite_count * count / (finite_count + count))
+        self.squares = squares
+        self.total = total
+
+    def merge(self, other):
+        """Добавляет данные другого накопителя (с теми же группами и гистограммой)"""
+        if other.finite_count:
+            self.join(other.finite_count, other.total / other.finite_count, other.squares, self.total + other.total)
+        self.count += other.count
+        self.nan_count += other.nan_count
+        self.positive_inf += other.positive_inf
+        self.negative_inf += other.negative_inf
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        for name, count in other.bucket_counts.items():
+            self.bucket_counts[name] = self.bucket_counts.get(name, 0) + count
+        self.sketch.merge(other.sketch)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def sum(self):
+        if self.nan_count or (self.positive_inf and self.negative_inf):
+            return math.nan
+        if self.positive_inf:
+            return math.inf
+        if self.negative_inf:
+            return -math.inf
+        return self.total
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+    @property
+    def std(self):
+        """Выборочное стандартное отклонение (None меньше чем для двух значений)"""
+        if self.count < 2:
+            return None
+        if self.count != self.finite_count:
+            return math.nan
+        return math.sqrt(self.squares / (self.count - 1))
+
+    @property
+    def finite_count(self):
+        return self.count - self.nan_count - self.positive_inf - self.negative_inf
+
+    def share(self, bucket):
+        """Доля значений группы в процентах"""
+        return self.bucket_counts[bucket] / self.count * 100 if self.count else 0
+
+    def quantile(self, q):
+        """Квантиль конечных значений с точностью до шага гистограммы"""
+        if not self.finite_count:
+            return None
+        return self.sketch.quantile(q, self.minimum, self.maximum)
+
+    def summary(self, scale=1):
+        """Разброс и процентили (значения умножаются на scale)"""
+        def scaled(value):
+            return None if value is None else value * scale
+
+        return {
+            'count': self.count,
+            'mean': scaled(self.mean),
+            'std': scaled(self.std),
+            'min': scaled(self.minimum) if self.finite_count else None,
+            'median': scaled(self.quantile(0.5)),
+            'p90': scaled(self.quantile(0.9)),
+            'max': scaled(self.maximum) if self.finite_count else None,
+        }
@@ -0,0 +1,545 @@
+"""Векторизованное ядро анализа отчетов ФЦМПО: все правила (rules.RULES) выполняются за один проход по листу"""
+import re
+
+import numpy as np
+import pandas as pd
+
+import accumulators
+import institutions
+import regions
+import rules
+
+# Районы встроенного справочника (по умолчанию анализ использует справочник regions.default_registry())
+DISTRICTS = regions.DEFAULT_DISTRICTS
+
+# Зарегистрированные типы анализа (правила rules.AnalysisRule по значениям переключателя analysis_var)
+ANALYSES = rules.RULES
+ALL_ANALYSES = rules.ALL_ANALYSES
+
+# Строка разброса по всем учреждениям региона
+REGION_TOTAL = 'ВСЕ УЧРЕЖДЕНИЯ РЕГИОНА'
+# Строки общих показателей по региону (доли значений по группам правила)
+REGION_SHARE = 'ОБЩИЙ ПОКАЗАТЕЛЬ ПО РЕГИОНУ ({})'
+
+# Типы столбцов, для которых float() заведомо не выбрасывает исключений
+_NUMERIC_KINDS = ('floating', 'integer', 'mixed-integer-float', 'empty')
+# Типы столбцов, в которых встречаются строки
+_TEXT_KINDS = ('string', 'mixed', 'mixed-integer')
+
+
+
+def _float_or_none(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+_float_or_none_vec = np.frompyfunc(_float_or_none, 1, 1)
+
+
+def is_categorical(column):
+    return isinstance(column.dtype, pd.CategoricalDtype)
+
+
+def by_category(column, values, missing):
+    """Значения, вычисленные для категорий столбца (values[i] - для i-й категории), по строкам столбца
+
+    Пустые ячейки (код -1) получают значение missing. Так текстовые проверки и
+    преобразования категориального столбца выполняются один раз на каждое различное значение.
+    """
+    values = np.asarray(values)
+    values = np.append(values, np.array([missing], dtype=values.dtype))
+    return values[column.cat.codes.to_numpy()]
+
+
+def to_float(values):
+    """Преобразует значения как float(), возвращает (значения, признак успешного преобразования)"""
+    values = pd.Series(values)
+    if is_categorical(values):
+        # Пустая ячейка (NaN) преобразуется успешно, как float(nan)
+        converted, ok = to_float(pd.Series(values.cat.categories, dtype=object))
+        return by_category(values, converted, np.nan), by_category(values, ok, True)
+    if pd.api.types.infer_dtype(values, skipna=True) in _NUMERIC_KINDS:
+        converted = pd.to_numeric(values).to_numpy(dtype=float)
+        return converted, np.ones(len(values), dtype=bool)
+
+    # Смешанные столбцы (текст, даты) разбираем поэлементно, как исходный алгоритм
+    converted = _float_or_none_vec(values.to_numpy(dtype=object))
+    ok = converted != None  # noqa: E711 - поэлементное сравнение массива
+    result = np.full(len(values), np.nan)
+    result[ok] = converted[ok].astype(float)
+    return result, ok
+
+
+def cell_strings(column):
+    """Текстовое представление ячеек столбца (пустые ячейки - пустая строка)"""
+    if is_categorical(column):
+        categories = cell_strings(pd.Series(column.cat.categories, dtype=object)).to_numpy(dtype=object)
+        return pd.Series(by_category(column, categories, ""), index=column.index, dtype=object)
+    return column.astype(str).where(column.notna(), "")
+
+
+def map_strings(column, func):
+    """func(текст ячеек) -> массив значений по строкам; у категориального столбца func получает
+    текст категорий и пустую строку (для пустых ячеек)"""
+    if is_categorical(column):
+        categories = cell_strings(pd.Series(column.cat.categories, dtype=object)).tolist()
+        values = np.asarray(func(pd.Series(categories + [""], dtype=object)))
+        return values[column.cat.codes.to_numpy()]
+    return np.asarray(func(cell_strings(column)))
+
+
+def keyword_hits(column, keyword):
+    """Ячейки-строки, содержащие keyword без учета регистра, или None, если строк в столбце нет"""
+    if is_categorical(column):
+        hits = keyword_hits(pd.Series(column.cat.categories, dtype=object), keyword)
+        return None if hits is None else by_category(column, hits, False)
+    if pd.api.types.infer_dtype(column, skipna=True) not in _TEXT_KINDS:
+        return None
+    lowered = column.str.lower()
+    if lowered.dtype != object:
+        # В столбце нет строковых значений
+        return None
+    try:
+        return lowered.str.contains(keyword, regex=False, na=False).to_numpy(dtype=bool)
+    except AttributeError:
+        # Строк нет, но есть другие объекты (например, даты и пропуски)
+        return None
+
+
+def find_header_columns(rows, keyword):
+    """Для каждой строки возвращает номер первого столбца, содержащего keyword (или -1)"""
+    found = np.full(len(rows), -1)
+    for j in range(rows.shape[1] - 1, -1, -1):
+        hit = keyword_hits(rows.iloc[:, j], keyword)
+        if hit is not None:
+            found[hit] = j
+    return found
+
+
+def district_blocks(labels, initial=None):
+    """Протягивает район вниз до начала следующего блока (initial до первого района)
+
+    labels - район строки по справочнику или None.
+    """
+    is_label = labels != None  # noqa: E711 - поэлементное сравнение массива
+    last_label = np.maximum.accumulate(np.where(is_label, np.arange(len(labels)), -1))
+    return np.where(last_label >= 0, labels[last_label], initial)
+
+
+def compliance_accumulator():
+    """Накопитель процентов соответствия меню (доли 100% и 75-100%, гистограмма)"""
+    return accumulators.StatsAccumulator(rules.COMPLIANCE_BUCKETS, rules.COMPLIANCE_SKETCH)
+
+
+def region_stats(stats):
+    """Доли организаций региона со 100% и 75-100% соответствием по накопителю"""
+    return {
+        'perfect_percentage': stats.share('100%'),
+        'good_percentage': stats.share('75-100%')
+    }
+
+
+def calculate_region_stats(compliance_data):
+    """Расчет статистики по региону"""
+    stats = compliance_accumulator()
+    stats.add(compliance_data)
+    return region_stats(stats)
+
+
+def spread_row(district, analysis_type, stats, scale=1):
+    """Строка разброса: число значений, среднее, отклонение, минимум, медиана, p90, максимум"""
+    row = {'district': district, 'analysis_type': analysis_type}
+    for key, value in stats.summary(scale).items():
+        row[key] = value if value is None or key == 'count' else round(value, 2)
+    return row
+
+
+class SheetChunk:
+    """Блок строк листа с вычислениями, общими для всех правил
+
+    Районы первого столбца, строки с датами и ключевыми словами, столбцы заголовков
+    и числа столбцов вычисляются при первом обращении одного из правил, остальные
+    правила берут готовый результат. Столбцы заголовков, районы в тексте и числа
+    вычисляются только для запрошенных строк (с дополнением при следующих запросах).
+    Строки до offset - последняя строка предыдущего блока: по ней ищется заголовок,
+    но строкой с данными она не считается.
+    """
+
+    def __init__(self, frame, registry, offset=0):
+        self.frame = frame
+        self.registry = registry
+        self.offset = offset
+        self.n_cols = frame.shape[1]
+        self.computed = {}
+
+    def once(self, key, compute):
+        if key not in self.computed:
+            self.computed[key] = compute()
+        return self.computed[key]
+
+    def by_rows(self, key, rows, compute, dtypes):
+        """Массивы значений по строкам блока, заполненные для строк rows
+
+        compute(номера строк) возвращает значения (по массиву на каждый тип из dtypes)
+        только для строк, которые еще не запрашивались с тем же key.
+        """
+        if key not in self.computed:
+            n_rows = len(self.frame)
+            self.computed[key] = ([np.zeros(n_rows, dtype=dtype) for dtype in dtypes], np.zeros(n_rows, dtype=bool))
+        fields, done = self.computed[key]
+        todo = np.unique(rows[~done[rows]])
+        if len(todo):
+            for field, values in zip(fields, compute(todo)):
+                field[todo] = values
+            done[todo] = True
+        return fields
+
+    def column(self, j):
+        return self.frame.iloc[:, j]
+
+    def data_positions(self, mask):
+        """Номера строк маски без строк предыдущего блока"""
+        positions = np.flatnonzero(mask)
+        return positions[positions >= self.offset]
+
+    def labels(self):
+        """Район по справочнику для строк с названием района в первом столбце (или None)"""
+        return self.once('labels', lambda: map_strings(self.column(0), self.registry.lookup))
+
+    def blocks(self, initial):
+        """Район каждой строки по блокам районов (initial - район, продолжающийся с предыдущего блока)"""
+        return self.once(('blocks', initial), lambda: district_blocks(self.labels(), initial))
+
+    def marker_rows(self, pattern):
+        """Строки, первый столбец которых начинается с соответствия регулярному выражению"""
+        return self.once(('marker', pattern), lambda: map_strings(
+            self.column(0), lambda strings: strings.str.match(pattern).to_numpy(dtype=bool)))
+
+    def keyword_rows(self, keywords):
+        """Непустые строки, первый столбец которых содержит одно из ключевых слов"""
+        def compute():
+            pattern = '|'.join(re.escape(keyword) for keyword in keywords)
+            first_col = self.column(0)
+            return first_col.notna().to_numpy() & map_strings(
+                first_col, lambda strings: strings.str.contains(pattern, regex=True).to_numpy(dtype=bool))
+        return self.once(('keywords', keywords), compute)
+
+    def found_districts(self, j, rows):
+        """Район, упомянутый в тексте столбца j (или None), заполненный для строк rows"""
+        def compute(todo):
+            return (map_strings(self.column(j).iloc[todo], self.registry.search),)
+        districts, = self.by_rows(('search', j), rows, compute, (object,))
+        return districts
+
+    def header_columns(self, keyword, rows):
+        """Номер первого столбца, содержащего keyword (или -1), заполненный для строк rows"""
+        columns, = self.by_rows(('header', keyword), rows,
+                                lambda todo: (find_header_columns(self.frame.iloc[todo], keyword),), (int,))
+        return columns
+
+    def numbers(self, j, rows):
+        """Числа столбца j (как float()) и признак непустого преобразуемого значения, заполненные для строк rows"""
+        def compute(todo):
+            column = self.column(j).iloc[todo]
+            values, ok = to_float(column)
+            return values, ok & column.notna().to_numpy()
+        return self.by_rows(('numbers', j), rows, compute, (float, bool))
+
+
+def locate_district_blocks(chunk, rows, current_district):
+    """Строки с данными в блоках районов (rules.DistrictBlocks)
+
+    Возвращает (номера строк, районы строк, найденные районы, район в конце блока строк).
+    """
+    block = chunk.blocks(current_district)
+    in_block = block != None  # noqa: E711 - поэлементное сравнение массива
+    positions = chunk.data_positions(chunk.marker_rows(rows.marker) & in_block)
+    return positions, block[positions], block[in_block], block[-1]
+
+
+def locate_institution_rows(chunk, rows, current_district):
+    """Строки учреждений с районом в отдельном столбце (rules.InstitutionRows)"""
+    if rows.district_column >= chunk.frame.shape[1]:
+        # На листе нет столбца района: строк учреждений с районом нет (лист другого отчета в режиме 'all')
+        districts = np.array([], dtype=object)
+        return np.array([], dtype=np.intp), districts, districts, current_district
+    positions = chunk.data_positions(chunk.keyword_rows(rows.keywords))
+    districts = chunk.found_districts(rows.district_column, positions)[positions]
+    has_district = districts != None  # noqa: E711 - поэлементное сравнение массива
+    positions, districts = positions[has_district], districts[has_district]
+    if len(districts):
+        current_district = districts[-1]
+    return positions, districts, districts, current_district
+
+
+# Поиск строк с данными по виду описания строк правила
+LOCATORS = {
+    rules.DistrictBlocks: locate_district_blocks,
+    rules.InstitutionRows: locate_institution_rows,
+}
+
+
+def find_values(chunk, positions, value):
+    """Значения строк positions по описанию столбца (rules.ValueColumn): (значения, признак найденного значения)"""
+    values = np.full(len(positions), np.nan)
+    found = np.zeros(len(positions), dtype=bool)
+    pending = np.ones(len(positions), dtype=bool)
+    if not len(positions):
+        return values, found
+
+    if value.header:
+        # Столбец по заголовку ищем в строке, непосредственно предшествующей строке с данными
+        header_cols = np.full(len(positions), -1)
+        prev_positions = positions[positions >= 1] - 1
+        header_cols[positions >= 1] = chunk.header_columns(value.header, prev_positions)[prev_positions]
+        for j in np.unique(header_cols[header_cols >= 0]):
+            rows = positions[header_cols == j]
+            numbers, ok = chunk.numbers(j, rows)
+            values[header_cols == j] = numbers[rows]
+            found[header_cols == j] = ok[rows]
+        pending = header_cols < 0
+
+    # Иначе - первое значение из допустимого диапазона в последних столбцах (первый столбец не просматривается)
+    low, high = value.value_range
+    columns = range(max(chunk.n_cols - value.trailing, 1), chunk.n_cols)
+    for j in (reversed(columns) if value.from_right else columns):
+        if not pending.any():
+            break
+        idx = np.flatnonzero(pending)
+        rows = positions[idx]
+        numbers, ok = chunk.numbers(j, rows)
+        candidates = numbers[rows]
+        hit = ok[rows] & (candidates >= low) & (candidates <= high)
+        values[idx[hit]] = candidates[hit]
+        found[idx[hit]] = True
+        pending[idx[hit]] = False
+    return values, found
+
+
+def column_requirements(analysis_type):
+    """Столбцы листа, которые использует анализ: (первых, последних, ключевые слова заголовков)
+
+    По ним при чтении пропускаются остальные столбцы (reader.read_needed_columns).
+    """
+    selected = rules.selected_rules(analysis_type)
+    return (max(rule.leading_columns for rule in selected),
+            max(rule.trailing_columns for rule in selected),
+            tuple(dict.fromkeys(keyword for rule in selected for keyword in rule.header_keywords)))
+
+
+class RuleAnalysis:
+    """Данные одного правила анализа, накопленные по блокам строк и листам"""
+
+    def __init__(self, rule, registry):
+        self.rule = rule
+        self.analysis_type = rule.analysis_type
+        self.districts = registry.names
+        self.found_districts = set()
+        self.record_counts = {}
+        self.value_stats = {}  # Накопители значений по районам
+        self.institution_parts = []  # (названия, районы, значения) учреждений по блокам строк
+        self.current_district = None
+
+    def accumulator(self):
+        return accumulators.StatsAccumulator(self.rule.buckets, self.rule.sketch)
+
+    @property
+    def scale(self):
+        """Множитель значений для показателя в процентах"""
+        return 1 if self.rule.percent_of is None else 100 / self.rule.percent_of
+
+    def update(self, chunk):
+        """Добавляет строки с данными блока строк (SheetChunk)"""
+        locate = LOCATORS[type(self.rule.rows)]
+        positions, row_districts, found, self.current_district = locate(chunk, self.rule.rows,
+                                                                        self.current_district)
+        self.found_districts.update(found)
+        values, has_value = find_values(chunk, positions, self.rule.value)
+        value_districts = row_districts[has_value]
+
+        counted = row_districts if self.rule.count_all_rows else value_districts
+        for district, count in pd.Series(counted, dtype=object).value_counts().items():
+            self.record_counts[district] = self.record_counts.get(district, 0) + int(count)
+        for district, district_values in pd.Series(values[has_value]).groupby(value_districts, sort=False):
+            if district not in self.value_stats:
+                self.value_stats[district] = self.accumulator()
+            self.value_stats[district].add(district_values.to_numpy())
+
+        if self.rule.institutions and has_value.any():
+            names = cell_strings(chunk.frame.iloc[positions[has_value], 0]).str.strip().to_numpy(dtype=object)
+            self.institution_parts.append((names, value_districts, values[has_value]))
+
+    def merge(self, other):
+        """Добавляет данные того же правила по другому листу (листы независимы, блоки районов не продолжаются)"""
+        self.found_districts.update(other.found_districts)
+        for district, count in other.record_counts.items():
+            self.record_counts[district] = self.record_counts.get(district, 0) + count
+        for district, stats in other.value_stats.items():
+            if district not in self.value_stats:
+                self.value_stats[district] = self.accumulator()
+            self.value_stats[district].merge(stats)
+        self.institution_parts.extend(other.institution_parts)
+
+    def region_accumulator(self):
+        """Накопитель всех значений региона (объединение накопителей районов)"""
+        region = self.accumulator()
+        for stats in self.value_stats.values():
+            region.merge(stats)
+        return region
+
+    def district_score(self, district):
+        """Показатель района: среднее значений (в процентах от percent_of правила)"""
+        if district not in self.value_stats:
+            return 0
+        mean = self.value_stats[district].mean
+        if self.rule.percent_of is None:
+            return mean
+        return mean / self.rule.percent_of * 100
+
+    def results(self):
+        """Показатели по районам и доли групп значений по региону (если правило задает группы)"""
+        results = []
+        for district in self.districts:
+            if district in self.found_districts:
+                record_count = self.record_counts.get(district, 0)
+                if record_count > 0:
+                    results.append({
+                        'district': district,
+                        'score': round(self.district_score(district), 2),
+                        'record_count': record_count,
+                        'analysis_type': self.analysis_type
+                    })
+            else:
+                # Добавляем район с нулевыми результатами, если он не найден
+                results.append({
+                    'district': district,
+                    'score': 0.0,
+                    'record_count': 0,
+                    'analysis_type': self.analysis_type
+                })
+
+        # Сортируем по показателю (от лучшего к худшему), общие показатели по региону - в конце
+        results.sort(key=lambda x: x['score'], reverse=True)
+        if self.rule.buckets:
+            region = self.region_accumulator()
+            for bucket in self.rule.buckets:
+                results.append({
+                    'district': REGION_SHARE.format(bucket),
+                    'score': round(region.share(bucket), 2),
+                    'record_count': region.count,
+                    'analysis_type': self.analysis_type,
+                    'is_region_total': True,
+                    'category': bucket
+                })
+        return results
+
+    def statistics(self):
+        """Разброс и процентили показателя по районам (и по региону, если правило задает группы)"""
+        rows = [spread_row(district, self.analysis_type, self.value_stats[district], self.scale)
+                for district in self.districts if district in self.value_stats]
+        if self.rule.buckets:
+            rows.append(spread_row(REGION_TOTAL, self.analysis_type, self.region_accumulator(), self.scale))
+        return rows
+
+    def institution_index(self):
+        """Указатель учреждений, вошедших в расчет, для детализации по районам"""
+        return institutions.InstitutionIndex.from_parts(self.institution_parts, self.districts)
+
+
+class RuleEngine:
+    """Общее ядро анализа: правила выполняются за один проход по блокам строк листа
+
+    Каждый блок строк разбирается один раз (SheetChunk), правила берут из него свои
+    строки и значения. Для типа анализа выполняется его правило, для режима 'all' -
+    все зарегистрированные.
+    """
+
+    def __init__(self, analysis_type, districts=None):
+        self.analysis_type = analysis_type
+        # Общий справочник для всех правил
+        self.registry = regions.as_registry(districts)
+        self.analyses = [RuleAnalysis(rule, self.registry) for rule in rules.selected_rules(analysis_type)]
+        # Заголовок столбца значения ищется в предыдущей строке, в том числе в конце предыдущего блока
+        self.keep_last_row = any(analysis.rule.value.header for analysis in self.analyses)
+        self.last_row = None
+
+    @property
+    def current_district(self):
+        return next((analysis.current_district for analysis in self.analyses if analysis.current_district), None)
+
+    @property
+    def collects_institutions(self):
+        return any(analysis.rule.institutions for analysis in self.analyses)
+
+    def update(self, chunk):
+        """Добавляет очередной блок строк листа во все правила"""
+        if chunk.empty:
+            return
+        frame, offset = chunk, 0
+        if self.last_row is not None:
+            frame, offset = pd.concat([self.last_row, chunk], ignore_index=True), 1
+        sheet_chunk = SheetChunk(frame, self.registry, offset)
+        for analysis in self.analyses:
+            analysis.update(sheet_chunk)
+        if self.keep_last_row:
+            self.last_row = frame.iloc[[-1]]
+
+    def merge(self, other):
+        """Добавляет данные анализа другого листа в каждое правило"""
+        for analysis, other_analysis in zip(self.analyses, other.analyses):
+            analysis.merge(other_analysis)
+
+    def institution_index(self):
+        """Указатель учреждений первого правила, которое их собирает (или None)"""
+        return next((analysis.institution_index() for analysis in self.analyses if analysis.rule.institutions),
+                    None)
+
+    def statistics(self):
+        """Разброс и процентили всех правил одним списком"""
+        return [row for analysis in self.analyses for row in analysis.statistics()]
+
+    def results_by_type(self):
+        """Результаты каждого правила в его собственном формате"""
+        return {analysis.analysis_type: analysis.results() for analysis in self.analyses}
+
+    def results(self):
+        """Результаты всех правил одним списком (строки различаются по analysis_type)"""
+        return [result for analysis in self.analyses for result in analysis.results()]
+
+
+def create_engine(analysis_type, districts=None):
+    """Алгоритм анализа по значению переключателя (или все анализы для режима 'all')"""
+    return RuleEngine(analysis_type, districts)
+
+
+def institution_index(engine):
+    """Указатель учреждений алгоритма или None, если алгоритм не собирает учреждения"""
+    if engine is None:
+        return None
+    return engine.institution_index()
+
+
+def analyze(df, analysis_type, districts=None):
+    """Анализ целого листа выбранным алгоритмом"""
+    engine = create_engine(analysis_type, districts)
+    engine.update(df)
+    return engine.results()
+
+
+def analyze_all(df, districts=None):
+    """Все зарегистрированные анализы за один проход по листу: {тип анализа: результаты}"""
+    engine = create_engine(ALL_ANALYSES, districts)
+    engine.update(df)
+    return engine.results_by_type()
+
+
+def analyze_score5(df, districts=None):
+    """Анализ балла нормированного к 5"""
+    return analyze(df, 'score5', districts)
+
+
+def analyze_menu_compliance(df, districts=None):
+    """Анализ соответствия типовому меню с расчетом общего процента по регионам"""
+    return analyze(df, 'menu_compliance', districts)
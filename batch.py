@@ -0,0 +1,114 @@
+"""Пакетный анализ папки с отчетами в пуле процессов"""
+import glob
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import analysis
+import reader
+import regions
+
+# Названия месяцев (основы слов) для определения периода по имени файла
+MONTHS = {
+    'январ': 1, 'феврал': 2, 'март': 3, 'апрел': 4, 'май': 5, 'мая': 5, 'июн': 6,
+    'июл': 7, 'август': 8, 'сентябр': 9, 'октябр': 10, 'ноябр': 11, 'декабр': 12,
+}
+
+PERIOD_PATTERNS = [
+    re.compile(r'(?P<year>20\d{2})[-_.](?P<month>0?[1-9]|1[0-2])(?!\d)'),
+    re.compile(r'(?<!\d)(?P<month>0?[1-9]|1[0-2])[-_.](?P<year>20\d{2})'),
+]
+MONTH_NAME_PATTERN = re.compile(r'(?P<name>[а-яё]+)\s*[-_ ]?\s*(?P<year>20\d{2})', re.IGNORECASE)
+
+
+def file_period(file_path):
+    """Период отчета (ГГГГ-ММ) по имени файла, иначе имя файла без расширения"""
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    for pattern in PERIOD_PATTERNS:
+        match = pattern.search(name)
+        if match:
+            return f"{match.group('year')}-{int(match.group('month')):02d}"
+
+    for match in MONTH_NAME_PATTERN.finditer(name):
+        word = match.group('name').lower()
+        for stem, month in MONTHS.items():
+            if word.startswith(stem):
+                return f"{match.group('year')}-{month:02d}"
+    return name
+
+
+def collect_files(source):
+    """Список файлов .xlsx из папки или по шаблону glob"""
+    if os.path.isdir(source):
+        pattern = os.path.join(source, '*.xlsx')
+    else:
+        pattern = source
+    # Временные файлы Excel (~$отчет.xlsx) пропускаем
+    return sorted(path for path in glob.glob(pattern) if not os.path.basename(path).startswith('~$'))
+
+
+def analyze_one(file_path, analysis_type, districts=None, use_cache=True):
+    """Анализ одного файла (выполняется в дочернем процессе)"""
+    df = reader.read_sheet(file_path, analysis_type, use_cache)
+    return analysis.analyze(df, analysis_type, districts)
+
+
+class BatchResult:
+    """Объединенные результаты пакета и ошибки по отдельным файлам"""
+
+    def __init__(self, file_paths):
+        self.file_paths = list(file_paths)
+        self.file_results = {}  # Результаты по файлам
+        self.errors = []  # (файл, текст ошибки)
+        self.files_done = 0
+
+    @property
+    def results(self):
+        """Общая таблица: строки всех файлов с полями period и source_file, файлы по периодам"""
+        order = sorted(enumerate(self.file_paths), key=lambda item: (file_period(item[1]), item[0]))
+        combined = []
+        for _, file_path in order:
+            if file_path not in self.file_results:
+                continue
+            period = file_period(file_path)
+            for result in self.file_results[file_path]:
+                combined.append(dict(result, period=period, source_file=os.path.basename(file_path)))
+        return combined
+
+
+def run_batch(file_paths, analysis_type, districts=None, max_workers=None,
+              progress=None, cancelled=None, use_cache=True):
+    """Анализирует файлы параллельно; ошибка в одном файле не прерывает пакет
+
+    progress(обработано файлов, всего, файл) вызывается после каждого файла,
+    cancelled() позволяет прервать ожидание оставшихся файлов.
+    """
+    batch = BatchResult(file_paths)
+    if not file_paths:
+        return batch
+    # Справочник передается в дочерние процессы целиком (с синонимами и индексами)
+    districts = regions.as_registry(districts)
+
+    max_workers = max_workers or min(len(file_paths), os.cpu_count() or 1)
+    executor = ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {
+            executor.submit(analyze_one, path, analysis_type, districts, use_cache): path
+            for path in file_paths
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                batch.file_results[path] = future.result()
+            except Exception as e:
+                batch.errors.append((path, str(e)))
+            batch.files_done += 1
+
+            if progress is not None:
+                progress(batch.files_done, len(file_paths), path)
+            if cancelled is not None and cancelled():
+                break
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    return batch
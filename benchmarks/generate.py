@@ -0,0 +1,101 @@
+"""Генератор синтетических отчетов ФЦМПО для замеров производительности
+
+Примеры:
+    python benchmarks/generate.py score5 100000 -o benchmarks/data/score5_100000.xlsx
+    python benchmarks/generate.py menu_compliance 1000000
+"""
+import argparse
+import os
+import random
+import sys
+
+from openpyxl import Workbook
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis import DISTRICTS  # noqa: E402
+from rules import INSTITUTION_KEYWORDS  # noqa: E402
+
+# Папка для сгенерированных файлов (не хранится в репозитории)
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+# Ширина листа: реальные выгрузки содержат много служебных столбцов
+SCORE5_COLUMNS = 12
+MENU_COLUMNS = 10
+# Количество строк с датами в блоке района
+SCORE5_BLOCK_ROWS = 30
+
+
+def score5_rows(n_rows, seed=0):
+    """Строки отчета по баллу: название района, строка заголовков, строки с датами"""
+    rng = random.Random(seed)
+    header = ["Дата"] + [f"Показатель {j}" for j in range(1, SCORE5_COLUMNS - 2)] + \
+             ["Балл нормированный к5", "Примечание"]
+    produced = 0
+    while produced < n_rows:
+        yield [rng.choice(DISTRICTS)]
+        yield header
+        produced += 2
+        for _ in range(min(SCORE5_BLOCK_ROWS, n_rows - produced)):
+            date = f"{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.2024"
+            values = [rng.randint(0, 500) for _ in range(SCORE5_COLUMNS - 3)]
+            yield [date] + values + [round(rng.uniform(0, 5), 2), None]
+            produced += 1
+
+
+def menu_rows(n_rows, seed=0):
+    """Строки отчета по меню: учреждение, район, служебные столбцы, процент соответствия"""
+    rng = random.Random(seed)
+    yield ["Учреждение", "Район"] + [f"Столбец {j}" for j in range(2, MENU_COLUMNS - 2)] + \
+          ["Комментарий", "Соответствие типовому меню, %"]
+    for i in range(1, n_rows):
+        keyword = rng.choice(INSTITUTION_KEYWORDS)
+        district = rng.choice(DISTRICTS)
+        compliance = rng.choice([100, 100, rng.randint(75, 100), rng.randint(0, 100)])
+        yield [f'{keyword} "Образовательное учреждение №{i}"', f"{district} муниципальный район"] + \
+              [rng.randint(0, 1000) for _ in range(MENU_COLUMNS - 4)] + [None, compliance]
+
+
+GENERATORS = {
+    'score5': score5_rows,
+    'menu_compliance': menu_rows,
+}
+
+
+def generate(layout, n_rows, file_path, seed=0):
+    """Записывает синтетический отчет в режиме write-only (память не зависит от числа строк)"""
+    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    for row in GENERATORS[layout](n_rows, seed):
+        sheet.append(row)
+    workbook.save(file_path)
+    return file_path
+
+
+def data_path(layout, n_rows):
+    return os.path.join(DATA_DIR, f"{layout}_{n_rows}.xlsx")
+
+
+def ensure_dataset(layout, n_rows):
+    """Путь к сгенерированному отчету (создается при первом обращении)"""
+    file_path = data_path(layout, n_rows)
+    if not os.path.exists(file_path):
+        generate(layout, n_rows, file_path)
+    return file_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Генерация синтетических отчетов ФЦМПО")
+    parser.add_argument('layout', choices=sorted(GENERATORS))
+    parser.add_argument('rows', type=int, help="Количество строк (от 1000 до 1000000)")
+    parser.add_argument('-o', '--output', help="Файл .xlsx (по умолчанию benchmarks/data/<тип>_<строк>.xlsx)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    file_path = generate(args.layout, args.rows, args.output or data_path(args.layout, args.rows), args.seed)
+    print(file_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""Замеры производительности этапов анализа на синтетических отчетах
+
+Каждый этап выполняется в отдельном процессе, чтобы пиковая память (RSS)
+относилась только к нему. Результаты можно сохранить как базовые и сравнивать
+с ними следующие версии.
+
+Примеры:
+    python benchmarks/run.py --rows 1000 10000 100000 --save-baseline v1
+    python benchmarks/run.py --rows 100000 --compare v1
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+# Допустимое замедление относительно базовых замеров
+DEFAULT_TOLERANCE = 0.2
+
+
+def peak_rss_mb():
+    """Пиковый объем памяти текущего процесса (МБ)"""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset / 2 ** 20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux возвращает КБ, macOS - байты
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def load_sheet(file_path, analysis_type):
+    import reader
+    return reader.read_sheet(file_path, analysis_type)
+
+
+def stage_read_excel(file_path, analysis_type):
+    import pandas as pd
+    start = time.perf_counter()
+    df = pd.read_excel(file_path, header=None)
+    return time.perf_counter() - start, len(df)
+
+
+def stage_read_columns(file_path, analysis_type):
+    import analysis
+    import reader
+    start = time.perf_counter()
+    df = reader.read_needed_columns(file_path, analysis.column_requirements(analysis_type))
+    return time.perf_counter() - start, len(df)
+
+
+def stage_stream_read(file_path, analysis_type):
+    import reader
+    stream = reader.SheetStream(file_path)
+    start = time.perf_counter()
+    rows = sum(1 for _ in stream.rows())
+    return time.perf_counter() - start, rows
+
+
+def stage_analyze(file_path, analysis_type):
+    import analysis
+    df = load_sheet(file_path, analysis_type)
+    start = time.perf_counter()
+    analysis.analyze(df, analysis_type)
+    return time.perf_counter() - start, len(df)
+
+
+def stage_stream_analysis(file_path, analysis_type):
+    import reader
+    start = time.perf_counter()
+    for rows, engine in reader.stream_analysis(file_path, analysis_type):
+        pass
+    engine.results()
+    return time.perf_counter() - start, rows
+
+
+def stage_chart_pdf(file_path, analysis_type):
+    import tempfile
+    import analysis
+    import charts
+    results = analysis.analyze(load_sheet(file_path, analysis_type), analysis_type)
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        charts.create_chart_pdf(results, analysis_type, os.path.join(directory, 'chart.pdf'))
+        return time.perf_counter() - start, len(results)
+
+
+def stage_window_import(file_path, analysis_type):
+    """Запуск интерпретатора и импорт модулей окна программы (без модулей анализа)"""
+    import subprocess
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'import main'], cwd=ROOT, check=True)
+    return time.perf_counter() - start, 0
+
+
+STAGES = {
+    'read_excel': stage_read_excel,
+    'read_columns': stage_read_columns,
+    'stream_read': stage_stream_read,
+    'analyze': stage_analyze,
+    'stream_analysis': stage_stream_analysis,
+    'chart_pdf': stage_chart_pdf,
+    'window_import': stage_window_import,
+}
+
+
+def run_stage(stage, file_path, analysis_type, results_queue):
+    import warnings
+    warnings.simplefilter('ignore')
+    wall, rows = STAGES[stage](file_path, analysis_type)
+    results_queue.put({'wall': wall, 'rows': rows, 'peak_rss_mb': peak_rss_mb()})
+
+
+def measure(stage, file_path, analysis_type):
+    """Выполняет этап в отдельном процессе и возвращает замер"""
+    context = multiprocessing.get_context('spawn')
+    results_queue = context.Queue()
+    process = context.Process(target=run_stage, args=(stage, file_path, analysis_type, results_queue))
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        raise RuntimeError(f"этап {stage} завершился с кодом {process.exitcode}")
+    record = results_queue.get()
+    record['rows_per_sec'] = record['rows'] / record['wall'] if record['wall'] else None
+    return record
+
+
+def record_key(stage, analysis_type, n_rows):
+    return f"{stage}/{analysis_type}/{n_rows}"
+
+
+def baseline_path(name):
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def compare(records, baseline, tolerance):
+    """Этапы, замедлившиеся относительно базовых замеров больше чем на tolerance"""
+    regressions = []
+    for key, record in records.items():
+        base = baseline.get(key)
+        if base and record['wall'] > base['wall'] * (1 + tolerance):
+            regressions.append((key, base['wall'], record['wall']))
+    return regressions
+
+
+def main(argv=None):
+    import generate
+
+    parser = argparse.ArgumentParser(description="Замеры производительности анализа отчетов")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help="Размеры синтетических отчетов (строк)")
+    parser.add_argument('--types', nargs='+', default=sorted(generate.GENERATORS), choices=sorted(generate.GENERATORS))
+    parser.add_argument('--stages', nargs='+', default=list(STAGES), choices=list(STAGES))
+    parser.add_argument('--save-baseline', metavar='NAME', help="Сохранить замеры как базовые")
+    parser.add_argument('--compare', metavar='NAME', help="Сравнить с сохраненными базовыми замерами")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    records = {}
+    print(f"{'этап':<45} {'время, с':>10} {'строк/с':>12} {'пик RSS, МБ':>12}")
+    for analysis_type in args.types:
+        for n_rows in args.rows:
+            file_path = generate.ensure_dataset(analysis_type, n_rows)
+            for stage in args.stages:
+                key = record_key(stage, analysis_type, n_rows)
+                record = measure(stage, file_path, analysis_type)
+                records[key] = record
+                rss = f"{record['peak_rss_mb']:.0f}" if record['peak_rss_mb'] is not None else "н/д"
+                print(f"{key:<45} {record['wall']:>10.3f} {record['rows_per_sec'] or 0:>12.0f} {rss:>12}",
+                      flush=True)
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(baseline_path(args.save_baseline), 'w', encoding='utf-8') as f:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+        print(f"Базовые замеры сохранены: {baseline_path(args.save_baseline)}")
+
+    if args.compare:
+        with open(baseline_path(args.compare), encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(records, baseline, args.tolerance)
+        for key, before, after in regressions:
+            print(f"ЗАМЕДЛЕНИЕ {key}: {before:.3f} с -> {after:.3f} с")
+        if regressions:
+            return 1
+        print("Замедлений относительно базовых замеров нет")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,31 +1,30 @@
 # -*- mode: python ; coding: utf-8 -*-
+import sys
+
+# Библиотеки, которые программа не использует (общий список с main.spec)
+sys.path.insert(0, SPECPATH)
+from build_excludes import EXCLUDES  # noqa: E402
 
 block_cipher = None
 
 a = Analysis(
-    ['your_script.py'],  # замените на имя вашего файла
+    ['main.py'],
     pathex=[],
     binaries=[],
-    datas=[
-        ('C:/Python310/Lib/site-packages/pandas/lib/*', 'pandas/lib/'),
-        ('C:/Python310/Lib/site-packages/pandas/_libs/*', 'pandas/_libs/')
-    ],
+    # Библиотеки pandas собираются его хуком PyInstaller
+    datas=[('regions.json', '.')],
+    # Модули анализа импортируются внутри функций главного окна (после его появления)
     hiddenimports=[
-        'pandas',
-        'pandas._libs.tslibs.timedeltas',
-        'pandas._libs.tslibs.nattype',
-        'pandas._libs.tslibs.np_datetime',
-        'tkinter',
-        'matplotlib.backends.backend_tkagg',
-        'matplotlib.pyplot',
-        'openpyxl',
-        'openpyxl.worksheet',
-        'openpyxl.chart'
+        'worker',
+        'institutions',
+        'charts',
+        'matplotlib.backends.backend_agg',
+        'matplotlib.backends.backend_pdf',
     ],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=EXCLUDES,
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
@@ -34,20 +33,28 @@ a = Analysis(
 
 pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
 
+# Сборка в папку без UPX: библиотеки не распаковываются при каждом запуске
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.zipfiles,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='DistrictAnalyzer',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
+    upx=False,
     console=False,  # Измените на True если нужна консоль для отладки
     icon=None,  # Можете добавить иконку .ico файл
 )
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.zipfiles,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='DistrictAnalyzer',
+)
@@ -0,0 +1,16 @@
+"""Библиотеки, которые программа не использует: общий список исключений сборки PyInstaller
+(main.spec и build.spec)
+
+Сборщик добавляет их, если они установлены, а pandas и matplotlib подключают их только при наличии.
+"""
+EXCLUDES = [
+    # Необязательные зависимости pandas (pyarrow нужен для сохранения в Parquet)
+    'numexpr', 'bottleneck', 'tables', 'sqlalchemy', 'psycopg2', 'pymysql',
+    'xlsxwriter', 'odf', 'pyxlsb', 'python_calamine', 'fsspec', 's3fs', 'gcsfs', 'jinja2',
+    'pandas.io.formats.style', 'pandas.tests', 'numpy.tests', 'numpy.f2py', 'numpy.distutils', 'openpyxl.tests',
+    # Окна и блокноты (диаграммы строятся без окон, backend Agg)
+    'IPython', 'ipykernel', 'jupyter_client', 'notebook', 'PyQt5', 'PyQt6', 'PySide2', 'PySide6', 'wx',
+    'gi', 'matplotlib.backends.backend_qtagg', 'matplotlib.backends.backend_qt5agg',
+    'matplotlib.backends.backend_tkagg', 'matplotlib.backends.backend_gtk3agg', 'matplotlib.backends.backend_wxagg',
+    'matplotlib.tests', 'scipy', 'sympy', 'pytest', 'lib2to3', 'tkinter.test',
+]
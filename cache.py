@@ -0,0 +1,179 @@
+"""Кэш разобранных книг Excel на локальном диске
+
+Ключ записи - хэш содержимого файла и параметров чтения, поэтому измененный
+файл автоматически получает новую запись. Лист хранится как pickle DataFrame
+(блоки столбцов pandas): листы отчетов содержат столбцы смешанных типов
+(текст, числа, даты), которые другие форматы без потерь не сохраняют.
+Старые записи удаляются по давности использования при превышении общего размера.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+import pandas as pd
+
+# Версия формата записей (увеличивается при изменении правил чтения)
+CACHE_VERSION = 2
+# Предельный общий размер кэша по умолчанию
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+# Размер блока чтения при вычислении хэша
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def default_cache_dir():
+    """Папка кэша: переменная DISTRICT_ANALYZER_CACHE_DIR или локальная папка пользователя"""
+    directory = os.environ.get('DISTRICT_ANALYZER_CACHE_DIR')
+    if directory:
+        return directory
+    base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'district_analyzer', 'parse_cache')
+
+
+def file_digest(file_path):
+    """Хэш содержимого файла"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """Кэш DataFrame, полученных из файлов Excel, с вытеснением давно не использованных записей"""
+
+    def __init__(self, directory=None, max_bytes=MAX_CACHE_BYTES):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self._digests = {}  # Путь -> ((размер, время изменения), хэш содержимого)
+
+    def file_digest(self, file_path):
+        """Хэш содержимого файла; пока размер и время изменения прежние, файл не читается повторно
+        (ключи нескольких записей одного файла)"""
+        stat = os.stat(file_path)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        known = self._digests.get(file_path)
+        if known is not None and known[0] == signature:
+            return known[1]
+        digest = file_digest(file_path)
+        self._digests[file_path] = (signature, digest)
+        return digest
+
+    def key(self, file_path, **read_options):
+        """Ключ записи: хэш содержимого файла и параметров чтения"""
+        options = dict(read_options, cache_version=CACHE_VERSION, pandas=pd.__version__)
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(self.file_digest(file_path).encode())
+        digest.update(json.dumps(options, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key):
+        """Возвращает сохраненный DataFrame или None"""
+        path = self.entry_path(key)
+        try:
+            df = pd.read_pickle(path)
+        except Exception:
+            # Отсутствующая или поврежденная запись - читаем файл заново
+            return None
+        # Отмечаем использование записи для вытеснения по давности
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return df
+
+    def put(self, key, df):
+        """Сохраняет DataFrame (запись через временный файл, чтобы не оставлять поврежденных записей)"""
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            df.to_pickle(temp_path)
+            os.replace(temp_path, self.entry_path(key))
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self.evict()
+
+    def entries(self):
+        """Записи кэша: (время последнего использования, размер, путь)"""
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith('.pkl'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        """Удаляет давно не использованные записи, пока общий размер превышает max_bytes"""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+_default_cache = None
+
+
+def default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ParseCache()
+    return _default_cache
+
+
+def lookup_frame(file_path, cache=None, **read_options):
+    """DataFrame из кэша по файлу и параметрам чтения или None"""
+    cache = cache or default_cache()
+    return cache.get(cache.key(file_path, **read_options))
+
+
+def store_frame(file_path, df, cache=None, **read_options):
+    """Сохраняет DataFrame в кэш по файлу и параметрам чтения"""
+    cache = cache or default_cache()
+    try:
+        cache.put(cache.key(file_path, **read_options), df)
+    except OSError:
+        # Недоступная папка кэша не должна мешать анализу
+        pass
+
+
+def cached_frame(file_path, load, cache=None, **read_options):
+    """DataFrame из кэша по файлу и параметрам чтения или load() с сохранением в кэш"""
+    cache = cache or default_cache()
+    key = cache.key(file_path, **read_options)
+    df = cache.get(key)
+    if df is None:
+        df = load()
+        try:
+            cache.put(key, df)
+        except OSError:
+            # Недоступная папка кэша не должна мешать анализу
+            pass
+    return df
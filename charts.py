@@ -0,0 +1,229 @@
+"""Диаграммы результатов анализа в PDF
+
+Все диаграммы сохраняются в один многостраничный отчет: по странице на каждый
+тип анализа и период. Рисование идет через Figure/Agg без pyplot, поэтому
+отчет можно строить в фоновом потоке.
+"""
+import matplotlib
+
+# Диаграммы только сохраняются в файл, интерактивный backend не нужен
+matplotlib.use('Agg')
+
+import matplotlib.style  # noqa: E402 - после выбора backend
+from matplotlib.backends.backend_agg import FigureCanvasAgg  # noqa: E402
+from matplotlib.backends.backend_pdf import PdfPages  # noqa: E402
+from matplotlib.figure import Figure  # noqa: E402
+
+import rules  # noqa: E402
+
+# Компоновки страниц: размер фигуры и сетка осей (компоновку страницы типа анализа задает rules.AnalysisRule.chart)
+PAGE_LAYOUTS = {
+    'bars': ((12, 8), (1, 1)),
+    'menu_compliance': ((15, 12), (2, 2)),
+    'trend': ((12, 8), (1, 1)),
+}
+
+# Количество линий (районов) на одной странице динамики
+TRENDS_PER_PAGE = 6
+
+
+def create_chart_pdf(results, analysis_type, pdf_path):
+    """Создает PDF с диаграммами (для совмещенного и пакетного анализа - по странице на тип и период)"""
+    pages = [page for page in report_pages(results, analysis_type) if page_has_data(page[2], page[1])]
+    if not pages:
+        return
+
+    with matplotlib.style.context('dark_background'):
+        writer = ReportWriter(pdf_path)
+        try:
+            for period, page_type, page_results in pages:
+                writer.add_page(page_results, page_type, period)
+        finally:
+            writer.close()
+
+
+def report_pages(results, analysis_type):
+    """Страницы отчета: (период или None, тип анализа, результаты) в порядке следования результатов"""
+    groups = {}
+    for result in results:
+        key = (result.get('period'), result.get('analysis_type', analysis_type))
+        groups.setdefault(key, []).append(result)
+    return [(period, page_type, page_results) for (period, page_type), page_results in groups.items()]
+
+
+def page_has_data(results, analysis_type):
+    """Есть ли в результатах данные для диаграммы"""
+    is_total = [r.get('is_region_total', False) for r in results]
+    if rules.RULES[analysis_type].chart == 'bars':
+        # Столбчатая диаграмма строится по районам, без общих показателей по региону
+        return not all(is_total)
+    return any(is_total)
+
+
+class ReportWriter:
+    """Многостраничный PDF; фигура каждой компоновки создается один раз и очищается между страницами"""
+
+    def __init__(self, pdf_path):
+        self.pdf = PdfPages(pdf_path)
+        self.figures = {}  # Компоновка -> (фигура, оси)
+
+    def page_figure(self, layout):
+        if layout not in self.figures:
+            figsize, (nrows, ncols) = PAGE_LAYOUTS[layout]
+            fig = Figure(figsize=figsize)
+            FigureCanvasAgg(fig)
+            axes = fig.subplots(nrows, ncols, squeeze=False).ravel()
+            self.figures[layout] = (fig, axes)
+        else:
+            fig, axes = self.figures[layout]
+            for ax in axes:
+                ax.clear()
+        return self.figures[layout]
+
+    def add_page(self, results, analysis_type, period=None):
+        rule = rules.RULES[analysis_type]
+        fig, axes = self.page_figure(rule.chart)
+        if rule.chart == 'bars':
+            draw_bar_chart(axes[0], results, period, rule.chart_title)
+        else:
+            draw_menu_compliance_chart(axes, results, period)
+        self.save_page(fig)
+
+    def add_trend_page(self, trends, title):
+        fig, axes = self.page_figure("trend")
+        draw_trend_chart(axes[0], trends, title)
+        self.save_page(fig)
+
+    def save_page(self, fig):
+        fig.tight_layout()
+        self.pdf.savefig(fig, bbox_inches='tight')
+
+    def close(self):
+        self.pdf.close()
+        self.figures.clear()
+
+
+def create_trend_chart_pdf(trends, title, pdf_path):
+    """PDF с динамикой показателей по периодам из истории результатов ({район: [(период, показатель, ...)]})"""
+    districts = [district for district, points in trends.items() if points]
+    if not districts:
+        return
+
+    with matplotlib.style.context('dark_background'):
+        writer = ReportWriter(pdf_path)
+        try:
+            for start in range(0, len(districts), TRENDS_PER_PAGE):
+                page_districts = districts[start:start + TRENDS_PER_PAGE]
+                writer.add_trend_page({district: trends[district] for district in page_districts}, title)
+        finally:
+            writer.close()
+
+
+def period_title(title, period):
+    return f"{title} ({period})" if period else title
+
+
+def draw_bar_chart(ax, results, period=None, title=rules.RULES['score5'].chart_title):
+    """Столбчатая диаграмма показателя по районам (по умолчанию - балла нормированного к 5)"""
+    # Исключаем общие показатели по региону из диаграммы
+    chart_data = [r for r in results if not r.get('is_region_total', False)]
+
+    # Подготовка данных
+    districts = [r['district'] for r in chart_data]
+    scores = [r['score'] for r in chart_data]
+
+    colors = ['#3a7ca5' if score == max(scores) else '#5e5e5e' for score in scores]
+
+    bars = ax.barh(districts, scores, color=colors, alpha=0.8)
+
+    ax.set_xlabel('Показатель (%)', fontsize=12)
+    ax.set_title(period_title(title, period), fontsize=14, pad=20)
+
+    # Добавление значений на диаграмму
+    for bar, score in zip(bars, scores):
+        width = bar.get_width()
+        ax.text(width + 1, bar.get_y() + bar.get_height()/2,
+               f'{score}%', ha='left', va='center', fontsize=10)
+
+
+def draw_menu_compliance_chart(axes, results, period=None):
+    """Два круга по региону, диаграмма по районам и сводка для соответствия типовому меню"""
+    ax1, ax2, ax3, ax4 = axes
+    # Получаем общие показатели по региону
+    region_data = [r for r in results if r.get('is_region_total', False)]
+
+    # Первый круг - 100% соответствие
+    perfect_percentage = next((r['score'] for r in region_data if r.get('category') == '100%'), 0)
+    perfect_sizes = [perfect_percentage, 100 - perfect_percentage]
+    perfect_colors = ['#2e7d32', '#5e5e5e']  # зеленый и серый
+    perfect_labels = ['100% соответствие', 'Не 100% соответствие']
+
+    wedges1, texts1, autotexts1 = ax1.pie(perfect_sizes, colors=perfect_colors, autopct='%1.1f%%',
+                                         startangle=90, shadow=True)
+    ax1.set_title(period_title('100% соответствие типовому меню', period), fontsize=14, pad=20)
+    ax1.legend(wedges1, perfect_labels, loc="center left", bbox_to_anchor=(0.9, 0, 0.5, 1))
+
+    # Второй круг - 75-100% соответствие
+    good_percentage = next((r['score'] for r in region_data if r.get('category') == '75-100%'), 0)
+    good_sizes = [good_percentage, 100 - good_percentage]
+    good_colors = ['#3a7ca5', '#5e5e5e']  # синий и серый
+    good_labels = ['75-100% соответствие', 'Менее 75%']
+
+    wedges2, texts2, autotexts2 = ax2.pie(good_sizes, colors=good_colors, autopct='%1.1f%%',
+                                        startangle=90, shadow=True)
+    ax2.set_title(period_title('75-100% соответствие типовому меню', period), fontsize=14, pad=20)
+    ax2.legend(wedges2, good_labels, loc="center left", bbox_to_anchor=(0.9, 0, 0.5, 1))
+
+    # Третий график - столбчатая диаграмма по районам
+    district_data = [r for r in results if not r.get('is_region_total', False)]
+
+    if district_data:
+        districts = [r['district'] for r in district_data]
+        scores = [r['score'] for r in district_data]
+
+        colors_bar = ['#3a7ca5' if score == max(scores) else '#5e5e5e' for score in scores]
+
+        bars = ax3.barh(districts, scores, color=colors_bar, alpha=0.8)
+        ax3.set_xlabel('Средний процент соответствия (%)', fontsize=12)
+        ax3.set_title('Соответствие по районам', fontsize=14, pad=20)
+
+        # Добавление значений на диаграмму
+        for bar, score in zip(bars, scores):
+            width = bar.get_width()
+            ax3.text(width + 1, bar.get_y() + bar.get_height()/2,
+                   f'{score}%', ha='left', va='center', fontsize=9)
+
+    # Четвертый график - сводная информация
+    ax4.axis('off')
+    summary_text = f"""
+    СВОДНАЯ ИНФОРМАЦИЯ ПО РЕГИОНУ:
+
+
+
+    100% соответствие: {perfect_percentage}%
+    75-100% соответствие: {good_percentage}%
+
+    Лучший район: {max(district_data, key=lambda x: x['score'])['district'] if district_data else 'Н/Д'}
+    Худший район: {min(district_data, key=lambda x: x['score'])['district'] if district_data else 'Н/Д'}
+    """
+
+    ax4.text(0.1, 0.9, summary_text, fontsize=12, va='top',
+            bbox=dict(boxstyle="round", facecolor='#3d3d3d', alpha=0.7))
+
+
+def draw_trend_chart(ax, trends, title):
+    """Линии показателей районов по периодам"""
+    # Общая ось периодов: у районов могут отсутствовать отдельные периоды
+    periods = sorted({point[0] for points in trends.values() for point in points})
+    positions = {period: i for i, period in enumerate(periods)}
+
+    for district, points in trends.items():
+        ax.plot([positions[point[0]] for point in points], [point[1] for point in points],
+                marker='o', label=district)
+
+    ax.set_xticks(range(len(periods)))
+    ax.set_xticklabels(periods, rotation=45, ha='right')
+    ax.set_ylabel('Показатель (%)', fontsize=12)
+    ax.set_title(f"{title}: динамика по периодам", fontsize=14, pad=20)
+    ax.grid(alpha=0.3)
+    ax.legend(loc='best', fontsize=9)
@@ -0,0 +1,426 @@
+"""Консольный режим без графического интерфейса
+
+Примеры:
+    python main.py analyze --type score5 отчет.xlsx -o результаты.xlsx
+    python main.py analyze --type menu_compliance отчеты/ -o сводка.xlsx --pdf сводка.pdf
+    python main.py analyze --type score5 сводная.xlsx --all-sheets --by-sheet
+    python main.py watch --type score5 отчет.xlsx -o результаты.xlsx --interval 60
+    python main.py history --type score5 --district Грозный --months 24 --pdf динамика.pdf
+    python main.py history --quarterly 100%
+    python main.py history --type menu_compliance -o динамика.csv
+    python main.py analyze --type menu_compliance отчет.xlsx -o учреждения.xlsx --institutions
+    python main.py analyze --type score5 отчеты/ --output-dir результаты --format csv -j 4
+    python main.py serve --port 8765 --workers 4
+    python main.py analyze --type score5 отчет.xlsx --service http://127.0.0.1:8765
+"""
+import argparse
+import os
+import sys
+
+import rules
+
+# Типы анализа (зарегистрированные правила, как в переключателе графического интерфейса);
+# all - все анализы за один проход
+ANALYSIS_TYPES = tuple(rules.RULES) + (rules.ALL_ANALYSES,)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='main.py', description="Анализ отчетов ФЦМПО по районам")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    analyze = commands.add_parser('analyze', help="Анализ файла, нескольких файлов или папки")
+    analyze.add_argument('inputs', nargs='+', help="Файлы .xlsx/.xls, папки или шаблоны glob")
+    analyze.add_argument('--type', dest='analysis_type', choices=ANALYSIS_TYPES, default='score5',
+                         help="Тип анализа (по умолчанию score5)")
+    analyze.add_argument('-o', '--output',
+                         help="Файл результатов .xlsx, .csv или .parquet (по умолчанию таблица выводится на экран)")
+    analyze.add_argument('--output-dir', metavar='DIR',
+                         help="Сохранить результаты каждого файла в отдельный файл в папке DIR (параллельно)")
+    analyze.add_argument('--format', dest='output_format', choices=('xlsx', 'csv', 'parquet'), default='xlsx',
+                         help="Формат файлов --output-dir (по умолчанию xlsx)")
+    analyze.add_argument('--institutions', action='store_true',
+                         help="Добавить в файл результатов список учреждений (соответствие меню, один файл)")
+    analyze.add_argument('--pdf', help="Сохранить диаграмму в PDF")
+    analyze.add_argument('--stream', action='store_true', help="Потоковое чтение больших файлов .xlsx")
+    analyze.add_argument('--no-cache', dest='use_cache', action='store_false',
+                         help="Не использовать кэш разобранных книг")
+    analyze.add_argument('-j', '--jobs', type=int, default=None,
+                         help="Число процессов для пакетного анализа (по умолчанию по числу ядер)")
+    analyze.add_argument('--all-sheets', action='store_true',
+                         help="Анализировать все листы книги с объединением результатов по районам")
+    analyze.add_argument('--sheet', dest='sheets', action='append',
+                         help="Анализировать указанный лист книги (можно указать несколько раз)")
+    analyze.add_argument('--by-sheet', action='store_true', help="Вывести также результаты по листам")
+    analyze.add_argument('--stats', action='store_true',
+                         help="Вывести разброс по районам: отклонение, медиану и 90-й процентиль")
+    add_registry_arguments(analyze)
+    analyze.add_argument('--no-history', dest='record_history', action='store_false',
+                         help="Не сохранять результаты в историю")
+    analyze.add_argument('--timings', action='store_true', help="Вывести время этапов анализа")
+    analyze.add_argument('--profile', action='store_true',
+                         help="Сохранить профиль cProfile запуска в папку журналов")
+    analyze.add_argument('--service', nargs='?', const='', metavar='URL',
+                         help="Выполнить анализ одного файла в локальном сервисе "
+                              "(по умолчанию адрес из DISTRICT_ANALYZER_SERVICE)")
+
+    watch = commands.add_parser('watch', help="Наблюдение за файлом: новые строки добавляются в результаты")
+    watch.add_argument('input', help="Файл .xlsx")
+    watch.add_argument('--type', dest='analysis_type', choices=ANALYSIS_TYPES, default='score5',
+                       help="Тип анализа (по умолчанию score5)")
+    watch.add_argument('-o', '--output', help="Файл результатов .xlsx, .csv или .parquet, обновляемый при изменениях")
+    watch.add_argument('--pdf', help="PDF с диаграммой, обновляемый при изменениях")
+    watch.add_argument('--interval', type=float, default=30, help="Период проверки файла в секундах")
+    add_registry_arguments(watch)
+    watch.add_argument('--no-history', dest='record_history', action='store_false',
+                       help="Не сохранять результаты в историю")
+
+    serve = commands.add_parser('serve', help="Локальный сервис анализа (HTTP, результаты в JSON)")
+    serve.add_argument('--host', default='127.0.0.1', help="Адрес (по умолчанию только локальный 127.0.0.1)")
+    serve.add_argument('--port', type=int, default=8765, help="Порт (по умолчанию 8765)")
+    serve.add_argument('--workers', type=int, default=None,
+                       help="Число процессов анализа (по умолчанию по числу ядер)")
+    serve.add_argument('--max-pending', type=int, default=16,
+                       help="Предельное число заданий в работе и в очереди (сверх него ответ 503)")
+    add_registry_arguments(serve)
+
+    history = commands.add_parser('history', help="Динамика показателей по сохраненной истории результатов")
+    history.add_argument('--type', dest='analysis_type', choices=tuple(rules.RULES), default='score5',
+                         help="Тип анализа (по умолчанию score5)")
+    history.add_argument('--district', help="Только указанный район")
+    history.add_argument('--months', type=int, help="Только последние N периодов")
+    history.add_argument('--quarterly', metavar='CATEGORY', choices=('100%', '75-100%'),
+                         help="Доля учреждений региона в категории соответствия меню по кварталам")
+    history.add_argument('--pdf', help="Сохранить диаграмму динамики в PDF")
+    history.add_argument('-o', '--output', help="Сохранить динамику в файл .xlsx, .csv или .parquet")
+    history.add_argument('--db', help="Файл базы истории (по умолчанию в папке пользователя)")
+    return parser
+
+
+def add_registry_arguments(parser):
+    parser.add_argument('--regions', dest='regions_file',
+                        help="Файл справочника районов JSON (по умолчанию regions.json)")
+    parser.add_argument('--region', dest='regions', action='append',
+                        help="Регион из справочника (можно указать несколько раз; по умолчанию все)")
+
+
+def load_registry(args):
+    import regions
+    return regions.load_registry(args.regions_file, args.regions)
+
+
+def expand_inputs(inputs):
+    """Раскрывает папки и шаблоны glob в список файлов"""
+    import batch
+
+    file_paths = []
+    for source in inputs:
+        if os.path.isfile(source):
+            file_paths.append(source)
+        else:
+            file_paths.extend(batch.collect_files(source))
+    return file_paths
+
+
+def analyze_single(file_path, analysis_type, stream=False, use_cache=True, timer=None, districts=None):
+    """Анализ одного файла в текущем процессе; возвращает алгоритм с накопленными данными"""
+    import analysis
+    import timing
+
+    timer = timer or timing.RunTimer(analysis_type, file_path)
+    if stream and file_path.lower().endswith('.xlsx'):
+        import reader
+        for _, engine in reader.stream_analysis(file_path, analysis_type, districts, timer=timer):
+            pass
+        return engine
+
+    with timer.stage('чтение') as stage:
+        import reader
+        df = reader.read_sheet(file_path, analysis_type, use_cache)
+        stage.rows = len(df)
+    timer.add_footprint('таблица', *reader.frame_memory(df))
+    with timer.stage('анализ', len(df)):
+        engine = analysis.create_engine(analysis_type, districts)
+        engine.update(df)
+        return engine
+
+
+def print_results(results):
+    for result in results:
+        district = result['district']
+        if 'period' in result:
+            district = f"{result['period']} — {district}"
+        if 'sheet' in result:
+            district = f"{result['sheet']} — {district}"
+        print(f"{district:<45} {result['score']:>8}% {result['record_count']:>8}")
+
+
+def print_statistics(statistics):
+    print(f"{'Район':<45} {'N':>6} {'Среднее':>8} {'Откл.':>8} {'Мин.':>8} {'Медиана':>8} {'p90':>8} {'Макс.':>8}")
+    for row in statistics:
+        values = (f"{'-' if row[key] is None else row[key]:>8}"
+                  for key in ('mean', 'std', 'min', 'median', 'p90', 'max'))
+        print(f"{row['district']:<45} {row['count']:>6} {' '.join(values)}")
+
+
+def run_analyze(args):
+    import timing
+
+    file_paths = expand_inputs(args.inputs)
+    if not file_paths:
+        print("Ошибка: не найдено ни одного файла для анализа", file=sys.stderr)
+        return 2
+
+    multi_sheet = args.all_sheets or bool(args.sheets)
+    if multi_sheet and len(file_paths) != 1:
+        print("Ошибка: листы книги выбираются только при анализе одного файла", file=sys.stderr)
+        return 2
+    if args.institutions and (len(file_paths) != 1 or args.service is not None):
+        print("Ошибка: список учреждений сохраняется только при анализе одного файла без сервиса", file=sys.stderr)
+        return 2
+    if args.output:
+        # Неподдерживаемый формат файла результатов обнаруживается до анализа
+        import export
+        export.check_format(args.output)
+
+    if args.service is not None:
+        if len(file_paths) != 1:
+            print("Ошибка: в сервис передается только один файл", file=sys.stderr)
+            return 2
+        return run_analyze_service(args, file_paths[0], multi_sheet)
+
+    districts = load_registry(args)
+    timer = timing.RunTimer(args.analysis_type, file_paths[0] if len(file_paths) == 1 else None)
+    errors = []
+    sheet_results = None
+    statistics = None
+    engine = None
+    with timing.profiled(args.profile, args.analysis_type):
+        if multi_sheet:
+            import sheets
+            with timer.stage('листы') as stage:
+                workbook = sheets.run_sheets(file_paths[0], args.analysis_type, districts, args.sheets,
+                                             max_workers=args.jobs, use_cache=args.use_cache)
+                stage.rows = workbook.sheets_done
+            engine, errors = workbook.merged_engine(), workbook.errors
+            results, statistics = engine.results(), engine.statistics()
+            sheet_results = workbook.sheet_results
+        elif len(file_paths) == 1:
+            engine = analyze_single(file_paths[0], args.analysis_type, args.stream, args.use_cache, timer,
+                                    districts)
+            results, statistics = engine.results(), engine.statistics()
+        else:
+            import batch
+            with timer.stage('пакет', len(file_paths)):
+                result = batch.run_batch(file_paths, args.analysis_type, districts, max_workers=args.jobs,
+                                         use_cache=args.use_cache)
+            results, errors = result.results, result.errors
+
+        for source, error in errors:
+            where = "листе" if multi_sheet else "файле"
+            print(f"Ошибка в {where} {source}: {error}", file=sys.stderr)
+
+        if args.record_history:
+            import history
+            if len(file_paths) == 1:
+                history.record_results(results, file_paths[0])
+            else:
+                for file_path, file_results in result.file_results.items():
+                    history.record_results(file_results, file_path)
+
+        if args.output:
+            import analysis
+            import export
+            institution_index = analysis.institution_index(engine) if args.institutions else None
+            if args.institutions and institution_index is None:
+                print("Список учреждений собирается только анализом соответствия меню", file=sys.stderr)
+            with timer.stage('сохранение', len(results)):
+                export.save_results(results, args.output, sheet_results, statistics, institution_index)
+        else:
+            print_results(results)
+            if args.by_sheet and sheet_results:
+                print()
+                print_results([result for result in sheet_results if result['record_count']])
+            if args.stats and statistics:
+                print()
+                print_statistics(statistics)
+
+        if args.pdf:
+            # matplotlib загружается только при запросе диаграммы
+            with timer.stage('диаграмма', len(results)):
+                import charts
+                charts.create_chart_pdf(results, args.analysis_type, args.pdf)
+
+        if args.output_dir:
+            file_results = result.file_results if engine is None else {file_paths[0]: results}
+            with timer.stage('файлы результатов', len(file_results)):
+                errors = errors + export_per_file(file_results, args.output_dir, args.output_format, args.jobs)
+
+    timer.log()
+    if args.timings:
+        print(f"Время этапов: {timer.summary()}", file=sys.stderr)
+    return 1 if errors else 0
+
+
+def export_per_file(file_results, output_dir, output_format, max_workers=None):
+    """Результаты каждого файла - в отдельный файл папки output_dir (параллельно); возвращает ошибки"""
+    import export
+
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = []
+    used = set()
+    for file_path, results in file_results.items():
+        stem = os.path.splitext(os.path.basename(file_path))[0]
+        # Одинаковые имена файлов из разных папок не перезаписывают друг друга
+        name, number = stem, 1
+        while name.lower() in used:
+            number += 1
+            name = f"{stem}_{number}"
+        used.add(name.lower())
+        jobs.append((export.result_tables(results), os.path.join(output_dir, f"{name}.{output_format}")))
+
+    _, errors = export.export_many(jobs, max_workers)
+    for path, error in errors:
+        print(f"Ошибка при сохранении {path}: {error}", file=sys.stderr)
+    return errors
+
+
+def run_analyze_service(args, file_path, multi_sheet):
+    """Анализ файла в локальном сервисе; история сохраняется сервисом"""
+    import service
+
+    client = service.ServiceClient(args.service or None)
+    sheets = (args.sheets or 'all') if multi_sheet else None
+    response = client.analyze(file_path, args.analysis_type, sheets, args.record_history)
+    results, sheet_results, statistics = response['results'], response['sheet_results'], response['statistics']
+    for source, error in response['errors']:
+        print(f"Ошибка в листе {source}: {error}", file=sys.stderr)
+
+    if args.output:
+        import export
+        export.save_results(results, args.output, sheet_results, statistics)
+    else:
+        print_results(results)
+        if args.by_sheet and sheet_results:
+            print()
+            print_results([result for result in sheet_results if result['record_count']])
+        if args.stats and statistics:
+            print()
+            print_statistics(statistics)
+
+    if args.pdf:
+        import charts
+        charts.create_chart_pdf(results, args.analysis_type, args.pdf)
+
+    errors = response['errors']
+    if args.output_dir:
+        errors = errors + export_per_file({file_path: results}, args.output_dir, args.output_format)
+
+    if args.timings:
+        timings = ", ".join(f"{stage['stage']} {stage['seconds']:.2f} с" for stage in response['timings'])
+        print(f"Время этапов (сервис): {timings}", file=sys.stderr)
+    return 1 if errors else 0
+
+
+def run_serve(args):
+    import service
+
+    def ready(server):
+        host, port = server.server_address[:2]
+        print(f"Сервис анализа запущен: http://{host}:{port} (процессов: {server.service.workers}); "
+              f"остановка - Ctrl+C", flush=True)
+
+    try:
+        service.serve(args.host, args.port, load_registry(args), args.workers, args.max_pending, ready)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def run_watch(args):
+    import time
+    import history
+    import watch
+
+    incremental = watch.IncrementalAnalysis(args.input, args.analysis_type, load_registry(args))
+    last_fingerprint = None
+    try:
+        while True:
+            rows_before = incremental.rows_consumed
+            mode = incremental.refresh()
+            if mode != watch.UNCHANGED:
+                results = incremental.results()
+                if args.record_history:
+                    history.record_results(results, args.input)
+                if args.output:
+                    import export
+                    # Те же таблицы, что при обычном сохранении: результаты и разброс по районам
+                    export.save_results(results, args.output, statistics=incremental.engine.statistics())
+                else:
+                    print_results(results)
+                if args.pdf:
+                    # Диаграмма перестраивается, только если изменились результаты
+                    import export
+                    fingerprint = export.results_fingerprint(results, args.analysis_type)
+                    if fingerprint != last_fingerprint:
+                        import charts
+                        charts.create_chart_pdf(results, args.analysis_type, args.pdf)
+                        last_fingerprint = fingerprint
+
+                added = incremental.rows_consumed - rows_before
+                kind = "новые строки" if mode == watch.INCREMENTAL else "полный пересчет"
+                print(f"{time.strftime('%H:%M:%S')} {kind}: строк {added:+d}, всего {incremental.rows_consumed}",
+                      flush=True)
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        return 0
+
+
+def run_history(args):
+    import history
+
+    with history.HistoryStore(args.db) as store:
+        if args.quarterly:
+            for quarter, share, record_count in store.region_share_by_quarter(args.quarterly):
+                print(f"{quarter:<10} {share:>8}% {record_count:>8}")
+            return 0
+
+        if args.district:
+            trends = {args.district: store.district_trend(args.district, args.analysis_type, args.months)}
+        else:
+            trends = store.trends(args.analysis_type, args.months)
+
+    if not any(trends.values()):
+        print("В истории нет результатов по запросу", file=sys.stderr)
+        return 1
+
+    if args.output:
+        import export
+        rows = [{'period': period, 'district': district, 'score': score, 'record_count': record_count}
+                for district, points in trends.items() for period, score, record_count in points]
+        export.export_tables([(export.HISTORY_SHEET, rows)], args.output)
+    else:
+        for district, points in trends.items():
+            for period, score, record_count in points:
+                print(f"{period:<12} {district:<45} {score:>8}% {record_count:>8}")
+
+    if args.pdf:
+        import charts
+        charts.create_trend_chart_pdf(trends, rules.RULES[args.analysis_type].title, args.pdf)
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        if args.command == 'analyze':
+            return run_analyze(args)
+        if args.command == 'watch':
+            return run_watch(args)
+        if args.command == 'history':
+            return run_history(args)
+        if args.command == 'serve':
+            return run_serve(args)
+    except Exception as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+    return 0
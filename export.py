@@ -0,0 +1,255 @@
+"""Сохранение результатов анализа в файлы
+
+Набор результатов - список таблиц (название, таблица), где таблица - список словарей
+(строки результатов) или DataFrame (например, список учреждений). Формат файла
+определяется расширением:
+
+    .xlsx    - по листу на таблицу; openpyxl в режиме write_only пишет строки потоком,
+               не держа в памяти ячейки всей книги
+    .csv     - по файлу на таблицу (первая - в указанный файл, остальные - рядом с ним),
+               разделитель ";" и кодировка UTF-8 с BOM, как ожидает Excel
+    .parquet - по файлу на таблицу, как для .csv (нужен пакет pyarrow)
+
+Несколько наборов сохраняются в разные файлы параллельно функцией export_many.
+"""
+import csv
+import hashlib
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import institutions
+
+# Название листа основной таблицы (как у pandas.DataFrame.to_excel)
+RESULTS_SHEET = 'Sheet1'
+SHEET_RESULTS_SHEET = 'По листам'
+STATISTICS_SHEET = 'Разброс'
+INSTITUTIONS_SHEET = 'Учреждения'
+HISTORY_SHEET = 'Динамика'
+
+FORMATS = ('.xlsx', '.csv', '.parquet')
+CSV_DELIMITER = ';'
+CSV_ENCODING = 'utf-8-sig'
+# Строк на листе Excel (с заголовком); длинная таблица продолжается на следующих листах
+EXCEL_MAX_ROWS = 1048576
+# Длина названия листа Excel
+EXCEL_MAX_TITLE = 31
+# Строки DataFrame преобразуются для записи блоками, а не целиком
+FRAME_CHUNK_ROWS = 50000
+
+
+def cell_value(value):
+    """Значение ячейки: числа numpy - числа Python, NaN - пустая ячейка, бесконечность - текст"""
+    if value is None or isinstance(value, (str, bool, int)):
+        return value
+    if isinstance(value, float):
+        if math.isnan(value):
+            return None
+        return value if math.isfinite(value) else str(value)
+    if isinstance(value, np.generic):
+        return cell_value(value.item())
+    if isinstance(value, (list, tuple, dict, set)):
+        return str(value)
+    return value
+
+
+def frame_rows(df):
+    """Строки DataFrame кортежами значений ячеек"""
+    for start in range(0, len(df), FRAME_CHUNK_ROWS):
+        chunk = df.iloc[start:start + FRAME_CHUNK_ROWS]
+        columns = []
+        for _, column in chunk.items():
+            values = column.to_numpy(dtype=object)
+            if column.dtype.kind == 'f':
+                # Пропуски и бесконечности числовых столбцов заменяются сразу для всего блока
+                numbers = column.to_numpy()
+                values[np.isnan(numbers)] = None
+                values[np.isposinf(numbers)] = 'inf'
+                values[np.isneginf(numbers)] = '-inf'
+            elif column.dtype.kind == 'O':
+                values = [cell_value(value) for value in values]
+            elif column.hasnans:
+                values[column.isna().to_numpy()] = None
+            columns.append(values)
+        yield from zip(*columns)
+
+
+def table_rows(table):
+    """(названия столбцов, строки-кортежи) таблицы; столбцы списка словарей - в порядке появления ключей"""
+    if isinstance(table, pd.DataFrame):
+        return [str(column) for column in table.columns], frame_rows(table)
+    columns = list(dict.fromkeys(key for row in table for key in row))
+    return columns, (tuple(cell_value(row.get(column)) for column in columns) for row in table)
+
+
+def companion_path(file_path, name):
+    """Файл дополнительной таблицы рядом с основным: отчет.csv -> отчет_по_листам.csv"""
+    stem, extension = os.path.splitext(file_path)
+    return f"{stem}_{name.lower().replace(' ', '_')}{extension}"
+
+
+def table_paths(tables, file_path):
+    """Файлы таблиц для форматов с одной таблицей в файле"""
+    return [file_path if number == 0 else companion_path(file_path, name)
+            for number, (name, _) in enumerate(tables)]
+
+
+def write_xlsx(tables, file_path):
+    """Книга Excel с листом на таблицу (запись потоком, режим write_only)"""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    workbook = Workbook(write_only=True)
+    bold = Font(bold=True)
+    for name, table in tables:
+        columns, rows = table_rows(table)
+
+        def new_sheet(part):
+            title = name if part == 1 else f"{name} ({part})"
+            sheet = workbook.create_sheet(title=title[:EXCEL_MAX_TITLE])
+            header = []
+            for column in columns:
+                cell = WriteOnlyCell(sheet, value=column)
+                cell.font = bold
+                header.append(cell)
+            sheet.append(header)
+            return sheet
+
+        part, sheet, sheet_rows = 1, new_sheet(1), 1
+        for row in rows:
+            if sheet_rows == EXCEL_MAX_ROWS:
+                part += 1
+                sheet, sheet_rows = new_sheet(part), 1
+            sheet.append(row)
+            sheet_rows += 1
+    workbook.save(file_path)
+    return [file_path]
+
+
+def write_csv(tables, file_path):
+    """Файлы CSV: по файлу на таблицу"""
+    paths = table_paths(tables, file_path)
+    for (_, table), path in zip(tables, paths):
+        columns, rows = table_rows(table)
+        with open(path, 'w', newline='', encoding=CSV_ENCODING) as f:
+            writer = csv.writer(f, delimiter=CSV_DELIMITER)
+            writer.writerow(columns)
+            writer.writerows(rows)
+    return paths
+
+
+def write_parquet(tables, file_path):
+    """Файлы Parquet: по файлу на таблицу"""
+    # Проверка до записи: без pyarrow не должно оставаться части файлов набора
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError(f"Для сохранения в Parquet нужен пакет pyarrow: {e}") from e
+    paths = table_paths(tables, file_path)
+    for (_, table), path in zip(tables, paths):
+        if not isinstance(table, pd.DataFrame):
+            columns, rows = table_rows(table)
+            table = pd.DataFrame(list(rows), columns=columns)
+        table.to_parquet(path, engine='pyarrow', index=False)
+    return paths
+
+
+WRITERS = {
+    '.xlsx': write_xlsx,
+    '.csv': write_csv,
+    '.parquet': write_parquet,
+}
+
+
+def check_format(file_path):
+    """Расширение файла результатов; ValueError, если формат не поддерживается"""
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in WRITERS:
+        raise ValueError(f"Неподдерживаемый формат файла результатов: {extension or 'без расширения'} "
+                         f"(доступны {', '.join(FORMATS)})")
+    return extension
+
+
+def export_tables(tables, file_path):
+    """Сохраняет таблицы в формате по расширению файла; возвращает список сохраненных файлов"""
+    return WRITERS[check_format(file_path)](tables, file_path)
+
+
+def institution_table(index):
+    """Список учреждений указателя (InstitutionIndex) таблицей в порядке названий"""
+    bucket_names = np.array([name for name, _ in institutions.BUCKETS], dtype=object)
+    return pd.DataFrame({
+        'name': index.names,
+        'district': np.array(index.districts, dtype=object)[index.district_codes],
+        'score': index.values,
+        'bucket': bucket_names[index.buckets],
+    })
+
+
+def result_tables(results, sheet_results=None, statistics=None, institution_index=None):
+    """Набор таблиц результатов: основная, по листам книги, разброс и учреждения (если есть)"""
+    tables = [(RESULTS_SHEET, results)]
+    if sheet_results:
+        tables.append((SHEET_RESULTS_SHEET, sheet_results))
+    if statistics:
+        tables.append((STATISTICS_SHEET, statistics))
+    if institution_index is not None and len(institution_index):
+        tables.append((INSTITUTIONS_SHEET, institution_table(institution_index)))
+    return tables
+
+
+def save_results(results, file_path, sheet_results=None, statistics=None, institution_index=None):
+    """Сохраняет результаты (результаты по листам, разброс и учреждения - отдельными таблицами)"""
+    return export_tables(result_tables(results, sheet_results, statistics, institution_index), file_path)
+
+
+def export_many(jobs, max_workers=None, progress=None):
+    """Сохраняет наборы таблиц [(таблицы, файл)] в пуле процессов; ошибка одного файла не прерывает остальные
+
+    progress(сохранено, всего, файл) вызывается после каждого файла.
+    Возвращает (сохраненные файлы, ошибки [(файл, текст ошибки)]).
+    """
+    written, errors = [], []
+
+    def finish(path, paths=None, error=None):
+        if error is None:
+            written.extend(paths)
+        else:
+            errors.append((path, error))
+        if progress is not None:
+            progress(len(written) + len(errors), len(jobs), path)
+
+    max_workers = max_workers or min(len(jobs), os.cpu_count() or 1)
+    if max_workers <= 1 or len(jobs) <= 1:
+        for tables, path in jobs:
+            try:
+                finish(path, export_tables(tables, path))
+            except Exception as e:
+                finish(path, error=str(e))
+        return written, errors
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(export_tables, tables, path): path for tables, path in jobs}
+        for future in as_completed(futures):
+            try:
+                finish(futures[future], future.result())
+            except Exception as e:
+                finish(futures[future], error=str(e))
+    return written, errors
+
+
+def chart_pdf_path(file_path):
+    """Путь к PDF с диаграммой рядом с файлом результатов"""
+    return os.path.splitext(file_path)[0] + '_диаграмма.pdf'
+
+
+def results_fingerprint(results, analysis_type):
+    """Отпечаток результатов: совпадает, если отчет по ним не изменится"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps([analysis_type, results], sort_keys=True, ensure_ascii=False, default=str).encode())
+    return digest.hexdigest()
@@ -0,0 +1,152 @@
+"""История результатов анализа в локальной базе SQLite
+
+Результаты каждого запуска сохраняются по районам с периодом отчета и хэшем
+исходного файла. Период считается единицей истории: повторный анализ отчета
+за тот же период (например, дописанного файла) заменяет прежние строки.
+Динамика по районам и региону строится запросами к базе без чтения Excel;
+в нее входят только месячные периоды (ГГГГ-ММ): результаты файлов, в имени
+которых период не распознан, хранятся под именем файла и в динамику не попадают.
+"""
+import os
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    district TEXT NOT NULL,
+    analysis_type TEXT NOT NULL,
+    period TEXT NOT NULL,
+    score REAL NOT NULL,
+    record_count INTEGER NOT NULL,
+    category TEXT,              -- категория общего показателя по региону, у районов NULL
+    source_hash TEXT NOT NULL,
+    source_file TEXT,
+    recorded_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_district ON results (district, analysis_type, period);
+CREATE INDEX IF NOT EXISTS results_period ON results (period, analysis_type);
+CREATE INDEX IF NOT EXISTS results_source ON results (source_hash, analysis_type);
+"""
+
+# Периоды вида ГГГГ-ММ (остальные - имена файлов без распознанного периода)
+MONTH_PERIOD_GLOB = '[0-9][0-9][0-9][0-9]-[0-9][0-9]'
+
+
+def default_history_path():
+    """База истории: переменная DISTRICT_ANALYZER_HISTORY или локальная папка пользователя"""
+    path = os.environ.get('DISTRICT_ANALYZER_HISTORY')
+    if path:
+        return path
+    base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'district_analyzer', 'history.sqlite3')
+
+
+class HistoryStore:
+    """Хранилище результатов; соединение используется в потоке, где создано хранилище"""
+
+    def __init__(self, path=None):
+        self.path = path or default_history_path()
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def record(self, results, period, source_hash, source_file=None):
+        """Сохраняет результаты запуска, заменяя прежние за тот же период и тип анализа"""
+        recorded_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+        rows = [
+            (r['district'], r['analysis_type'], period, r['score'], r['record_count'],
+             r.get('category') if r.get('is_region_total', False) else None,
+             source_hash, source_file, recorded_at)
+            for r in results
+        ]
+        with self.connection:
+            for analysis_type in dict.fromkeys(row[1] for row in rows):
+                self.connection.execute("DELETE FROM results WHERE period = ? AND analysis_type = ?",
+                                        (period, analysis_type))
+            self.connection.executemany("INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def periods(self, analysis_type):
+        """Месячные периоды (ГГГГ-ММ) с результатами анализа по порядку"""
+        rows = self.connection.execute(
+            f"SELECT DISTINCT period FROM results WHERE analysis_type = ? AND period GLOB '{MONTH_PERIOD_GLOB}'"
+            " ORDER BY period", (analysis_type,))
+        return [period for period, in rows]
+
+    def district_trend(self, district, analysis_type='score5', months=None):
+        """Показатель района по периодам: [(период, показатель, записей)], последние months периодов
+
+        Периоды, в отчетах которых район не найден (нет записей), пропускаются.
+        """
+        query = ("SELECT period, score, record_count FROM results"
+                 f" WHERE district = ? AND analysis_type = ? AND record_count > 0 AND period GLOB '{MONTH_PERIOD_GLOB}'"
+                 " ORDER BY period DESC")
+        params = [district, analysis_type]
+        if months:
+            query += " LIMIT ?"
+            params.append(months)
+        return list(reversed(self.connection.execute(query, params).fetchall()))
+
+    def trends(self, analysis_type='score5', months=None, include_region_totals=True):
+        """Динамика всех районов: {район: [(период, показатель, записей)]} за последние months периодов"""
+        periods = self.periods(analysis_type)
+        if months:
+            periods = periods[-months:]
+        if not periods:
+            return {}
+
+        query = ("SELECT district, period, score, record_count FROM results"
+                 f" WHERE analysis_type = ? AND period >= ? AND period GLOB '{MONTH_PERIOD_GLOB}'"
+                 " AND record_count > 0")
+        if not include_region_totals:
+            query += " AND category IS NULL"
+        trends = {}
+        for district, period, score, record_count in self.connection.execute(
+                query + " ORDER BY district, period", (analysis_type, periods[0])):
+            trends.setdefault(district, []).append((period, score, record_count))
+        return trends
+
+    def region_share_by_quarter(self, category='100%', analysis_type='menu_compliance'):
+        """Доля учреждений региона в категории по кварталам: [(ГГГГ-КN, доля, записей)]
+
+        Доля за квартал взвешивается по числу записей в месячных отчетах.
+        """
+        query = f"""
+            SELECT substr(period, 1, 4) || '-К' || ((CAST(substr(period, 6, 2) AS INTEGER) + 2) / 3) AS quarter,
+                   SUM(score * record_count) / NULLIF(SUM(record_count), 0),
+                   SUM(record_count)
+            FROM results
+            WHERE analysis_type = ? AND category = ? AND period GLOB '{MONTH_PERIOD_GLOB}'
+            GROUP BY quarter ORDER BY quarter
+        """
+        return [(quarter, round(share or 0.0, 2), count)
+                for quarter, share, count in self.connection.execute(query, (analysis_type, category))]
+
+
+def record_results(results, file_path, period=None, store=None):
+    """Сохраняет результаты анализа файла в историю; ошибки базы не мешают анализу"""
+    import batch
+    import cache
+
+    own_store = store is None
+    try:
+        source_hash = cache.file_digest(file_path)
+        store = store or HistoryStore()
+        try:
+            store.record(results, period or batch.file_period(file_path), source_hash,
+                         os.path.basename(file_path))
+        finally:
+            if own_store:
+                store.close()
+        return True
+    except (sqlite3.Error, OSError):
+        return False
@@ -0,0 +1,121 @@
+"""Указатель образовательных учреждений для детализации результатов соответствия меню
+
+Записи хранятся столбцами (массивы numpy) в порядке названий, поэтому любой отбор
+остается отсортированным без повторной сортировки. Отбор идет по ключам:
+район и группа соответствия (готовые списки номеров записей) и начала слов
+названия (отсортированный список слов с поиском делением пополам).
+"""
+import re
+from bisect import bisect_left
+
+import numpy as np
+
+import regions
+
+# Группы соответствия меню: (название, нижняя граница процента включительно)
+BUCKETS = [
+    ('100%', 100),
+    ('от 75% до 100%', 75),
+    ('от 50% до 75%', 50),
+    ('менее 50%', -np.inf),
+]
+# Символ после всех букв: верхняя граница поиска слов по началу
+_PREFIX_END = '\uffff'
+# Слова названия без кавычек, номеров со знаком № и других знаков
+_WORDS = re.compile(r'\w+')
+
+
+def bucket_codes(values):
+    """Номер группы соответствия (индекс в BUCKETS) для каждого процента"""
+    codes = np.full(len(values), len(BUCKETS) - 1, dtype=np.int8)
+    # От нижней группы к верхней: более высокая граница перекрывает предыдущие
+    for code in range(len(BUCKETS) - 2, -1, -1):
+        codes[values >= BUCKETS[code][1]] = code
+    return codes
+
+
+class InstitutionIndex:
+    """Учреждения с процентом соответствия: отбор по району, группе и началам слов названия"""
+
+    def __init__(self, names, districts, values, district_order=None):
+        names = np.asarray(names, dtype=object)
+        districts = np.asarray(districts, dtype=object)
+        values = np.asarray(values, dtype=float)
+
+        normalized = np.array([regions.normalize_text(name) for name in names], dtype=object)
+        order = np.lexsort((np.arange(len(names)), normalized)) if len(names) else np.array([], dtype=int)
+        self.names = names[order]
+        self.values = values[order]
+        self.buckets = bucket_codes(self.values)
+
+        # Районы в порядке справочника, затем не вошедшие в него
+        known = list(district_order or [])
+        self.districts = known + sorted(set(districts.tolist()) - set(known))
+        codes = {district: code for code, district in enumerate(self.districts)}
+        self.district_codes = np.array([codes[district] for district in districts[order]], dtype=np.int32)
+
+        # (район, группа) -> номера записей по возрастанию (то есть по названию)
+        self.groups = {}
+        if len(order):
+            keys = self.district_codes.astype(np.int64) * len(BUCKETS) + self.buckets
+            key_order = np.argsort(keys, kind='stable')
+            bounds = np.flatnonzero(np.diff(keys[key_order])) + 1
+            for ids in np.split(key_order, bounds):
+                key = int(keys[ids[0]])
+                self.groups[divmod(key, len(BUCKETS))] = ids
+
+        # Слова названий (нормализованные) в алфавитном порядке и номера их записей
+        words = sorted((word, number) for number, name in enumerate(normalized[order])
+                       for word in set(_WORDS.findall(name)))
+        self.words = [word for word, _ in words]
+        self.word_ids = np.array([number for _, number in words], dtype=np.int64)
+
+    @classmethod
+    def from_parts(cls, parts, district_order=None):
+        """Указатель из блоков (названия, районы, проценты), накопленных анализом"""
+        if not parts:
+            return cls([], [], [], district_order)
+        names, districts, values = (np.concatenate(columns) for columns in zip(*parts))
+        return cls(names, districts, values, district_order)
+
+    def __len__(self):
+        return len(self.names)
+
+    def record(self, number):
+        """(название, район, процент соответствия) записи"""
+        return self.names[number], self.districts[self.district_codes[number]], self.values[number]
+
+    def district_code(self, district):
+        try:
+            return self.districts.index(district)
+        except ValueError:
+            return None
+
+    def word_matches(self, prefix):
+        """Номера записей, в названии которых есть слово, начинающееся с prefix"""
+        start = bisect_left(self.words, prefix)
+        end = bisect_left(self.words, prefix + _PREFIX_END, start)
+        return np.unique(self.word_ids[start:end])
+
+    def search(self, district=None, bucket=None, text=''):
+        """Номера записей (в порядке названий) по району, номеру группы BUCKETS и началам слов text"""
+        if district is None:
+            district_codes = range(len(self.districts))
+        else:
+            code = self.district_code(district)
+            district_codes = [] if code is None else [code]
+        buckets = range(len(BUCKETS)) if bucket is None else [bucket]
+
+        if district is None and bucket is None:
+            ids = np.arange(len(self.names))
+        else:
+            selected = [self.groups[key] for key in ((code, b) for code in district_codes for b in buckets)
+                        if key in self.groups]
+            ids = np.sort(np.concatenate(selected)) if selected else np.array([], dtype=np.int64)
+
+        # Каждое слово запроса - начало одного из слов названия
+        for prefix in _WORDS.findall(regions.normalize_text(text)):
+            if not len(ids):
+                break
+            ids = ids[np.isin(ids, self.word_matches(prefix), assume_unique=True)]
+        return ids
@@ -1,29 +1,123 @@
-import pandas as pd
+import sys
+import time
+
+# Отсчет времени до появления окна (без запуска интерпретатора, его учитывает timing.process_uptime)
+STARTED = time.perf_counter()
+
+# Консольный режим (python main.py analyze ...) запускается до загрузки tkinter и графического интерфейса
+if __name__ == "__main__" and len(sys.argv) > 1:
+    import multiprocessing
+    multiprocessing.freeze_support()
+    import cli
+    sys.exit(cli.main(sys.argv[1:]))
+
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
+import importlib
 import os
-import re
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_pdf import PdfPages
+import queue
+import multiprocessing
+import threading
+
+# Окно строится без pandas и openpyxl: модули анализа (analysis, batch, export, sheets, watch,
+# worker) импортируются в фоновом потоке после появления окна, а в обработчиках - по месту.
+# Если пользователь начал анализ раньше, импорт в обработчике дождется фоновой загрузки.
+# Типы анализа (rules) объявлены без pandas, по ним переключатель строится сразу.
+import regions
+import rules
+import timing
+from virtual_tree import VirtualTree
+
+# Период опроса очереди фонового анализа (мс)
+WORKER_POLL_MS = 100
+# Период проверки изменений наблюдаемого файла (мс)
+WATCH_POLL_MS = 5000
+# Переменная окружения с адресом сервиса анализа (service.SERVICE_ENV)
+SERVICE_ENV = 'DISTRICT_ANALYZER_SERVICE'
+# Пауза в наборе строки поиска учреждений перед обновлением списка (мс)
+SEARCH_DELAY_MS = 150
+# Модули, загружаемые в фоне после появления окна (worker импортирует все модули анализа)
+ANALYSIS_MODULES = ('worker', 'institutions')
+ALL_BUCKETS = "Все группы"
+READY = "Готов к работе"
+NO_INSTITUTIONS = "Учреждения: выполните анализ соответствия меню и выберите район"
 
 class DarkDistrictAnalyzerApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Анализ отчетов ФЦМПО по районам")
-        self.root.geometry("900x700")
+        self.root.geometry("1300x700")
         self.root.configure(bg='#2b2b2b')
         
-        # Полный список районов для поиска
-        self.districts = [
-            "Аргун", "Ачхой-Мартановский", "Веденский", "Грозненский", "Грозный",
-            "Гудермесский", "Гудермес", "Итум-Калинский", "Курчалоевский", "Надтеречный",
-            "Наурский", "Ножай-Юртовский", "Серноводский", "Урус-Мартановский",
-            "Шалинский", "Шаройский", "Шатойский", "Шелковской"
-        ]
+        # Справочник районов для поиска (regions.json)
+        try:
+            self.districts = regions.default_registry()
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            messagebox.showwarning("Предупреждение", f"Не удалось загрузить справочник районов: {e}\n"
+                                   "Используется встроенный список районов")
+            self.districts = regions.DistrictRegistry.from_names(regions.DEFAULT_DISTRICTS)
+        # Локальный сервис анализа (адрес в DISTRICT_ANALYZER_SERVICE); без него анализ идет в этом процессе,
+        # а модуль клиента (http.server, urllib) не загружается
+        self.service = None
+        if os.environ.get(SERVICE_ENV):
+            import service
+            self.service = service.configured_client()
         
         self.setup_styles()
         self.setup_ui()
         self.results = None
+        self.sheet_results = None  # Результаты по листам книги (анализ нескольких листов)
+        self.statistics = None  # Разброс и процентили по районам
+        self.institutions = None  # Указатель учреждений последнего анализа соответствия меню
+        self.institution_ids = []  # Номера учреждений, показанных в списке
+        self.tree_districts = {}  # Строка таблицы результатов -> район
+        self.search_job = None
+        self.worker = None
+        self.incremental = None  # Накопленный анализ наблюдаемого файла
+        self.watch_job = None
+        self.last_save_path = None  # Файл результатов, обновляемый вместе с наблюдаемым файлом
+        self.export_worker = None  # Фоновое сохранение таблиц результатов
+        self.pending_export = None  # Файл, повторное сохранение в который запрошено во время сохранения
+        self.chart_worker = None  # Фоновое построение отчета PDF
+        self.pending_chart = None  # Отчет, запрошенный во время построения предыдущего
+        self.last_chart_export = None  # (путь, отпечаток результатов) последнего отчета PDF
+        # Профиль cProfile сохраняется для одного запуска (переменная DISTRICT_ANALYZER_PROFILE=1)
+        self.profile_next_run = timing.profile_requested()
+        # Замеры запуска: время до появления окна и фоновая загрузка модулей анализа
+        self.startup_timer = timing.RunTimer('startup')
+        self.module_events = None
+        self.root.bind("<Map>", self.on_first_map, add="+")
+    
+    def on_first_map(self, event):
+        """Окно показано: замер времени запуска и фоновая загрузка модулей анализа"""
+        if event.widget is not self.root or self.module_events is not None:
+            return
+        self.startup_timer.add('окно', time.perf_counter() - STARTED)
+        uptime = timing.process_uptime()
+        if uptime is not None:
+            self.startup_timer.add('окно с запуска процесса', uptime)
+        self.module_events = queue.Queue()
+        threading.Thread(target=load_analysis_modules, args=(self.module_events,), daemon=True).start()
+        self.root.after(WORKER_POLL_MS, self.poll_module_loading)
+    
+    def poll_module_loading(self):
+        """Ожидает фоновой загрузки модулей анализа и показывает замеры запуска"""
+        try:
+            kind, value = self.module_events.get_nowait()
+        except queue.Empty:
+            self.root.after(WORKER_POLL_MS, self.poll_module_loading)
+            return
+        
+        if kind == 'error':
+            messagebox.showerror("Ошибка", f"Не удалось загрузить модули анализа: {value}")
+            return
+        import institutions
+        self.bucket_box.configure(values=[ALL_BUCKETS] + [name for name, _ in institutions.BUCKETS])
+        self.startup_timer.add('модули анализа', value)
+        self.startup_timer.log()
+        # Строка состояния не меняется, если пользователь уже начал работу
+        if self.status_var.get() == READY:
+            self.status_var.set(f"{READY} (запуск: {self.startup_timer.summary()})")
         
     def setup_styles(self):
         """Настройка темных стилей"""
@@ -79,6 +173,9 @@ class DarkDistrictAnalyzerApp:
         self.load_btn = ttk.Button(file_subframe, text="Выбрать файл Excel", command=self.load_file)
         self.load_btn.pack(side=tk.LEFT)
         
+        self.batch_btn = ttk.Button(file_subframe, text="Пакетный анализ папки", command=self.analyze_folder)
+        self.batch_btn.pack(side=tk.LEFT, padx=(10, 0))
+        
         self.file_path_var = tk.StringVar(value="Файл не выбран")
         file_path_label = ttk.Label(file_subframe, textvariable=self.file_path_var, 
                                    background='#3d3d3d', foreground='#cccccc', 
@@ -96,10 +193,27 @@ class DarkDistrictAnalyzerApp:
         analysis_frame = ttk.Frame(settings_frame)
         analysis_frame.pack(fill=tk.X, pady=(5, 0))
         
-        ttk.Radiobutton(analysis_frame, text="Балл нормированный к 5", 
-                       variable=self.analysis_var, value="score5").pack(side=tk.LEFT, padx=(0, 20))
-        ttk.Radiobutton(analysis_frame, text="Соответствие типовому меню", 
-                       variable=self.analysis_var, value="menu_compliance").pack(side=tk.LEFT)
+        # По переключателю на каждый зарегистрированный тип анализа
+        for rule in rules.RULES.values():
+            ttk.Radiobutton(analysis_frame, text=rule.title,
+                           variable=self.analysis_var, value=rule.analysis_type).pack(side=tk.LEFT, padx=(0, 20))
+        ttk.Radiobutton(analysis_frame, text="Все анализы за один проход", 
+                       variable=self.analysis_var, value=rules.ALL_ANALYSES).pack(side=tk.LEFT)
+        
+        # Потоковое чтение больших файлов (только .xlsx)
+        self.streaming_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(settings_frame, text="Потоковое чтение больших файлов (.xlsx)", 
+                       variable=self.streaming_var).pack(anchor=tk.W, pady=(5, 0))
+        
+        # Наблюдение за файлом: при дописывании строк обрабатываются только новые строки
+        self.watch_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(settings_frame, text="Следить за изменениями файла (.xlsx)", 
+                       variable=self.watch_var).pack(anchor=tk.W, pady=(5, 0))
+        
+        # Анализ нескольких листов книги с объединением результатов по районам
+        self.sheets_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(settings_frame, text="Анализировать несколько листов книги", 
+                       variable=self.sheets_var).pack(anchor=tk.W, pady=(5, 0))
         
         # Фрейм управления
         control_frame = ttk.Frame(main_frame, style='Card.TFrame', padding="10")
@@ -109,39 +223,96 @@ class DarkDistrictAnalyzerApp:
                                      command=self.analyze_file, state="disabled")
         self.analyze_btn.pack(side=tk.LEFT, padx=(0, 10))
         
+        self.cancel_btn = ttk.Button(control_frame, text="Отмена", 
+                                    command=self.cancel_analysis, state="disabled")
+        self.cancel_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
         self.save_btn = ttk.Button(control_frame, text="Сохранить результаты", 
                                   command=self.save_results, state="disabled")
         self.save_btn.pack(side=tk.LEFT)
         
+        # Диаграмма PDF: вместе с результатами (по флажку) или отдельно
+        self.chart_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(control_frame, text="PDF с диаграммой", 
+                       variable=self.chart_var).pack(side=tk.LEFT, padx=(10, 0))
+        
+        self.chart_btn = ttk.Button(control_frame, text="Сохранить диаграмму", 
+                                   command=self.save_chart, state="disabled")
+        self.chart_btn.pack(side=tk.LEFT, padx=(10, 0))
+        
         # Фрейм результатов
         results_frame = ttk.Frame(main_frame, style='Card.TFrame', padding="10")
         results_frame.pack(fill=tk.BOTH, expand=True)
         
         ttk.Label(results_frame, text="Результаты анализа:").pack(anchor=tk.W, pady=(0, 10))
         
+        panes = ttk.PanedWindow(results_frame, orient=tk.HORIZONTAL)
+        panes.pack(fill=tk.BOTH, expand=True)
+        
         # Таблица результатов
-        tree_frame = ttk.Frame(results_frame)
-        tree_frame.pack(fill=tk.BOTH, expand=True)
+        tree_frame = ttk.Frame(panes)
+        panes.add(tree_frame, weight=1)
         
-        self.tree = ttk.Treeview(tree_frame, columns=("district", "score", "count"), 
+        self.tree = ttk.Treeview(tree_frame, columns=("district", "score", "count", "median", "p90", "std"), 
                                 show="headings", style="Dark.Treeview", height=15)
         
         self.tree.heading("district", text="Район")
         self.tree.heading("score", text="Показатель")
         self.tree.heading("count", text="Количество записей")
+        self.tree.heading("median", text="Медиана")
+        self.tree.heading("p90", text="90%")
+        self.tree.heading("std", text="Откл.")
         
+        self.tree.column("#0", width=30, stretch=False)  # Раскрытие результатов по листам
         self.tree.column("district", width=250)
         self.tree.column("score", width=150)
         self.tree.column("count", width=120)
+        # Разброс по району: медиана, 90-й процентиль и стандартное отклонение
+        for column in ("median", "p90", "std"):
+            self.tree.column(column, width=70, anchor=tk.E)
         
         scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
         self.tree.configure(yscrollcommand=scrollbar.set)
         
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.bind("<<TreeviewSelect>>", self.on_district_selected)
+        
+        # Учреждения выбранного района (анализ соответствия меню) с поиском по названию
+        institutions_frame = ttk.Frame(panes, padding=(10, 0, 0, 0))
+        panes.add(institutions_frame, weight=1)
+        
+        filter_frame = ttk.Frame(institutions_frame)
+        filter_frame.pack(fill=tk.X, pady=(0, 5))
+        ttk.Label(filter_frame, text="Поиск:").pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", lambda *args: self.schedule_institution_search())
+        search_entry = ttk.Entry(filter_frame, textvariable=self.search_var)
+        search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(5, 10))
+        self.bucket_var = tk.StringVar(value=ALL_BUCKETS)
+        # Группы соответствия добавляются в список после загрузки модулей анализа
+        self.bucket_box = ttk.Combobox(filter_frame, textvariable=self.bucket_var, state="readonly", width=16,
+                                       values=[ALL_BUCKETS])
+        self.bucket_box.pack(side=tk.LEFT)
+        self.bucket_box.bind("<<ComboboxSelected>>", lambda event: self.refresh_institutions())
+        
+        self.institutions_var = tk.StringVar(value=NO_INSTITUTIONS)
+        ttk.Label(institutions_frame, textvariable=self.institutions_var).pack(anchor=tk.W, pady=(0, 5))
+        
+        self.institution_tree = VirtualTree(institutions_frame, ("name", "district", "score"),
+                                            height=15, style="Dark.Treeview")
+        self.institution_tree.heading("name", text="Учреждение")
+        self.institution_tree.heading("district", text="Район")
+        self.institution_tree.heading("score", text="Соответствие (%)")
+        self.institution_tree.column("name", width=260)
+        self.institution_tree.column("district", width=130)
+        self.institution_tree.column("score", width=110, anchor=tk.E)
+        self.institution_tree.tag_configure('bucket_0', foreground='#81c784')  # 100% - зеленый
+        self.institution_tree.tag_configure('bucket_3', foreground='#e57373')  # менее 50% - красный
+        self.institution_tree.pack(fill=tk.BOTH, expand=True)
         
         # Статус бар
-        self.status_var = tk.StringVar(value="Готов к работе")
+        self.status_var = tk.StringVar(value=READY)
         status_bar = ttk.Label(main_frame, textvariable=self.status_var, 
                               relief='sunken', background='#3d3d3d', 
                               foreground='#cccccc', padding=(5, 2))
@@ -159,251 +330,263 @@ class DarkDistrictAnalyzerApp:
             self.status_var.set(f"Файл загружен: {os.path.basename(file_path)}")
     
     def analyze_file(self):
+        from watch import IncrementalAnalysis
+        from worker import AnalysisWorker, IncrementalWorker, ServiceWorker, SheetsWorker
+        
         file_path = self.file_path_var.get()
         if file_path == "Файл не выбран":
             messagebox.showerror("Ошибка", "Сначала выберите файл")
             return
         
         analysis_type = self.analysis_var.get()
+        
+        if self.sheets_var.get():
+            sheet_names = self.choose_sheets(file_path)
+            if not sheet_names:
+                return
+            self.set_incremental(None)
+            self.status_var.set(f"Анализ листов книги: {len(sheet_names)}...")
+            if self.service is not None:
+                # Доступность сервиса проверяется в потоке анализа; если он не отвечает, листы анализируются локально
+                self.start_worker(ServiceWorker(self.service, file_path, analysis_type, self.districts,
+                                                sheet_names, multi_sheet=True, profile=self.take_profile_flag()))
+                return
+            self.start_worker(SheetsWorker(file_path, analysis_type, self.districts, sheet_names,
+                                           profile=self.take_profile_flag()))
+            return
+        
         self.status_var.set("Анализ файла...")
-        self.analyze_btn.config(state="disabled")
-        self.root.update()
+        if self.watch_var.get() and file_path.lower().endswith('.xlsx'):
+            self.set_incremental(IncrementalAnalysis(file_path, analysis_type, self.districts))
+            self.start_worker(IncrementalWorker(self.incremental))
+            if self.watch_job is None:
+                self.watch_job = self.root.after(WATCH_POLL_MS, self.check_watched_file)
+        elif not self.streaming_var.get() and self.service is not None:
+            self.set_incremental(None)
+            self.start_worker(ServiceWorker(self.service, file_path, analysis_type, self.districts,
+                                            profile=self.take_profile_flag()))
+        else:
+            self.set_incremental(None)
+            self.start_worker(AnalysisWorker(file_path, analysis_type, self.districts, 
+                                             streaming=self.streaming_var.get(),
+                                             profile=self.take_profile_flag()))
+    
+    def set_incremental(self, incremental):
+        """Заменяет анализ наблюдаемого файла; сохраненные ранее результаты больше не перезаписываются"""
+        self.incremental = incremental
+        self.last_save_path = None
+    
+    def choose_sheets(self, file_path):
+        """Выбор листов книги для анализа (по умолчанию выбраны все); None - отмена"""
+        import sheets
         
         try:
-            df = pd.read_excel(file_path, header=None)
-            
-            if analysis_type == "score5":
-                results = self.analyze_score5(df)
-            else:
-                results = self.analyze_menu_compliance(df)
-            
-            self.results = results
-            self.display_results(results)
-            self.save_btn.config(state="normal")
-            self.status_var.set(f"Анализ завершен. Обработано {len(results)} районов")
-            
+            names = [name for name, _ in sheets.list_sheets(file_path)]
         except Exception as e:
-            messagebox.showerror("Ошибка", f"Произошла ошибка при анализе файла: {str(e)}")
-            self.status_var.set("Ошибка при анализе")
+            messagebox.showerror("Ошибка", f"Не удалось прочитать листы книги: {e}")
+            return None
+        if len(names) <= 1:
+            return names
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Листы книги")
+        dialog.configure(bg='#2b2b2b')
+        dialog.transient(self.root)
+        dialog.grab_set()
+        
+        ttk.Label(dialog, text="Листы для анализа:").pack(anchor=tk.W, padx=10, pady=(10, 5))
+        listbox = tk.Listbox(dialog, selectmode=tk.MULTIPLE, exportselection=False, height=min(len(names), 15),
+                             bg='#1e1e1e', fg='#ffffff', selectbackground='#3a7ca5', borderwidth=0)
+        for name in names:
+            listbox.insert(tk.END, name)
+        listbox.select_set(0, tk.END)
+        listbox.pack(fill=tk.BOTH, expand=True, padx=10)
+        
+        chosen = []
+        
+        def accept():
+            chosen.extend(names[i] for i in listbox.curselection())
+            dialog.destroy()
+        
+        buttons = ttk.Frame(dialog)
+        buttons.pack(fill=tk.X, padx=10, pady=10)
+        ttk.Button(buttons, text="Анализировать", command=accept).pack(side=tk.LEFT)
+        ttk.Button(buttons, text="Отмена", command=dialog.destroy).pack(side=tk.LEFT, padx=(10, 0))
+        self.root.wait_window(dialog)
+        return chosen or None
+    
+    def analyze_folder(self):
+        """Пакетный анализ всех файлов .xlsx из выбранной папки"""
+        import batch
+        from worker import BatchWorker
         
-        finally:
-            self.analyze_btn.config(state="normal")
+        folder = filedialog.askdirectory(title="Выберите папку с отчетами")
+        if not folder:
+            return
+        
+        file_paths = batch.collect_files(folder)
+        if not file_paths:
+            messagebox.showwarning("Предупреждение", "В папке нет файлов .xlsx")
+            return
+        
+        self.set_incremental(None)
+        self.status_var.set(f"Пакетный анализ: {len(file_paths)} файлов...")
+        self.start_worker(BatchWorker(file_paths, self.analysis_var.get(), self.districts,
+                                      profile=self.take_profile_flag()))
     
-    def analyze_score5(self, df):
-        """Анализ балла нормированного к 5 (оригинальный алгоритм)"""
-        district_data = {}
-        current_district = None
+    def take_profile_flag(self):
+        profile, self.profile_next_run = self.profile_next_run, False
+        return profile
+    
+    def start_worker(self, worker):
+        # Анализ выполняется в фоновом потоке, окно остается отзывчивым
+        self.analyze_btn.config(state="disabled")
+        self.batch_btn.config(state="disabled")
+        self.cancel_btn.config(state="normal")
+        self.worker = worker
+        self.worker.start()
+        self.root.after(WORKER_POLL_MS, self.poll_worker)
+    
+    def cancel_analysis(self):
+        from worker import IncrementalWorker
+        
+        if self.worker is not None:
+            self.worker.cancel()
+            self.cancel_btn.config(state="disabled")
+            self.status_var.set("Остановка анализа...")
+            if isinstance(self.worker, IncrementalWorker):
+                # Отмена обновления наблюдаемого файла прекращает наблюдение
+                self.stop_watching()
+    
+    def stop_watching(self):
+        """Прекращает проверку изменений наблюдаемого файла"""
+        if self.watch_job is not None:
+            self.root.after_cancel(self.watch_job)
+            self.watch_job = None
+        self.set_incremental(None)
+    
+    def poll_worker(self):
+        """Обрабатывает сообщения фонового анализа"""
+        from worker import IncrementalWorker
         
-        for i, row in df.iterrows():
-            cell_value = str(row.iloc[0]) if pd.notna(row.iloc[0]) else ""
+        worker = self.worker
+        progress = None
+        while True:
+            try:
+                event = worker.events.get_nowait()
+            except queue.Empty:
+                break
             
-            # Проверяем, является ли ячейка названием района
-            for district in self.districts:
-                if cell_value.strip() == district:
-                    current_district = district
-                    if district not in district_data:
-                        district_data[district] = {
-                            'score5_data': [],
-                            'record_count': 0
-                        }
-                    break
+            kind = event[0]
+            if kind == 'progress':
+                progress = event
+                continue
             
-            # Если мы находимся в блоке района и это строка с данными
-            if current_district and i > 0:
-                # Проверяем, является ли строка данными (дата в первом столбце)
-                if re.match(r'\d{1,2}\.\d{1,2}\.\d{4}', str(cell_value)):
-                    district_data[current_district]['record_count'] += 1
-                    
-                    # Поиск столбца с баллом нормированным к 5
-                    score5_col = None
-                    
-                    # Поиск по заголовкам в предыдущей строке
-                    for j in range(len(row)):
-                        if i > 0 and pd.notna(df.iloc[i-1, j]):
-                            header_val = str(df.iloc[i-1, j])
-                            if "нормированный к5" in header_val.lower():
-                                score5_col = j
-                                break
-                    
-                    # Если не нашли по заголовкам, используем поиск по типу данных
-                    if score5_col is None:
-                        # Ищем числовой столбец с баллами от 0 до 5
-                        for j in range(len(row)-1, max(len(row)-10, 0), -1):
-                            try:
-                                val = float(row.iloc[j])
-                                if 0 <= val <= 5:
-                                    score5_col = j
-                                    break
-                            except:
-                                continue
-                    
-                    # Собираем данные балла нормированного к 5
-                    if score5_col is not None and pd.notna(row.iloc[score5_col]):
-                        try:
-                            score_val = float(row.iloc[score5_col])
-                            district_data[current_district]['score5_data'].append(score_val)
-                        except:
-                            pass
-        
-        # Расчет статистики
-        results = []
-        for district in self.districts:
-            if district in district_data:
-                data = district_data[district]
-                if data['record_count'] > 0:
-                    # Средний балл нормированный к 5 (в процентах)
-                    score5_percent = 0
-                    if data['score5_data']:
-                        score5_percent = (sum(data['score5_data']) / len(data['score5_data'])) / 5 * 100
-                    
-                    results.append({
-                        'district': district,
-                        'score': round(score5_percent, 2),
-                        'record_count': data['record_count'],
-                        'analysis_type': 'score5'
-                    })
+            self.finish_analysis()
+            if kind == 'done':
+                results, errors = event[1], event[2]
+                self.results = results
+                self.sheet_results = worker.sheet_results
+                self.statistics = worker.statistics
+                self.institutions = worker.institutions
+                with worker.timer.stage('таблица', len(results)):
+                    self.display_results(results, self.sheet_results, self.statistics)
+                    self.refresh_institutions()
+                self.save_btn.config(state="normal")
+                self.chart_btn.config(state="normal")
+                status = worker.summary or f"Анализ завершен. Обработано {len(results)} районов"
+                self.status_var.set(f"{status} ({worker.timer.summary()})")
+                worker.timer.log()
+                if isinstance(worker, IncrementalWorker) and worker.incremental is self.incremental \
+                        and self.last_save_path:
+                    self.export_results(self.last_save_path)
+                if errors:
+                    # Ошибки в отдельных файлах пакета (листах книги) не прерывают анализ остальных
+                    details = "\n".join(f"{os.path.basename(path)}: {error}" for path, error in errors)
+                    what = "листы" if worker.sheet_results is not None else "файлы"
+                    messagebox.showwarning("Предупреждение", f"Не удалось обработать {what}:\n{details}")
+            elif kind == 'cancelled':
+                if isinstance(worker, IncrementalWorker):
+                    self.status_var.set("Анализ отменен, наблюдение за файлом остановлено")
+                else:
+                    self.status_var.set("Анализ отменен")
             else:
-                # Добавляем район с нулевыми результатами, если он не найден
-                results.append({
-                    'district': district,
-                    'score': 0.0,
-                    'record_count': 0,
-                    'analysis_type': 'score5'
-                })
-        
-        # Сортируем по проценту (от лучшего к худшему)
-        results.sort(key=lambda x: x['score'], reverse=True)
-        return results
+                messagebox.showerror("Ошибка", f"Произошла ошибка при анализе файла: {event[1]}")
+                self.status_var.set("Ошибка при анализе")
+            return
+        
+        # Показываем только последнее промежуточное состояние из накопившихся
+        if progress is not None and not worker.cancelled:
+            _, status, partial_results = progress
+            self.status_var.set(status)
+            if partial_results is not None:
+                self.display_results(partial_results)
+        
+        self.root.after(WORKER_POLL_MS, self.poll_worker)
+    
+    def finish_analysis(self):
+        self.worker = None
+        self.analyze_btn.config(state="normal")
+        self.batch_btn.config(state="normal")
+        self.cancel_btn.config(state="disabled")
+    
+    def check_watched_file(self):
+        """Периодическая проверка наблюдаемого файла"""
+        from worker import IncrementalWorker
+        
+        self.watch_job = None
+        if not self.watch_var.get() or self.incremental is None:
+            return
+        
+        if self.worker is None:
+            try:
+                changed = self.incremental.changed()
+            except OSError:
+                changed = False
+            if changed:
+                self.status_var.set("Файл изменен, обновление результатов...")
+                self.start_worker(IncrementalWorker(self.incremental))
+        
+        self.watch_job = self.root.after(WATCH_POLL_MS, self.check_watched_file)
+    
+    def analyze_score5(self, df):
+        """Анализ балла нормированного к 5 (векторизованный алгоритм)"""
+        import analysis
+        return analysis.analyze_score5(df, self.districts)
     
     def analyze_menu_compliance(self, df):
         """Анализ соответствия типовому меню с расчетом общего процента по регионам"""
-        district_data = {}
-        all_compliance_data = []  # Все проценты по региону
-        
-        # Проходим по всем строкам для поиска данных по районам
-        for i, row in df.iterrows():
-            # Пропускаем пустые строки
-            if pd.isna(row.iloc[0]):
-                continue
-                
-            # Ищем строки с названиями учреждений (содержат "МБОУ", "СОШ" и т.д.)
-            cell_value = str(row.iloc[0])
-            if any(keyword in cell_value for keyword in ['МБОУ', 'СОШ', 'ГБОУ', 'Школа']):
-                # Проверяем, есть ли в строке название района
-                district_found = None
-                for district in self.districts:
-                    if district in (str(row.iloc[1]) if pd.notna(row.iloc[1]) else ""):
-                        district_found = district
-                        break
-                
-                if district_found:
-                    if district_found not in district_data:
-                        district_data[district_found] = {
-                            'compliance_data': [],
-                            'record_count': 0
-                        }
-                    
-                    # Ищем столбцы с соответствием типовому меню (последние 2 столбца)
-                    for j in range(len(row)-2, len(row)):
-                        if j >= 0 and pd.notna(row.iloc[j]):
-                            try:
-                                # Ищем процент соответствия (значение 0-100)
-                                compliance_val = float(row.iloc[j])
-                                if 0 <= compliance_val <= 100:
-                                    district_data[district_found]['compliance_data'].append(compliance_val)
-                                    district_data[district_found]['record_count'] += 1
-                                    all_compliance_data.append(compliance_val)
-                                    break
-                            except:
-                                continue
-        
-        # Расчет общих показателей по региону
-        region_stats = self.calculate_region_stats(all_compliance_data)
-        
-        # Расчет статистики по районам
-        results = []
-        for district in self.districts:
-            if district in district_data:
-                data = district_data[district]
-                if data['record_count'] > 0:
-                    # Средний процент соответствия
-                    avg_compliance = 0
-                    if data['compliance_data']:
-                        avg_compliance = sum(data['compliance_data']) / len(data['compliance_data'])
-                    
-                    results.append({
-                        'district': district,
-                        'score': round(avg_compliance, 2),
-                        'record_count': data['record_count'],
-                        'analysis_type': 'menu_compliance'
-                    })
-            else:
-                # Добавляем район с нулевыми результатами, если он не найден
-                results.append({
-                    'district': district,
-                    'score': 0.0,
-                    'record_count': 0,
-                    'analysis_type': 'menu_compliance'
-                })
-        
-        # Добавляем строки с общими показателями по региону
-        results.append({
-            'district': 'ОБЩИЙ ПОКАЗАТЕЛЬ ПО РЕГИОНУ (100%)',
-            'score': round(region_stats['perfect_percentage'], 2),
-            'record_count': len(all_compliance_data),
-            'analysis_type': 'menu_compliance',
-            'is_region_total': True,
-            'category': '100%'
-        })
-        
-        results.append({
-            'district': 'ОБЩИЙ ПОКАЗАТЕЛЬ ПО РЕГИОНУ (75-100%)',
-            'score': round(region_stats['good_percentage'], 2),
-            'record_count': len(all_compliance_data),
-            'analysis_type': 'menu_compliance',
-            'is_region_total': True,
-            'category': '75-100%'
-        })
-        
-        # Сортируем по проценту соответствия (от лучшего к худшему), но общие показатели оставляем в конце
-        regular_results = [r for r in results if not r.get('is_region_total', False)]
-        regular_results.sort(key=lambda x: x['score'], reverse=True)
-        
-        # Добавляем общие показатели в конец
-        region_results = [r for r in results if r.get('is_region_total', False)]
-        return regular_results + region_results
+        import analysis
+        return analysis.analyze_menu_compliance(df, self.districts)
     
     def calculate_region_stats(self, compliance_data):
         """Расчет статистики по региону"""
-        if not compliance_data:
-            return {'perfect_percentage': 0, 'good_percentage': 0}
-        
-        # Процент организаций с 100% соответствием
-        perfect_compliance_count = sum(1 for x in compliance_data if x == 100)
-        perfect_percentage = (perfect_compliance_count / len(compliance_data)) * 100
-        
-        # Процент организаций с 75-100% соответствием
-        good_compliance_count = sum(1 for x in compliance_data if 75 <= x <= 100)
-        good_percentage = (good_compliance_count / len(compliance_data)) * 100
-        
-        return {
-            'perfect_percentage': perfect_percentage,
-            'good_percentage': good_percentage
-        }
+        import analysis
+        return analysis.calculate_region_stats(compliance_data)
     
-    def display_results(self, results):
-        # Очищаем таблицу
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+    def display_results(self, results, sheet_results=None, statistics=None):
+        # Строки таблицы обновляются на месте, без удаления и вставки каждой строки при каждом
+        # промежуточном результате (выбранный район выделяется снова после заполнения)
+        selected_district = self.selected_district()
+        self.tree_districts = {}
+        
+        # Результаты по листам книги показываются вложенными строками районов
+        by_district = {}
+        for result in sheet_results or []:
+            if result['record_count']:
+                by_district.setdefault((result['district'], result['analysis_type']), []).append(result)
+        self.tree.configure(show="tree headings" if by_district else "headings")
+        spread = {(row['district'], row['analysis_type']): row for row in statistics or []}
         
         # Обновляем заголовки в зависимости от типа анализа
         analysis_type = self.analysis_var.get()
-        if analysis_type == "score5":
-            self.tree.heading("score", text="Балл нормированный к 5 (%)")
+        if analysis_type in rules.RULES:
+            self.tree.heading("score", text=rules.RULES[analysis_type].column_title)
         else:
-            self.tree.heading("score", text="Соответствие меню (%)")
+            self.tree.heading("score", text="Показатель (%)")
         
         # Заполняем таблицу результатами
+        rows = []
         for result in results:
             score_text = f"{result['score']}%"
             
@@ -416,164 +599,250 @@ class DarkDistrictAnalyzerApp:
                 elif category == '75-100%':
                     tags = ('good_total',)
             
-            self.tree.insert("", "end", values=(
-                result['district'],
+            # В пакетном анализе к району добавляется период отчета
+            district = result['district']
+            if analysis_type == rules.ALL_ANALYSES:
+                district = f"{rules.RULES[result['analysis_type']].title}: {district}"
+            if 'period' in result:
+                district = f"{result['period']} — {district}"
+            
+            row = spread.get((result['district'], result['analysis_type']), {})
+            rows.append(((
+                district,
                 score_text,
-                result['record_count']
-            ), tags=tags)
+                result['record_count'],
+                *("" if row.get(key) is None else row[key] for key in ("median", "p90", "std"))
+            ), tags))
+        
+        for item, result in zip(self.fill_tree_items("", rows), results):
+            if not result.get('is_region_total', False):
+                self.tree_districts[item] = result['district']
+            
+            sheet_rows = [((sheet_result['sheet'], f"{sheet_result['score']}%", sheet_result['record_count']), ())
+                          for sheet_result in by_district.get((result['district'], result['analysis_type']), [])]
+            self.fill_tree_items(item, sheet_rows)
+        
+        selected_item = next((item for item, district in self.tree_districts.items()
+                              if district == selected_district), None)
+        if selected_item is not None:
+            if self.tree.selection() != (selected_item,):
+                self.tree.selection_set(selected_item)
+            self.tree.see(selected_item)
+        elif self.tree.selection():
+            self.tree.selection_remove(self.tree.selection())
         
         # Настраиваем стили для строк региона
         self.tree.tag_configure('perfect_total', background='#2e7d32', foreground='white')  # зеленый
         self.tree.tag_configure('good_total', background='#3a7ca5', foreground='white')     # синий
     
+    def fill_tree_items(self, parent, rows):
+        """Строки таблицы результатов под parent со значениями rows [(значения, теги)]: имеющиеся
+        элементы получают новые значения, недостающие добавляются, лишние удаляются"""
+        items = list(self.tree.get_children(parent))
+        if len(items) > len(rows):
+            self.tree.delete(*items[len(rows):])
+            del items[len(rows):]
+        for item, (values, tags) in zip(items, rows):
+            self.tree.item(item, values=values, tags=tags)
+        for values, tags in rows[len(items):]:
+            items.append(self.tree.insert(parent, "end", values=values, tags=tags))
+        return items
+    
+    def selected_district(self):
+        """Район выбранной строки таблицы результатов (для строк листов - район родительской строки)"""
+        selection = self.tree.selection()
+        if not selection:
+            return None
+        item = self.tree.parent(selection[0]) or selection[0]
+        return self.tree_districts.get(item)
+    
+    def on_district_selected(self, event):
+        self.refresh_institutions()
+    
+    def schedule_institution_search(self):
+        """Поиск запускается после паузы в наборе, а не на каждую нажатую клавишу"""
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+        self.search_job = self.root.after(SEARCH_DELAY_MS, self.refresh_institutions)
+    
+    def refresh_institutions(self):
+        """Список учреждений по выбранному району, группе соответствия и строке поиска"""
+        import institutions
+        
+        self.search_job = None
+        index = self.institutions
+        if index is None:
+            self.institution_ids = []
+            self.institution_tree.set_rows(0, None)
+            self.institutions_var.set(NO_INSTITUTIONS)
+            return
+        
+        district = self.selected_district()
+        bucket_names = [name for name, _ in institutions.BUCKETS]
+        bucket = bucket_names.index(self.bucket_var.get()) if self.bucket_var.get() in bucket_names else None
+        self.institution_ids = index.search(district, bucket, self.search_var.get())
+        self.institution_tree.set_rows(len(self.institution_ids), self.institution_row)
+        where = district or "все районы"
+        self.institutions_var.set(f"Учреждения ({where}): {len(self.institution_ids)} из {len(index)}")
+    
+    def institution_row(self, number):
+        """Значения строки списка учреждений (запрашиваются только для видимых строк)"""
+        record = self.institution_ids[number]
+        name, district, value = self.institutions.record(record)
+        return (name, district, f"{value:g}"), (f"bucket_{self.institutions.buckets[record]}",)
+    
     def save_results(self):
+        import export
+        
         if not self.results:
             messagebox.showwarning("Предупреждение", "Нет данных для сохранения")
             return
+        if self.export_worker is not None:
+            return
         
         file_path = filedialog.asksaveasfilename(
             title="Сохранить результаты",
             defaultextension=".xlsx",
-            filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")]
+            filetypes=[("Excel files", "*.xlsx"), ("CSV (разделитель ;)", "*.csv"), ("Parquet", "*.parquet"),
+                       ("All files", "*.*")]
         )
-        
-        if file_path:
-            try:
-                # Создаем DataFrame с результатами
-                df_results = pd.DataFrame(self.results)
-                
-                # Сохраняем в Excel
-                with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-                    df_results.to_excel(writer, index=False)
-                
-                # Создаем PDF с диаграммой
-                pdf_path = file_path.replace('.xlsx', '_диаграмма.pdf')
-                self.create_chart_pdf(pdf_path)
-                
-                messagebox.showinfo("Успех", "Результаты успешно сохранены!")
-                self.status_var.set("Результаты сохранены")
-                
-            except Exception as e:
-                messagebox.showerror("Ошибка", f"Ошибка при сохранении: {str(e)}")
-    
-    def create_chart_pdf(self, pdf_path):
-        """Создает PDF с диаграммой"""
-        if not self.results:
+        if not file_path:
+            return
+        try:
+            export.check_format(file_path)
+        except ValueError as e:
+            messagebox.showerror("Ошибка", str(e))
             return
-            
-        analysis_type = self.analysis_var.get()
         
-        if analysis_type == "score5":
-            self.create_bar_chart_pdf(pdf_path)
-        else:
-            self.create_menu_compliance_chart_pdf(pdf_path)
+        self.status_var.set("Сохранение результатов...")
+        self.start_export(file_path, notify=True)
+    
+    def start_export(self, file_path, notify=False):
+        """Сохраняет текущие результаты в фоновом потоке (с диаграммой, если она выбрана)"""
+        import export
+        from worker import ExportWorker
+        
+        # Таблицы (по листам, разброс, список учреждений) сохраняются в фоновом потоке, окно остается отзывчивым
+        tables = export.result_tables(self.results, self.sheet_results, self.statistics, self.institutions)
+        self.pending_export = None
+        self.export_worker = ExportWorker(tables, file_path)
+        self.export_worker.incremental = self.incremental
+        self.export_worker.notify = notify
+        self.save_btn.config(state="disabled")
+        self.export_worker.start()
+        self.root.after(WORKER_POLL_MS, self.poll_export_worker)
     
-    def create_bar_chart_pdf(self, pdf_path):
-        """Создает столбчатую диаграмму для балла нормированного к 5"""
-        # Исключаем общие показатели по региону из диаграммы
-        chart_data = [r for r in self.results if not r.get('is_region_total', False)]
+    def poll_export_worker(self):
+        """Ожидает завершения сохранения таблиц результатов"""
+        import export
         
-        if not chart_data:
+        worker = self.export_worker
+        try:
+            event = worker.events.get_nowait()
+        except queue.Empty:
+            self.root.after(WORKER_POLL_MS, self.poll_export_worker)
             return
-            
-        # Подготовка данных
-        districts = [r['district'] for r in chart_data]
-        scores = [r['score'] for r in chart_data]
-        
-        # Создание диаграммы с темной темой
-        plt.style.use('dark_background')
-        fig, ax = plt.subplots(figsize=(12, 8))
-        
-        colors = ['#3a7ca5' if score == max(scores) else '#5e5e5e' for score in scores]
-        
-        bars = ax.barh(districts, scores, color=colors, alpha=0.8)
         
-        ax.set_xlabel('Показатель (%)', fontsize=12)
-        ax.set_title('Балл нормированный к 5 по районам Чеченской республики', fontsize=14, pad=20)
-        
-        # Добавление значений на диаграмму
-        for bar, score in zip(bars, scores):
-            width = bar.get_width()
-            ax.text(width + 1, bar.get_y() + bar.get_height()/2, 
-                   f'{score}%', ha='left', va='center', fontsize=10)
+        self.export_worker = None
+        self.save_btn.config(state="normal")
+        if event[0] == 'error':
+            if worker.notify:
+                messagebox.showerror("Ошибка", f"Ошибка при сохранении: {event[1]}")
+                self.status_var.set("Ошибка при сохранении")
+            else:
+                self.status_var.set(f"Ошибка при обновлении сохраненных результатов: {event[1]}")
+        else:
+            # В режиме наблюдения файлы результатов обновляются вместе с таблицей, пока наблюдается тот же файл
+            if worker.incremental is not None and worker.incremental is self.incremental:
+                self.last_save_path = worker.file_path
+            if self.chart_var.get():
+                # PDF с диаграммами строится в фоновом потоке
+                self.status_var.set("Результаты сохранены, создание диаграммы...")
+                self.create_chart_pdf(export.chart_pdf_path(worker.file_path), worker.timer, notify=worker.notify)
+            else:
+                worker.timer.log()
+                self.status_var.set(f"Результаты сохранены ({worker.timer.summary()})")
+                if worker.notify:
+                    messagebox.showinfo("Успех", "Результаты успешно сохранены!")
         
-        plt.tight_layout()
-        fig.savefig(pdf_path, bbox_inches='tight')
-        plt.close(fig)
+        if self.pending_export is not None:
+            self.start_export(self.pending_export)
     
-    def create_menu_compliance_chart_pdf(self, pdf_path):
-        """Создает два круга для соответствия типовому меню"""
-        # Получаем общие показатели по региону
-        region_data = [r for r in self.results if r.get('is_region_total', False)]
-        
-        if not region_data:
+    def save_chart(self):
+        """Сохранение только диаграммы PDF"""
+        if not self.results:
+            messagebox.showwarning("Предупреждение", "Нет данных для диаграммы")
             return
         
-        # Создаем фигуру с тремя subplots
-        plt.style.use('dark_background')
-        fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 12))
-        
-        # Первый круг - 100% соответствие
-        perfect_percentage = next((r['score'] for r in region_data if r.get('category') == '100%'), 0)
-        perfect_sizes = [perfect_percentage, 100 - perfect_percentage]
-        perfect_colors = ['#2e7d32', '#5e5e5e']  # зеленый и серый
-        perfect_labels = ['100% соответствие', 'Не 100% соответствие']
-        
-        wedges1, texts1, autotexts1 = ax1.pie(perfect_sizes, colors=perfect_colors, autopct='%1.1f%%',
-                                             startangle=90, shadow=True)
-        ax1.set_title('100% соответствие типовому меню', fontsize=14, pad=20)
-        ax1.legend(wedges1, perfect_labels, loc="center left", bbox_to_anchor=(0.9, 0, 0.5, 1))
-        
-        # Второй круг - 75-100% соответствие
-        good_percentage = next((r['score'] for r in region_data if r.get('category') == '75-100%'), 0)
-        good_sizes = [good_percentage, 100 - good_percentage]
-        good_colors = ['#3a7ca5', '#5e5e5e']  # синий и серый
-        good_labels = ['75-100% соответствие', 'Менее 75%']
-        
-        wedges2, texts2, autotexts2 = ax2.pie(good_sizes, colors=good_colors, autopct='%1.1f%%',
-                                            startangle=90, shadow=True)
-        ax2.set_title('75-100% соответствие типовому меню', fontsize=14, pad=20)
-        ax2.legend(wedges2, good_labels, loc="center left", bbox_to_anchor=(0.9, 0, 0.5, 1))
-        
-        # Третий график - столбчатая диаграмма по районам
-        district_data = [r for r in self.results if not r.get('is_region_total', False)]
-        
-        if district_data:
-            districts = [r['district'] for r in district_data]
-            scores = [r['score'] for r in district_data]
-            
-            colors_bar = ['#3a7ca5' if score == max(scores) else '#5e5e5e' for score in scores]
-            
-            bars = ax3.barh(districts, scores, color=colors_bar, alpha=0.8)
-            ax3.set_xlabel('Средний процент соответствия (%)', fontsize=12)
-            ax3.set_title('Соответствие по районам', fontsize=14, pad=20)
-            
-            # Добавление значений на диаграмму
-            for bar, score in zip(bars, scores):
-                width = bar.get_width()
-                ax3.text(width + 1, bar.get_y() + bar.get_height()/2, 
-                       f'{score}%', ha='left', va='center', fontsize=9)
-        
-        # Четвертый график - сводная информация
-        ax4.axis('off')
-        summary_text = f"""
-        СВОДНАЯ ИНФОРМАЦИЯ ПО РЕГИОНУ:
-        
-        
-        
-        100% соответствие: {perfect_percentage}%
-        75-100% соответствие: {good_percentage}%
+        pdf_path = filedialog.asksaveasfilename(
+            title="Сохранить диаграмму",
+            defaultextension=".pdf",
+            filetypes=[("PDF", "*.pdf"), ("All files", "*.*")]
+        )
+        if pdf_path:
+            self.status_var.set("Создание диаграммы...")
+            self.create_chart_pdf(pdf_path, notify=True)
+    
+    def export_results(self, file_path):
+        """Повторное сохранение результатов после обновления наблюдаемого файла (в фоновых потоках)"""
+        if self.export_worker is not None:
+            # Предыдущее сохранение еще идет - результаты сохранятся после него
+            self.pending_export = file_path
+            return
+        self.start_export(file_path)
+    
+    def create_chart_pdf(self, pdf_path, timer=None, notify=False):
+        """Запускает построение PDF с диаграммами в фоновом потоке"""
+        from worker import ChartWorker
         
-        Лучший район: {max(district_data, key=lambda x: x['score'])['district'] if district_data else 'Н/Д'}
-        Худший район: {min(district_data, key=lambda x: x['score'])['district'] if district_data else 'Н/Д'}
-        """
+        if self.chart_worker is not None:
+            # Предыдущий отчет еще строится - новый будет построен после него
+            self.pending_chart = (pdf_path, timer, notify)
+            return
+        self.pending_chart = None
+        self.chart_worker = ChartWorker(self.results, self.analysis_var.get(), pdf_path,
+                                        last_export=self.last_chart_export, timer=timer)
+        self.chart_worker.notify = notify
+        self.chart_worker.start()
+        self.root.after(WORKER_POLL_MS, self.poll_chart_worker)
+    
+    def poll_chart_worker(self):
+        """Ожидает завершения построения PDF"""
+        worker = self.chart_worker
+        try:
+            event = worker.events.get_nowait()
+        except queue.Empty:
+            self.root.after(WORKER_POLL_MS, self.poll_chart_worker)
+            return
         
-        ax4.text(0.1, 0.9, summary_text, fontsize=12, va='top', 
-                bbox=dict(boxstyle="round", facecolor='#3d3d3d', alpha=0.7))
+        self.chart_worker = None
+        if event[0] == 'done':
+            self.last_chart_export = worker.export_key
+            worker.timer.log()
+            if event[1]:
+                self.status_var.set(f"Результаты сохранены ({worker.timer.summary()})")
+            else:
+                self.status_var.set("Результаты сохранены (диаграмма не изменилась)")
+            if worker.notify:
+                messagebox.showinfo("Успех", "Результаты успешно сохранены!")
+        else:
+            if worker.notify:
+                messagebox.showerror("Ошибка", f"Ошибка при сохранении диаграммы: {event[1]}")
+            self.status_var.set(f"Ошибка при сохранении диаграммы: {event[1]}")
         
-        plt.tight_layout()
-        fig.savefig(pdf_path, bbox_inches='tight')
-        plt.close(fig)
+        if self.pending_chart is not None:
+            self.create_chart_pdf(*self.pending_chart)
+
+def load_analysis_modules(events):
+    """Импорт модулей анализа в фоновом потоке: ('done', время загрузки) или ('error', текст)"""
+    started = time.perf_counter()
+    try:
+        for name in ANALYSIS_MODULES:
+            importlib.import_module(name)
+    except Exception as e:
+        events.put(('error', str(e)))
+    else:
+        events.put(('done', time.perf_counter() - started))
 
 def main():
     root = tk.Tk()
@@ -581,4 +850,6 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
+    # Необходимо для пула процессов в собранном PyInstaller приложении
+    multiprocessing.freeze_support()
     main()
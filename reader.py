@@ -0,0 +1,521 @@
+"""Чтение листов Excel: потоковое блоками строк и чтение только нужных анализу столбцов"""
+import logging
+import time
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+from openpyxl.reader.excel import ExcelReader
+from openpyxl.utils import column_index_from_string
+from openpyxl.worksheet._read_only import ReadOnlyWorksheet
+from openpyxl.worksheet._reader import DATA_TAG, DIMENSION_TAG, VALUE_TAG, WorkSheetParser
+from openpyxl.worksheet.dimensions import SheetDimension
+from openpyxl.xml.functions import iterparse
+from pandas.io.parsers import TextParser
+
+import analysis
+import cache
+import timing
+
+logger = logging.getLogger('district_analyzer.reader')
+
+# Количество строк листа в одном блоке
+CHUNK_SIZE = 5000
+# Строки начала листа, по которым определяется его ширина и столбцы заголовков
+PROBE_ROWS = 2000
+# Чтение отдельных столбцов используется, если пропускается хотя бы такая доля столбцов листа
+MIN_SKIPPED_SHARE = 0.25
+# Версии openpyxl (major.minor), с внутренним устройством которых проверен DeclaredSizeReader
+DECLARED_SIZE_VERSIONS = ('3.1',)
+# Столбец с ячейками разных типов хранится категориальным, если различных значений не больше этой доли строк
+CATEGORY_MAX_SHARE = 0.5
+# Атрибут DataFrame (df.attrs) с объемом таблицы до сжатия, МБ
+MEMORY_BEFORE_ATTR = 'memory_before_mb'
+# Атрибут DataFrame (df.attrs) с номерами (с 1) прочитанных столбцов листа; None - прочитан весь лист
+READ_COLUMNS_ATTR = 'read_columns'
+
+
+def read_declared_size(sheet):
+    """Размеры листа из элемента <dimension> книги read-only (ReadOnlyWorksheet._get_size)
+
+    openpyxl ищет <dimension> по концам элементов и в файле без размеров разбирает
+    лист до конца <sheetData>, причем при открытии книги - каждый лист. По схеме
+    <dimension> стоит перед <sheetData>, поэтому разбор останавливается на его начале:
+    результат тот же, а открытие книги со многими листами без размеров не читает их целиком.
+    """
+    with sheet._get_source() as source:
+        for _, element in iterparse(source, events=('start',)):
+            if element.tag == DIMENSION_TAG:
+                dimensions = SheetDimension.from_tree(element).boundaries
+                if dimensions is not None:
+                    sheet._min_column, sheet._min_row, sheet._max_column, sheet._max_row = dimensions
+                return
+            if element.tag == DATA_TAG:
+                return
+
+
+class DeclaredSizeWorksheet(ReadOnlyWorksheet):
+    """Лист read-only, размеры которого определяются read_declared_size"""
+
+    _get_size = read_declared_size
+
+
+class DeclaredSizeReader(ExcelReader):
+    """Открытие книги read-only с листами DeclaredSizeWorksheet
+
+    Повторяет ветку read-only ExcelReader.read_worksheets: остальные книги процесса
+    (в том числе открытые pandas) читаются openpyxl без изменений.
+    """
+
+    def read_worksheets(self):
+        for sheet, rel in self.parser.find_sheets():
+            if rel.target not in self.valid_files:
+                continue
+            if "chartsheet" in rel.Type:
+                self.read_chartsheet(sheet, rel)
+                continue
+            worksheet = DeclaredSizeWorksheet(self.wb, sheet.name, rel.target, self.shared_strings)
+            worksheet.sheet_state = sheet.state
+            self.wb._sheets.append(worksheet)
+
+
+def open_workbook(file_path):
+    """Книга read-only для чтения значений ячеек
+
+    В проверенных версиях openpyxl (DECLARED_SIZE_VERSIONS) листы открываются через
+    DeclaredSizeReader, в остальных - обычным load_workbook.
+    """
+    if '.'.join(openpyxl.__version__.split('.')[:2]) not in DECLARED_SIZE_VERSIONS:
+        return load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+    workbook_reader = DeclaredSizeReader(file_path, read_only=True, data_only=True, keep_links=False)
+    workbook_reader.read()
+    return workbook_reader.wb
+
+
+def convert_value(value, data_type):
+    """Значение ячейки в том же виде, что и при чтении через pd.read_excel"""
+    if value is None:
+        return ""
+    if data_type == TYPE_ERROR:
+        return np.nan
+    if data_type == TYPE_NUMERIC:
+        number = int(value)
+        if number == value:
+            return number
+        return float(value)
+    return value
+
+
+def convert_cell(cell):
+    return convert_value(cell.value, cell.data_type)
+
+
+def parse_rows(rows, width):
+    """Разбирает строки листа по правилам pd.read_excel(header=None)
+
+    Пустые строки сохраняются (как в pd.read_excel): блок из одних пустых строк -
+    таблица из NaN той же длины, а не ошибка разбора.
+    """
+    rows = [row + [""] * (width - len(row)) for row in rows]
+    return TextParser(rows, header=None, skip_blank_lines=False).read()
+
+
+class SheetStream:
+    """Чтение первого листа книги в режиме read-only блоками по chunk_size строк"""
+
+    def __init__(self, file_path, chunk_size=CHUNK_SIZE):
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        self.rows_read = 0
+        self.data_width = 0  # Фактическая ширина данных (без пустых столбцов справа)
+
+        workbook = open_workbook(file_path)
+        try:
+            # Ширина по размерам, записанным в файле
+            self.declared_width = workbook.worksheets[0].max_column or 0
+        finally:
+            workbook.close()
+
+    def rows(self):
+        """Строки листа в виде списков значений без пустых ячеек справа"""
+        self.rows_read = 0
+        self.data_width = 0
+        workbook = open_workbook(self.file_path)
+        try:
+            sheet = workbook.worksheets[0]
+            sheet.reset_dimensions()
+
+            for row in sheet.rows:
+                converted_row = [convert_cell(cell) for cell in row]
+                while converted_row and converted_row[-1] == "":
+                    converted_row.pop()
+                self.data_width = max(self.data_width, len(converted_row))
+                self.rows_read += 1
+                yield converted_row
+        finally:
+            workbook.close()
+
+    def chunks(self, width, rows=None):
+        """Возвращает блоки строк в виде DataFrame шириной width (по умолчанию строки всего листа)"""
+        buffer = []
+        for row in self.rows() if rows is None else rows:
+            buffer.append(row[:width])
+
+            if len(buffer) >= self.chunk_size:
+                if width:
+                    yield parse_rows(buffer, width)
+                buffer = []
+
+        if buffer and width:
+            yield parse_rows(buffer, width)
+
+
+def stream_analysis(file_path, analysis_type, districts=None, chunk_size=CHUNK_SIZE, timer=None):
+    """Потоковый анализ: после каждого блока возвращает (прочитано строк, промежуточный анализ)
+
+    timer (timing.RunTimer) получает раздельные замеры чтения и анализа блоков.
+    """
+    stream = SheetStream(file_path, chunk_size)
+    width = stream.declared_width
+    while True:
+        engine = analysis.create_engine(analysis_type, districts)
+        for chunk in timing.timed(stream.chunks(width), timer, 'чтение'):
+            start = time.perf_counter()
+            engine.update(chunk)
+            if timer is not None:
+                timer.add('анализ', time.perf_counter() - start, len(chunk))
+            yield stream.rows_read, engine
+
+        if stream.data_width == width:
+            yield stream.rows_read, engine
+            return
+
+        # Заявленные размеры листа не совпали с данными - повторяем проход с фактической шириной
+        width = stream.data_width
+
+
+class ColumnParser(WorkSheetParser):
+    """Разбор строк листа с преобразованием значений только в столбцах columns (None - во всех)
+
+    Для остальных ячеек определяется лишь, пустая ли ячейка и есть ли в ней ключевое
+    слово заголовка; числа, даты и координаты в них не разбираются. Для каждой строки
+    parse() возвращает (номер строки, (ширина, {столбец: значение}, столбец заголовка)):
+    ширина - как у строки pd.read_excel без пустых ячеек справа, столбец заголовка -
+    первый столбец с ключевым словом или None. Столбцы нумеруются с 1.
+    """
+
+    def __init__(self, src, shared_strings, columns, keywords, **kwargs):
+        super().__init__(src, shared_strings, **kwargs)
+        self.columns = None if columns is None else set(columns)
+        self.keywords = keywords
+        # Общие строки с ключевыми словами (ячейки со строками ссылаются на них по номеру)
+        self.keyword_strings = {index for index, text in enumerate(shared_strings)
+                                if isinstance(text, str) and self.has_keyword(text)}
+        self.column_numbers = {}  # Буквы столбца -> номер
+
+    def has_keyword(self, value):
+        return has_keyword(value, self.keywords)
+
+    def column_number(self, coordinate):
+        letters = coordinate.rstrip('0123456789')
+        number = self.column_numbers.get(letters)
+        if number is None:
+            number = self.column_numbers[letters] = column_index_from_string(letters)
+        return number
+
+    def parse_row(self, row):
+        # Номер строки - как в WorkSheetParser.parse_row
+        number = row.get('r')
+        if number is not None:
+            try:
+                self.row_counter = int(number)
+            except ValueError:
+                value = float(number)
+                if not value.is_integer():
+                    raise ValueError(f"{number} is not a valid row number")
+                self.row_counter = int(value)
+        else:
+            self.row_counter += 1
+        self.col_counter = 0
+
+        width = 0
+        values = {}
+        header = None
+        for element in row:
+            coordinate = element.get('r')
+            column = self.column_number(coordinate) if coordinate else self.col_counter + 1
+            if column <= self.col_counter:
+                # Ячейки не по порядку - строка разбирается полностью
+                return self.row_counter, self.parse_row_fully(row)
+
+            data_type = element.get('t', 'n')
+            keep = self.columns is None or column in self.columns
+            if keep or data_type in ('inlineStr', 'str'):
+                cell = self.parse_cell(element)
+                value = convert_value(cell['value'], cell['data_type'])
+                if keep:
+                    values[column] = value
+                filled = value != ""
+                keyword = filled and self.has_keyword(value)
+            else:
+                self.col_counter = column
+                text = element.findtext(VALUE_TAG)
+                filled = bool(text)
+                keyword = False
+                if filled and data_type == 's':
+                    index = int(text)
+                    filled = self.shared_strings[index] != ""
+                    keyword = index in self.keyword_strings
+
+            if filled:
+                width = column
+            if keyword and header is None:
+                header = column
+        return self.row_counter, (width, values, header)
+
+    def parse_row_fully(self, row):
+        """Разбор строки с ячейками не по порядку столбцов (как ReadOnlyWorksheet._get_row)"""
+        self.col_counter = 0
+        cells = [self.parse_cell(element) for element in row]
+        if not cells:
+            return 0, {}, None
+        converted_row = [""] * cells[-1]['column']
+        for cell in cells:
+            if cell['column'] <= len(converted_row):
+                converted_row[cell['column'] - 1] = convert_value(cell['value'], cell['data_type'])
+        while converted_row and converted_row[-1] == "":
+            converted_row.pop()
+
+        values = {column: value for column, value in enumerate(converted_row, 1)
+                  if self.columns is None or column in self.columns}
+        header = next((column for column, value in enumerate(converted_row, 1) if self.has_keyword(value)), None)
+        return len(converted_row), values, header
+
+
+def has_keyword(value, keywords):
+    """Есть ли в ячейке ключевое слово заголовка"""
+    if not isinstance(value, str):
+        return False
+    lowered = value.lower()
+    return any(keyword in lowered for keyword in keywords)
+
+
+class SheetScan:
+    """Проход по листу книги (read-only): строки со значениями столбцов columns (None - всех столбцов)
+    и фактическая структура листа"""
+
+    def __init__(self, sheet, columns, keywords, max_rows=None, progress=None):
+        self.columns = None if columns is None else sorted(columns)
+        self.rows = []  # (ширина строки, {столбец: значение})
+        self.width = 0  # Ширина данных листа (без пустых столбцов справа)
+        self.header_columns = set()  # Первые столбцы с ключевыми словами в строках
+
+        workbook = sheet.parent
+        with sheet._get_source() as source:
+            parser = ColumnParser(source, sheet._shared_strings, columns, keywords,
+                                  data_only=workbook.data_only, epoch=workbook.epoch,
+                                  date_formats=workbook._date_formats,
+                                  timedelta_formats=workbook._timedelta_formats)
+            self.read(parser, max_rows, progress)
+
+    def read(self, parser, max_rows, progress=None):
+        """progress(прочитано строк) вызывается через каждые CHUNK_SIZE строк; исключение в нем прерывает чтение"""
+        # Пропущенные в файле строки становятся пустыми, повторы номеров пропускаются
+        # (как в ReadOnlyWorksheet._cells_by_row)
+        counter = 1
+        next_report = CHUNK_SIZE
+        for index, (width, values, header) in parser.parse():
+            if max_rows is not None and len(self.rows) >= max_rows:
+                break
+            if progress is not None and len(self.rows) >= next_report:
+                progress(len(self.rows))
+                next_report += CHUNK_SIZE
+            for _ in range(counter, index):
+                counter += 1
+                self.rows.append((0, {}))
+            if counter <= index:
+                counter += 1
+                self.rows.append((width, values))
+                self.width = max(self.width, width)
+                if header is not None:
+                    self.header_columns.add(header)
+
+    def frame(self):
+        """Строки со значениями столбцов columns по правилам pd.read_excel(header=None)"""
+        last_row = max((i for i, (width, _) in enumerate(self.rows) if width), default=-1)
+        columns = range(1, self.width + 1) if self.columns is None else self.columns
+        data = [[values.get(column, "") for column in columns] for _, values in self.rows[:last_row + 1]]
+        if not data:
+            return pd.DataFrame()
+        # Пустые строки сохраняются, как в pd.read_excel: от соседства строк зависит поиск заголовков
+        return TextParser(data, header=None, skip_blank_lines=False).read()
+
+
+def plan_columns(width, header_columns, requirements):
+    """Номера (с 1) столбцов листа шириной width, нужных анализу, или None, если читать выгоднее весь лист"""
+    leading, trailing, _ = requirements
+    # Первые и последние столбцы не должны пересекаться, иначе изменится их положение в прочитанной таблице
+    if width <= leading + trailing:
+        return None
+    columns = set(range(1, leading + 1)) | set(range(width - trailing + 1, width + 1)) | set(header_columns)
+    if len(columns) > width * (1 - MIN_SKIPPED_SHARE):
+        return None
+    return sorted(columns)
+
+
+def read_needed_columns(file_path, requirements, sheet=0, progress=None):
+    """Лист .xlsx (номер или название) только со столбцами, которые использует анализ (analysis.column_requirements)
+
+    Первые PROBE_ROWS строк просматриваются без разбора значений, чтобы найти ширину
+    листа и столбцы заголовков; затем весь лист читается с преобразованием значений
+    только этих столбцов. Прочитанные столбцы идут в исходном порядке, поэтому
+    первые, последние и найденные по заголовку столбцы анализ находит на тех же
+    местах и результаты совпадают с чтением всего листа. Если структура дальше
+    первых строк другая, проход повторяется с фактической (как в stream_analysis).
+    Если пропускать нечего, тем же разбором читаются все столбцы (как pd.read_excel).
+    progress(прочитано строк) вызывается по ходу чтения (SheetScan.read).
+
+    Разбор опирается на внутреннее устройство openpyxl (WorkSheetParser, источник и общие
+    строки листа, форматы дат книги); если в установленной версии оно другое, лист целиком
+    читается через pd.read_excel.
+    """
+    keywords = requirements[2]
+    workbook = open_workbook(file_path)
+    try:
+        worksheet = workbook.worksheets[sheet] if isinstance(sheet, int) else workbook[sheet]
+        declared_width = worksheet.max_column
+        worksheet.reset_dimensions()
+
+        # Если даже по записанным в файле размерам пропускать нечего, лист читается целиком без пробы
+        columns = None
+        if declared_width is None or plan_columns(declared_width, (), requirements) is not None:
+            probe = SheetScan(worksheet, (), keywords, PROBE_ROWS)
+            width, header_columns = probe.width, probe.header_columns
+            columns = plan_columns(width, header_columns, requirements)
+
+        while True:
+            scan = SheetScan(worksheet, columns, keywords, progress=progress)
+            if columns is None or (scan.width == width and scan.header_columns <= set(columns)):
+                df = scan.frame()
+                break
+            width, header_columns = scan.width, scan.header_columns
+            columns = plan_columns(width, header_columns, requirements)
+    except (AttributeError, TypeError):
+        logger.warning("Разбор листа не поддерживает openpyxl %s, лист читается pd.read_excel",
+                       openpyxl.__version__, exc_info=True)
+        df, columns = pd.read_excel(file_path, header=None, sheet_name=sheet), None
+    finally:
+        workbook.close()
+    df.attrs[READ_COLUMNS_ATTR] = columns
+    return df
+
+
+def sheet_header_columns(df, keywords):
+    """Первые (с 1) столбцы с ключевыми словами в строках листа, прочитанного целиком
+    (как SheetScan.header_columns)"""
+    header_columns = set()
+    remaining = np.ones(len(df), dtype=bool)  # Строки, в которых ключевое слово еще не встретилось
+    for number, (_, column) in enumerate(df.items(), 1):
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            # Ключевые слова ищутся по одному разу в каждом различном значении
+            categories = np.array([has_keyword(value, keywords) for value in column.cat.categories] + [False])
+            hits = categories[column.cat.codes.to_numpy()]
+        elif column.dtype.kind == 'O':
+            hits = np.fromiter((has_keyword(value, keywords) for value in column), dtype=bool, count=len(column))
+        else:
+            continue
+        hits &= remaining
+        if hits.any():
+            header_columns.add(number)
+            remaining &= ~hits
+    return header_columns
+
+
+def select_needed_columns(df, requirements):
+    """Столбцы, нужные анализу, из листа, прочитанного целиком: те же, что читает read_needed_columns"""
+    columns = plan_columns(df.shape[1], sheet_header_columns(df, requirements[2]), requirements)
+    if columns is None:
+        return df
+    selected = df.iloc[:, [column - 1 for column in columns]].set_axis(range(len(columns)), axis=1)
+    # Объем до сжатия - доля объема всего листа по объему выбранных столбцов
+    before, after = frame_memory(df)
+    selected.attrs = {READ_COLUMNS_ATTR: columns, MEMORY_BEFORE_ATTR: before * frame_memory_mb(selected) / after}
+    return selected
+
+
+def frame_memory_mb(df):
+    """Объем таблицы в памяти (МБ) с учетом строк и других объектов Python в ячейках"""
+    return df.memory_usage(deep=True).sum() / 2 ** 20
+
+
+def compact_column(column):
+    """Столбец в компактном типе с теми же значениями ячеек
+
+    Целые числа - наименьший целый тип, дробные - float32, только если все значения
+    представимы в нем точно (округление изменило бы средние и границы групп).
+    Столбцы с ячейками разных типов (текст заголовков, числа, даты) с повторяющимися
+    значениями - категориальные: каждое значение хранится один раз, строки - номерами.
+    """
+    kind = column.dtype.kind
+    if kind in 'iu':
+        return pd.to_numeric(column, downcast='integer')
+    if kind == 'f':
+        narrow = column.astype(np.float32)
+        if np.array_equal(narrow.to_numpy(dtype=np.float64), column.to_numpy(), equal_nan=True):
+            return narrow
+        return column
+    if kind == 'O' and len(column) and column.nunique() <= CATEGORY_MAX_SHARE * len(column):
+        return column.astype('category')
+    return column
+
+
+def compact_frame(df):
+    """Таблица листа в компактных типах столбцов (compact_column); объем до сжатия - в df.attrs"""
+    before = frame_memory_mb(df)
+    compact = pd.DataFrame({label: compact_column(column) for label, column in df.items()}, index=df.index)
+    compact.attrs.update(df.attrs)
+    compact.attrs[MEMORY_BEFORE_ATTR] = before
+    return compact
+
+
+def frame_memory(df):
+    """(объем таблицы до сжатия, после сжатия) в МБ"""
+    after = frame_memory_mb(df)
+    return df.attrs.get(MEMORY_BEFORE_ATTR, after), after
+
+
+def read_sheet(file_path, analysis_type, use_cache=True, sheet=0, progress=None):
+    """Лист для анализа (по умолчанию первый) в компактных типах столбцов (compact_frame):
+    у .xlsx читаются только нужные анализу столбцы, остальные файлы - целиком
+
+    progress(прочитано строк) вызывается по ходу чтения .xlsx (если лист не взят из кэша).
+    Лист, который уже есть в кэше целиком (его читал анализ, которому нужны все столбцы),
+    не разбирается заново: нужные столбцы берутся из него.
+    """
+    # Первый лист читается с прежним ключом кэша; в кэше хранится уже сжатая таблица
+    sheet_options = {} if sheet == 0 else {'sheet_name': sheet}
+    whole_sheet = dict(header=None, **sheet_options)
+    requirements = analysis.column_requirements(analysis_type)
+    if requirements is None or not file_path.lower().endswith('.xlsx'):
+        def load():
+            return compact_frame(pd.read_excel(file_path, header=None, sheet_name=sheet))
+        if use_cache:
+            return cache.cached_frame(file_path, load, **whole_sheet)
+        return load()
+
+    if not use_cache:
+        return compact_frame(read_needed_columns(file_path, requirements, sheet, progress))
+    df = cache.lookup_frame(file_path, **whole_sheet)
+    if df is not None:
+        return select_needed_columns(df, requirements)
+    needed_columns = dict(columns=requirements, **sheet_options)
+    df = cache.lookup_frame(file_path, **needed_columns)
+    if df is None:
+        df = compact_frame(read_needed_columns(file_path, requirements, sheet, progress))
+        # Лист, из которого ничего не пропущено, сохраняется как прочитанный целиком: из него
+        # берутся столбцы и для других анализов
+        whole = df.attrs.get(READ_COLUMNS_ATTR) is None
+        cache.store_frame(file_path, df, **(whole_sheet if whole else needed_columns))
+    return df
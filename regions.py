@@ -0,0 +1,224 @@
+"""Справочник районов (муниципальных образований) по регионам
+
+Справочник загружается из файла regions.json (или файла из переменной
+DISTRICT_ANALYZER_REGIONS):
+
+    {
+        "Чеченская Республика": [
+            "Аргун",
+            {"name": "Грозный", "aliases": ["город Грозный"]}
+        ]
+    }
+
+Названия и синонимы сравниваются после нормализации: регистр, ё/е, дефисы и
+тире, лишние пробелы, префикс "г." / "город". Точное совпадение ищется по
+хэш-индексу, вхождение в текст - автоматом Ахо-Корасик, поэтому время поиска
+не зависит от числа районов в справочнике.
+"""
+import json
+import os
+import re
+import sys
+
+# Встроенный справочник (если файл справочника не найден)
+DEFAULT_REGION = "Чеченская Республика"
+DEFAULT_DISTRICTS = [
+    "Аргун", "Ачхой-Мартановский", "Веденский", "Грозненский", "Грозный",
+    "Гудермесский", "Гудермес", "Итум-Калинский", "Курчалоевский", "Надтеречный",
+    "Наурский", "Ножай-Юртовский", "Серноводский", "Урус-Мартановский",
+    "Шалинский", "Шаройский", "Шатойский", "Шелковской"
+]
+
+REGIONS_FILE = 'regions.json'
+
+# Дефис, неразрывный дефис, тире и знак минус
+_DASHES = re.compile(r'[\-\u2010-\u2015\u2212]')
+_SPACES = re.compile(r'\s+')
+_CITY_PREFIX = re.compile(r'^(?:г\.|г |город )\s*')
+
+
+def normalize_text(text):
+    """Нормализация текста для поиска вхождений: регистр, ё/е, дефисы, пробелы"""
+    text = text.lower().replace('ё', 'е')
+    text = _DASHES.sub(' ', text)
+    return _SPACES.sub(' ', text).strip()
+
+
+def normalize_name(name):
+    """Нормализация названия для точного сравнения (дополнительно без префикса "г." / "город")"""
+    return _CITY_PREFIX.sub('', normalize_text(name))
+
+
+def default_regions_path():
+    """Файл справочника: переменная DISTRICT_ANALYZER_REGIONS или regions.json рядом с программой"""
+    path = os.environ.get('DISTRICT_ANALYZER_REGIONS')
+    if path:
+        return path
+    # В собранном PyInstaller приложении файлы данных распаковываются в sys._MEIPASS
+    base = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base, REGIONS_FILE)
+
+
+class SubstringAutomaton:
+    """Автомат Ахо-Корасик: все вхождения набора строк в текст за один проход по тексту"""
+
+    def __init__(self, patterns):
+        self.transitions = [{}]
+        self.outputs = [[]]  # Номера строк, оканчивающихся в состоянии
+        for index, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                if char not in self.transitions[state]:
+                    self.transitions.append({})
+                    self.outputs.append([])
+                    self.transitions[state][char] = len(self.transitions) - 1
+                state = self.transitions[state][char]
+            self.outputs[state].append(index)
+
+        # Ссылки неудач строятся обходом бора в ширину
+        self.fail = [0] * len(self.transitions)
+        queue = list(self.transitions[0].values())
+        for state in queue:
+            for char, next_state in self.transitions[state].items():
+                fallback = self.fail[state]
+                while fallback and char not in self.transitions[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.transitions[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.outputs[next_state] = self.outputs[next_state] + self.outputs[self.fail[next_state]]
+                queue.append(next_state)
+
+    def find(self, text):
+        """Номера всех строк набора, входящих в текст"""
+        found = set()
+        state = 0
+        transitions, fail, outputs = self.transitions, self.fail, self.outputs
+        for char in text:
+            while state and char not in transitions[state]:
+                state = fail[state]
+            state = transitions[state].get(char, 0)
+            if outputs[state]:
+                found.update(outputs[state])
+        return found
+
+
+class DistrictRegistry:
+    """Районы с синонимами и индексами поиска
+
+    names - названия районов в порядке справочника (в таком виде они выводятся в
+    результатах). Если в тексте встречаются несколько районов, выбирается район,
+    указанный в справочнике раньше.
+    """
+
+    def __init__(self, entries):
+        # entries: [(регион, название, [синонимы])]
+        self.entries = list(entries)
+        self.regions = list(dict.fromkeys(region for region, _, _ in self.entries))
+
+        counts = {}
+        for _, name, _ in self.entries:
+            counts[name] = counts.get(name, 0) + 1
+        # Совпадающие названия из разных регионов различаются регионом в скобках
+        self.names = [name if counts[name] == 1 else f"{name} ({region})" for region, name, _ in self.entries]
+        self.region_of = {display: region for display, (region, _, _) in zip(self.names, self.entries)}
+
+        # Хэш-индекс точных совпадений; при повторе ключа остается район, указанный раньше
+        self.exact_index = {}
+        patterns = {}
+        for order, (display, (_, name, aliases)) in enumerate(zip(self.names, self.entries)):
+            for variant in [name, *aliases]:
+                if not normalize_text(variant):
+                    continue
+                self.exact_index.setdefault(normalize_name(variant), display)
+                patterns.setdefault(normalize_text(variant), order)
+        self.pattern_orders = list(patterns.values())
+        self.automaton = SubstringAutomaton(patterns)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    @classmethod
+    def from_names(cls, names, region=DEFAULT_REGION):
+        return cls((region, name, []) for name in names)
+
+    @classmethod
+    def from_file(cls, path, regions=None):
+        """Загружает справочник из JSON; regions - список регионов для загрузки (по умолчанию все)"""
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+
+        entries = []
+        for region, districts in data.items():
+            if regions and region not in regions:
+                continue
+            for district in districts:
+                if isinstance(district, str):
+                    entries.append((region, district, []))
+                else:
+                    entries.append((region, district['name'], list(district.get('aliases', []))))
+        if regions:
+            missing = [region for region in regions if region not in data]
+            if missing:
+                raise ValueError(f"В справочнике нет регионов: {', '.join(missing)}")
+        return cls(entries)
+
+    def lookup_name(self, text):
+        """Район, название или синоним которого совпадает с текстом (или None)"""
+        return self.exact_index.get(normalize_name(text))
+
+    def search_text(self, text):
+        """Район, название или синоним которого входит в текст (или None)"""
+        found = self.automaton.find(normalize_text(text))
+        if not found:
+            return None
+        return self.names[min(self.pattern_orders[index] for index in found)]
+
+    def lookup(self, strings):
+        """Точное сопоставление столбца строк с районами (разбор для уникальных значений)"""
+        return self._map_unique(strings, self.lookup_name)
+
+    def search(self, strings):
+        """Поиск районов по вхождению в строки столбца (разбор для уникальных значений)"""
+        return self._map_unique(strings, self.search_text)
+
+    @staticmethod
+    def _map_unique(strings, func):
+        # numpy и pandas загружаются при первом поиске: справочник нужен окну программы сразу при запуске
+        import numpy as np
+        import pandas as pd
+
+        codes, uniques = pd.factorize(strings)
+        matched = np.array([func(text) for text in uniques] + [None], dtype=object)
+        return matched[codes]
+
+
+def load_registry(path=None, regions=None):
+    """Справочник из файла (по умолчанию regions.json); без файла - встроенный список районов"""
+    path = path or default_regions_path()
+    if not os.path.exists(path):
+        if regions and regions != [DEFAULT_REGION]:
+            raise FileNotFoundError(f"Файл справочника районов не найден: {path}")
+        return DistrictRegistry.from_names(DEFAULT_DISTRICTS)
+    return DistrictRegistry.from_file(path, regions)
+
+
+_default_registry = None
+
+
+def default_registry():
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = load_registry()
+    return _default_registry
+
+
+def as_registry(districts):
+    """Справочник из списка названий районов (справочник возвращается как есть, None - справочник по умолчанию)"""
+    if districts is None:
+        return default_registry()
+    if isinstance(districts, DistrictRegistry):
+        return districts
+    return DistrictRegistry.from_names(districts)
@@ -0,0 +1,154 @@
+"""Правила анализа отчетов ФЦМПО
+
+Тип анализа объявляется правилом AnalysisRule, а не отдельным алгоритмом:
+
+    строки    - где на листе строки с данными и к какому району они относятся:
+                DistrictBlocks - блоки под строкой с названием района,
+                InstitutionRows - строки учреждений с районом в отдельном столбце
+    значение  - столбец числа (ValueColumn): по ключевому слову заголовка или первое
+                значение из допустимого диапазона в последних столбцах
+    показатель района - среднее значений (в процентах от percent_of, если он задан)
+    группы    - доли значений по региону (строки общих показателей)
+
+Все правила выполняются общим ядром analysis.RuleEngine за один проход по листу:
+разбор первого столбца, поиск заголовков и преобразование столбцов в числа
+выполняются один раз для всех правил. Отчет того же вида добавляется объявлением
+правила через register_rule, без нового обхода строк.
+
+Модуль не загружает pandas: окно строит по RULES переключатель типов анализа
+до загрузки библиотек анализа.
+"""
+# Режим, в котором все зарегистрированные анализы выполняются за один проход по листу
+ALL_ANALYSES = 'all'
+
+DATE_PATTERN = r'\d{1,2}\.\d{1,2}\.\d{4}'
+SCORE5_HEADER = "нормированный к5"
+# Сколько последних столбцов просматривается в поиске балла без заголовка
+SCORE5_FALLBACK_COLUMNS = 9
+# Процент соответствия типовому меню - в одном из последних столбцов
+COMPLIANCE_COLUMNS = 2
+# Группы значений для долей: полное соответствие и 75-100% (границы включительно)
+COMPLIANCE_BUCKETS = {'100%': (100, 100), '75-100%': (75, 100)}
+# Гистограммы для медианы и процентилей: (от, до, шаг) - баллы от 0 до 5 и проценты
+SCORE5_SKETCH = (0, 5, 0.01)
+COMPLIANCE_SKETCH = (0, 100, 0.1)
+# Ключевые слова в названиях образовательных учреждений
+INSTITUTION_KEYWORDS = ('МБОУ', 'СОШ', 'ГБОУ', 'Школа')
+
+
+class DistrictBlocks:
+    """Строка с названием района в первом столбце открывает блок до следующего района;
+    строки с данными - строки блока, первый столбец которых соответствует marker (регулярное выражение)"""
+
+    leading_columns = 1
+
+    def __init__(self, marker=DATE_PATTERN):
+        self.marker = marker
+
+
+class InstitutionRows:
+    """Строки учреждений: первый столбец содержит одно из ключевых слов (с учетом регистра),
+    район ищется в столбце district_column; строки без района пропускаются"""
+
+    def __init__(self, keywords=INSTITUTION_KEYWORDS, district_column=1):
+        self.keywords = tuple(keywords)
+        self.district_column = district_column
+        self.leading_columns = district_column + 1
+
+
+class ValueColumn:
+    """Столбец значения строки с данными
+
+    header - ключевое слово заголовка (без учета регистра) в строке над строкой данных:
+    если оно найдено, значение берется из этого столбца. Иначе - первое значение из
+    value_range (границы включительно) среди последних trailing столбцов, кроме первого,
+    справа налево (from_right) или слева направо.
+    """
+
+    def __init__(self, trailing, value_range, header=None, from_right=True):
+        self.trailing = trailing
+        self.value_range = value_range
+        self.header = header
+        self.from_right = from_right
+
+
+class AnalysisRule:
+    """Тип анализа (значение переключателя типов анализа)
+
+    percent_of - значения переводятся в проценты от этого числа (None - значения уже в процентах);
+    count_all_rows - число записей района: все найденные строки, а не только строки со значением;
+    buckets - группы {название: (от, до)} для долей по региону: при их наличии результаты
+    дополняются строками общих показателей, а разброс - строкой по всему региону;
+    sketch - гистограмма (от, до, шаг) для медианы и процентилей;
+    institutions - собирать указатель учреждений для детализации по районам (для InstitutionRows);
+    column_title - заголовок столбца показателя в таблице результатов;
+    chart - компоновка страницы отчета PDF (charts.PAGE_LAYOUTS), chart_title - заголовок диаграммы.
+    """
+
+    def __init__(self, analysis_type, title, rows, value, percent_of=None, count_all_rows=False, buckets=None,
+                 sketch=COMPLIANCE_SKETCH, institutions=False, column_title=None, chart='bars', chart_title=None):
+        self.analysis_type = analysis_type
+        self.title = title
+        self.rows = rows
+        self.value = value
+        self.percent_of = percent_of
+        self.count_all_rows = count_all_rows
+        self.buckets = dict(buckets or {})
+        self.sketch = sketch
+        self.institutions = institutions
+        self.column_title = column_title or f"{title} (%)"
+        self.chart = chart
+        self.chart_title = chart_title or f"{title} по районам"
+
+    @property
+    def leading_columns(self):
+        return self.rows.leading_columns
+
+    @property
+    def trailing_columns(self):
+        return self.value.trailing
+
+    @property
+    def header_keywords(self):
+        return (self.value.header,) if self.value.header else ()
+
+
+# Зарегистрированные типы анализа в порядке переключателя
+RULES = {}
+
+
+def register_rule(rule):
+    """Регистрирует тип анализа; он автоматически участвует в общем проходе режима 'all'"""
+    RULES[rule.analysis_type] = rule
+    return rule
+
+
+def selected_rules(analysis_type):
+    """Правила типа анализа (для режима 'all' - все зарегистрированные)"""
+    if analysis_type == ALL_ANALYSES:
+        return list(RULES.values())
+    return [RULES[analysis_type]]
+
+
+register_rule(AnalysisRule(
+    'score5', "Балл нормированный к 5",
+    # Район и дата - в первом столбце, балл - под заголовком или в последних столбцах
+    rows=DistrictBlocks(DATE_PATTERN),
+    value=ValueColumn(SCORE5_FALLBACK_COLUMNS, (0, 5), header=SCORE5_HEADER),
+    percent_of=5,
+    count_all_rows=True,
+    sketch=SCORE5_SKETCH,
+    chart_title="Балл нормированный к 5 по районам Чеченской республики",
+))
+
+register_rule(AnalysisRule(
+    'menu_compliance', "Соответствие типовому меню",
+    # Учреждение и район - в первых двух столбцах, процент - в последних
+    rows=InstitutionRows(INSTITUTION_KEYWORDS, district_column=1),
+    value=ValueColumn(COMPLIANCE_COLUMNS, (0, 100), from_right=False),
+    buckets=COMPLIANCE_BUCKETS,
+    sketch=COMPLIANCE_SKETCH,
+    institutions=True,
+    column_title="Соответствие меню (%)",
+    chart='menu_compliance',
+))
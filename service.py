@@ -0,0 +1,292 @@
+"""Локальный сервис анализа: HTTP на localhost с пулом заранее запущенных процессов
+
+Сервис держит запущенными интерпретатор и процессы анализа (pandas, openpyxl и
+справочник районов загружаются один раз при старте) и общий кэш разобранных книг,
+поэтому копии программы у разных сотрудников не тратят время на запуск библиотек
+и повторный разбор одних и тех же отчетов. Запросы (JSON):
+
+    GET  /health   -> {"status": "ok", "workers": N, "pending": M, "max_pending": K}
+    POST /analyze  {"file_path": "...", "analysis_type": "score5",
+                    "sheets": null | "all" | ["Лист1", ...], "record_history": true}
+                   -> {"results": [...], "sheet_results": [...] | null, "statistics": [...],
+                       "institutions": {"names": [...], "districts": [...], "values": [...]} | null,
+                       "errors": [...], "timings": [...]}
+
+file_path - путь, доступный процессу сервиса. Задания выполняются в пуле процессов;
+если заданий в работе больше max_pending, сервис сразу отвечает 503. Ошибки
+возвращаются как {"error": "текст"} с кодом 400, 404, 503 или 500.
+"""
+import json
+import logging
+import os
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger('district_analyzer.service')
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# Адрес сервиса для графического интерфейса и консольного режима (например, http://127.0.0.1:8765)
+SERVICE_ENV = 'DISTRICT_ANALYZER_SERVICE'
+# Предельное число заданий в работе и в очереди
+MAX_PENDING = 16
+# Ожидание ответа на задание анализа (с)
+CLIENT_TIMEOUT = 600
+# Ожидание ответа на проверку доступности (с)
+HEALTH_TIMEOUT = 2
+
+
+class ServiceError(Exception):
+    """Ошибка задания с кодом HTTP (status None - сервис недоступен)"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# Справочник районов процесса пула (передается один раз при запуске процесса)
+_worker_districts = None
+
+
+def init_worker(districts):
+    """Подготовка процесса пула: библиотеки и справочник загружаются до первого задания"""
+    global _worker_districts
+    import analysis  # noqa: F401
+    import reader  # noqa: F401
+    _worker_districts = districts
+
+
+def ping():
+    return os.getpid()
+
+
+def analyze_sheet_job(file_path, sheet, analysis_type):
+    import sheets
+    return sheets.analyze_sheet(file_path, sheet, analysis_type, _worker_districts)
+
+
+def to_json(data):
+    # Значения numpy (числа в результатах) преобразуются в числа Python
+    return json.dumps(data, ensure_ascii=False, default=lambda value: value.item() if hasattr(value, 'item')
+                      else str(value)).encode('utf-8')
+
+
+def institution_records(index):
+    """Учреждения указателя столбцами для ответа сервиса (None - анализ без учреждений)"""
+    if index is None:
+        return None
+    return {
+        'names': index.names.tolist(),
+        'districts': [index.districts[code] for code in index.district_codes.tolist()],
+        'values': index.values.tolist(),
+    }
+
+
+class AnalysisService:
+    """Пул процессов анализа с ограничением очереди заданий"""
+
+    def __init__(self, districts=None, workers=None, max_pending=MAX_PENDING):
+        import analysis
+        import regions
+
+        self.analyses = set(analysis.ANALYSES) | {analysis.ALL_ANALYSES}
+        self.districts = regions.as_registry(districts)
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                            initargs=(self.districts,))
+        self.pending = 0
+        self.lock = threading.Lock()
+
+    def warm_up(self):
+        """Запускает все процессы пула сразу, а не при первых заданиях"""
+        for future in [self.executor.submit(ping) for _ in range(self.workers)]:
+            future.result()
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def health(self):
+        return {'status': 'ok', 'workers': self.workers, 'pending': self.pending, 'max_pending': self.max_pending}
+
+    def analyze(self, request):
+        """Выполняет задание анализа; ошибки запроса - ServiceError"""
+        file_path = request.get('file_path')
+        analysis_type = request.get('analysis_type', 'score5')
+        sheet_names = request.get('sheets')
+        if not isinstance(file_path, str) or not file_path:
+            raise ServiceError(400, "Не указан файл (file_path)")
+        if analysis_type not in self.analyses:
+            raise ServiceError(400, f"Неизвестный тип анализа: {analysis_type}")
+        if not (sheet_names is None or sheet_names == 'all' or
+                isinstance(sheet_names, list) and all(isinstance(name, str) for name in sheet_names)):
+            raise ServiceError(400, "sheets: ожидается null, \"all\" или список названий листов")
+        if not os.path.isfile(file_path):
+            raise ServiceError(404, f"Файл не найден: {file_path}")
+
+        with self.lock:
+            if self.pending >= self.max_pending:
+                raise ServiceError(503, "Сервис занят: слишком много заданий в очереди")
+            self.pending += 1
+        try:
+            return self.run_job(file_path, analysis_type, sheet_names, request.get('record_history', True))
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+    def run_job(self, file_path, analysis_type, sheet_names, record_history):
+        import history
+        import sheets
+        import timing
+
+        timer = timing.RunTimer(analysis_type, file_path)
+        errors = []
+        sheet_results = None
+        with timer.stage('анализ'):
+            if sheet_names is None:
+                # Первый лист книги
+                engine = self.executor.submit(analyze_sheet_job, file_path, 0, analysis_type).result()
+            else:
+                # Листы книги - отдельные задания того же пула
+                try:
+                    selected = sheets.select_sheets(file_path, None if sheet_names == 'all' else sheet_names)
+                except ValueError as e:
+                    raise ServiceError(400, str(e))
+                workbook = sheets.WorkbookResult(file_path, [name for name, _ in selected], analysis_type,
+                                                 self.districts)
+                futures = [(name, self.executor.submit(analyze_sheet_job, file_path, name, analysis_type))
+                           for name in sheets.analysis_order(selected)]
+                for name, future in futures:
+                    try:
+                        workbook.engines[name] = future.result()
+                    except Exception as e:
+                        workbook.errors.append((name, str(e)))
+                engine, sheet_results, errors = workbook.merged_engine(), workbook.sheet_results, workbook.errors
+            results = engine.results()
+
+        if record_history:
+            history.record_results(results, file_path)
+        timer.log()
+        return {
+            'results': results,
+            'sheet_results': sheet_results,
+            'statistics': engine.statistics(),
+            # Учреждения для детализации по районам в окне программы
+            'institutions': institution_records(engine.institution_index()),
+            'errors': errors,
+            'timings': [record.as_dict() for record in timer.stages.values()],
+        }
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    server_version = 'DistrictAnalyzer'
+
+    def do_GET(self):
+        if self.path == '/health':
+            self.reply(200, self.server.service.health())
+        else:
+            self.reply(404, {'error': f"Неизвестный адрес: {self.path}"})
+
+    def do_POST(self):
+        if self.path != '/analyze':
+            self.reply(404, {'error': f"Неизвестный адрес: {self.path}"})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(request, dict):
+                raise ValueError("ожидается объект JSON")
+        except ValueError as e:
+            self.reply(400, {'error': f"Некорректный запрос: {e}"})
+            return
+
+        try:
+            self.reply(200, self.server.service.analyze(request))
+        except ServiceError as e:
+            self.reply(e.status, {'error': str(e)})
+        except Exception as e:
+            logger.exception("Ошибка задания %s", request.get('file_path'))
+            self.reply(500, {'error': str(e)})
+
+    def reply(self, status, data):
+        body = to_json(data)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.info("%s %s", self.address_string(), format % args)
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, districts=None, workers=None, max_pending=MAX_PENDING,
+          ready=None):
+    """Запускает сервис и обрабатывает запросы до прерывания (Ctrl+C); ready(сервер) - после запуска"""
+    if not logger.handlers:
+        # Журнал запросов сервиса выводится в консоль
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+    service = AnalysisService(districts, workers, max_pending)
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.daemon_threads = True
+    server.service = service
+    try:
+        service.warm_up()
+        if ready is not None:
+            ready(server)
+        server.serve_forever()
+    finally:
+        server.server_close()
+        service.close()
+
+
+class ServiceClient:
+    """Клиент сервиса для графического интерфейса и консольного режима"""
+
+    def __init__(self, url=None, timeout=CLIENT_TIMEOUT):
+        self.url = (url or os.environ.get(SERVICE_ENV) or f"http://{DEFAULT_HOST}:{DEFAULT_PORT}").rstrip('/')
+        self.timeout = timeout
+
+    def request(self, path, payload=None, timeout=None):
+        data = None if payload is None else to_json(payload)
+        request = urllib.request.Request(self.url + path, data=data,
+                                         headers={'Content-Type': 'application/json; charset=utf-8'})
+        try:
+            with urllib.request.urlopen(request, timeout=timeout or self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get('error', str(e))
+            except ValueError:
+                message = str(e)
+            raise ServiceError(e.code, message)
+        except (urllib.error.URLError, OSError) as e:
+            raise ServiceError(None, f"Сервис анализа недоступен ({self.url}): {e}")
+
+    def available(self):
+        try:
+            return self.request('/health', timeout=HEALTH_TIMEOUT).get('status') == 'ok'
+        except ServiceError:
+            return False
+
+    def analyze(self, file_path, analysis_type, sheets=None, record_history=True):
+        """Задание анализа: ответ сервиса (results, sheet_results, statistics, errors, timings)"""
+        return self.request('/analyze', {
+            'file_path': os.path.abspath(file_path),
+            'analysis_type': analysis_type,
+            'sheets': sheets,
+            'record_history': record_history,
+        })
+
+
+def configured_client():
+    """Клиент сервиса, если его адрес задан в DISTRICT_ANALYZER_SERVICE, иначе None"""
+    if os.environ.get(SERVICE_ENV):
+        return ServiceClient()
+    return None
@@ -0,0 +1,129 @@
+"""Анализ нескольких листов одной книги в пуле процессов
+
+Каждый лист читается и анализируется в отдельном процессе своим экземпляром
+алгоритма. Накопленные данные алгоритмов затем объединяются (engine.merge) в
+порядке листов книги, поэтому общая таблица по районам совпадает с анализом
+всех строк листов вместе. Результаты каждого листа сохраняются для детализации.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import analysis
+import reader
+import regions
+
+
+def list_sheets(file_path):
+    """Листы книги: [(название, примерное число ячеек или None)] в порядке книги"""
+    if not file_path.lower().endswith('.xlsx'):
+        with pd.ExcelFile(file_path) as workbook:
+            return [(name, None) for name in workbook.sheet_names]
+
+    workbook = reader.open_workbook(file_path)
+    try:
+        sheets = []
+        for sheet in workbook.worksheets:
+            # Размеры, записанные в файле (могут отсутствовать)
+            size = sheet.max_row * sheet.max_column if sheet.max_row and sheet.max_column else None
+            sheets.append((sheet.title, size))
+        return sheets
+    finally:
+        workbook.close()
+
+
+def select_sheets(file_path, sheet_names=None):
+    """Листы книги для анализа (по умолчанию все): [(название, размер)] в порядке книги"""
+    available = list_sheets(file_path)
+    if not sheet_names:
+        return available
+    missing = [name for name in sheet_names if name not in dict(available)]
+    if missing:
+        raise ValueError(f"В книге нет листов: {', '.join(missing)}")
+    return [(name, size) for name, size in available if name in sheet_names]
+
+
+def analysis_order(selected):
+    """Порядок запуска листов: большие первыми, чтобы общее время было близко ко времени самого большого листа"""
+    return [name for name, size in sorted(selected, key=lambda item: -(item[1] or 0))]
+
+
+def analyze_sheet(file_path, sheet, analysis_type, districts=None, use_cache=True):
+    """Анализ одного листа (выполняется в дочернем процессе); возвращает алгоритм с накопленными данными"""
+    df = reader.read_sheet(file_path, analysis_type, use_cache, sheet)
+    engine = analysis.create_engine(analysis_type, districts)
+    engine.update(df)
+    return engine
+
+
+class WorkbookResult:
+    """Объединенные по районам результаты листов книги, результаты по листам и ошибки"""
+
+    def __init__(self, file_path, sheets, analysis_type, districts=None):
+        self.file_path = file_path
+        self.sheets = list(sheets)
+        self.analysis_type = analysis_type
+        self.districts = districts
+        self.engines = {}  # Алгоритмы по листам
+        self.errors = []  # (лист, текст ошибки)
+        self.sheets_done = 0
+
+    def merged_engine(self):
+        """Алгоритм с данными всех листов, объединенными в порядке книги"""
+        engine = analysis.create_engine(self.analysis_type, self.districts)
+        for sheet in self.sheets:
+            if sheet in self.engines:
+                engine.merge(self.engines[sheet])
+        return engine
+
+    @property
+    def results(self):
+        """Общая таблица по районам: данные всех листов, объединенные в порядке книги"""
+        return self.merged_engine().results()
+
+    @property
+    def sheet_results(self):
+        """Результаты по листам (строки с полем sheet) в порядке книги"""
+        return [dict(result, sheet=sheet)
+                for sheet in self.sheets if sheet in self.engines
+                for result in self.engines[sheet].results()]
+
+
+def run_sheets(file_path, analysis_type, districts=None, sheets=None, max_workers=None,
+               progress=None, cancelled=None, use_cache=True):
+    """Анализирует листы книги (по умолчанию все) параллельно; ошибка в одном листе не прерывает остальные
+
+    progress(обработано листов, всего, лист) вызывается после каждого листа,
+    cancelled() позволяет прервать ожидание оставшихся листов.
+    """
+    selected = select_sheets(file_path, sheets)
+    districts = regions.as_registry(districts)
+    workbook = WorkbookResult(file_path, [name for name, _ in selected], analysis_type, districts)
+    if not selected:
+        return workbook
+
+    order = analysis_order(selected)
+    max_workers = max_workers or min(len(order), os.cpu_count() or 1)
+    executor = ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {
+            executor.submit(analyze_sheet, file_path, name, analysis_type, districts, use_cache): name
+            for name in order
+        }
+        for future in as_completed(futures):
+            sheet = futures[future]
+            try:
+                workbook.engines[sheet] = future.result()
+            except Exception as e:
+                workbook.errors.append((sheet, str(e)))
+            workbook.sheets_done += 1
+
+            if progress is not None:
+                progress(workbook.sheets_done, len(order), sheet)
+            if cancelled is not None and cancelled():
+                break
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    return workbook
@@ -0,0 +1,147 @@
+"""Исходный построчный алгоритм анализа (до векторизованного ядра) - эталон для тестов
+
+Перенесен без изменений логики из методов DarkDistrictAnalyzerApp первой версии
+программы; список районов передается параметром.
+"""
+import re
+
+import pandas as pd
+
+INSTITUTION_KEYWORDS = ['МБОУ', 'СОШ', 'ГБОУ', 'Школа']
+
+
+def analyze_score5(df, districts):
+    """Анализ балла нормированного к 5"""
+    district_data = {}
+    current_district = None
+
+    for i, row in df.iterrows():
+        cell_value = str(row.iloc[0]) if pd.notna(row.iloc[0]) else ""
+
+        # Проверяем, является ли ячейка названием района
+        for district in districts:
+            if cell_value.strip() == district:
+                current_district = district
+                if district not in district_data:
+                    district_data[district] = {'score5_data': [], 'record_count': 0}
+                break
+
+        # Если мы находимся в блоке района и это строка с данными (дата в первом столбце)
+        if current_district and i > 0 and re.match(r'\d{1,2}\.\d{1,2}\.\d{4}', str(cell_value)):
+            district_data[current_district]['record_count'] += 1
+
+            # Поиск столбца с баллом по заголовкам в предыдущей строке
+            score5_col = None
+            for j in range(len(row)):
+                if pd.notna(df.iloc[i - 1, j]) and "нормированный к5" in str(df.iloc[i - 1, j]).lower():
+                    score5_col = j
+                    break
+
+            # Если не нашли по заголовкам, ищем числовой столбец с баллами от 0 до 5
+            if score5_col is None:
+                for j in range(len(row) - 1, max(len(row) - 10, 0), -1):
+                    try:
+                        val = float(row.iloc[j])
+                        if 0 <= val <= 5:
+                            score5_col = j
+                            break
+                    except Exception:
+                        continue
+
+            if score5_col is not None and pd.notna(row.iloc[score5_col]):
+                try:
+                    district_data[current_district]['score5_data'].append(float(row.iloc[score5_col]))
+                except Exception:
+                    pass
+
+    results = []
+    for district in districts:
+        if district in district_data:
+            data = district_data[district]
+            if data['record_count'] > 0:
+                score5_percent = 0
+                if data['score5_data']:
+                    score5_percent = (sum(data['score5_data']) / len(data['score5_data'])) / 5 * 100
+                results.append({'district': district, 'score': round(score5_percent, 2),
+                                'record_count': data['record_count'], 'analysis_type': 'score5'})
+        else:
+            # Район с нулевыми результатами, если он не найден
+            results.append({'district': district, 'score': 0.0, 'record_count': 0, 'analysis_type': 'score5'})
+
+    results.sort(key=lambda x: x['score'], reverse=True)
+    return results
+
+
+def analyze_menu_compliance(df, districts):
+    """Анализ соответствия типовому меню с расчетом общего процента по региону"""
+    district_data = {}
+    all_compliance_data = []
+
+    for i, row in df.iterrows():
+        if pd.isna(row.iloc[0]):
+            continue
+
+        # Строки с названиями учреждений
+        cell_value = str(row.iloc[0])
+        if any(keyword in cell_value for keyword in INSTITUTION_KEYWORDS):
+            district_found = None
+            for district in districts:
+                if district in (str(row.iloc[1]) if pd.notna(row.iloc[1]) else ""):
+                    district_found = district
+                    break
+
+            if district_found:
+                if district_found not in district_data:
+                    district_data[district_found] = {'compliance_data': [], 'record_count': 0}
+
+                # Процент соответствия (0-100) в последних 2 столбцах
+                for j in range(len(row) - 2, len(row)):
+                    if j >= 0 and pd.notna(row.iloc[j]):
+                        try:
+                            compliance_val = float(row.iloc[j])
+                            if 0 <= compliance_val <= 100:
+                                district_data[district_found]['compliance_data'].append(compliance_val)
+                                district_data[district_found]['record_count'] += 1
+                                all_compliance_data.append(compliance_val)
+                                break
+                        except Exception:
+                            continue
+
+    region_stats = calculate_region_stats(all_compliance_data)
+
+    results = []
+    for district in districts:
+        if district in district_data:
+            data = district_data[district]
+            if data['record_count'] > 0:
+                avg_compliance = 0
+                if data['compliance_data']:
+                    avg_compliance = sum(data['compliance_data']) / len(data['compliance_data'])
+                results.append({'district': district, 'score': round(avg_compliance, 2),
+                                'record_count': data['record_count'], 'analysis_type': 'menu_compliance'})
+        else:
+            results.append({'district': district, 'score': 0.0, 'record_count': 0,
+                            'analysis_type': 'menu_compliance'})
+
+    for category, key in (('100%', 'perfect_percentage'), ('75-100%', 'good_percentage')):
+        results.append({'district': f'ОБЩИЙ ПОКАЗАТЕЛЬ ПО РЕГИОНУ ({category})',
+                        'score': round(region_stats[key], 2), 'record_count': len(all_compliance_data),
+                        'analysis_type': 'menu_compliance', 'is_region_total': True, 'category': category})
+
+    # Районы - по проценту соответствия, общие показатели - в конце
+    regular_results = [r for r in results if not r.get('is_region_total', False)]
+    regular_results.sort(key=lambda x: x['score'], reverse=True)
+    return regular_results + [r for r in results if r.get('is_region_total', False)]
+
+
+def calculate_region_stats(compliance_data):
+    """Доли организаций региона со 100% и 75-100% соответствием"""
+    if not compliance_data:
+        return {'perfect_percentage': 0, 'good_percentage': 0}
+    perfect = sum(1 for x in compliance_data if x == 100)
+    good = sum(1 for x in compliance_data if 75 <= x <= 100)
+    return {'perfect_percentage': perfect / len(compliance_data) * 100,
+            'good_percentage': good / len(compliance_data) * 100}
+
+
+ORIGINAL_ANALYSES = {'score5': analyze_score5, 'menu_compliance': analyze_menu_compliance}
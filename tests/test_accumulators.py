@@ -0,0 +1,94 @@
+"""Накопители статистики: совпадение с исходным алгоритмом и объединение частей"""
+import itertools
+import math
+
+import numpy as np
+import pytest
+
+from accumulators import StatsAccumulator
+
+BUCKETS = {'100%': (100, 100), '75-100%': (75, 100)}
+
+
+def accumulate(*parts):
+    stats = StatsAccumulator(BUCKETS)
+    for part in parts:
+        stats.add(part)
+    return stats
+
+
+def merged(parts):
+    total = StatsAccumulator(BUCKETS)
+    for part in parts:
+        total.merge(accumulate(part))
+    return total
+
+
+@pytest.fixture
+def parts():
+    rng = np.random.default_rng(19)
+    values = [rng.uniform(0, 100, size) for size in (1, 37, 500, 4096)]
+    values[2][::7] = 100
+    values[3][::5] = 75
+    return values
+
+
+def test_mean_matches_sum_in_row_order(parts):
+    """Среднее - sum(список) / len(список), как в исходном алгоритме, и при добавлении блоками"""
+    values = np.concatenate(parts)
+    expected = sum(values.tolist()) / len(values)
+    assert accumulate(values).mean == expected
+    assert accumulate(*parts).mean == expected
+    assert accumulate(*np.array_split(values, 13)).mean == expected
+
+
+def test_std_and_summary(parts):
+    values = np.concatenate(parts)
+    stats = accumulate(*parts)
+    assert stats.std == pytest.approx(np.std(values, ddof=1), rel=1e-12)
+    assert stats.minimum == values.min() and stats.maximum == values.max()
+    assert stats.bucket_counts == {'100%': int(np.sum(values == 100)),
+                                   '75-100%': int(np.sum((values >= 75) & (values <= 100)))}
+
+
+def test_merge_of_two_is_commutative(parts):
+    """Объединение двух накопителей не зависит от того, какой из них дополняется"""
+    for first, second in itertools.combinations(parts, 2):
+        forward, backward = accumulate(first), accumulate(second)
+        forward.merge(accumulate(second))
+        backward.merge(accumulate(first))
+        assert forward.summary() == backward.summary()
+        assert (forward.total, forward.squares) == (backward.total, backward.squares)
+
+
+def test_merge_order_independence(parts):
+    """Счетчики, группы и квантили не зависят от порядка объединения, сумма - лишь в последних битах"""
+    reference = merged(parts)
+    for order in itertools.permutations(parts):
+        stats = merged(order)
+        assert stats.count == reference.count
+        assert stats.bucket_counts == reference.bucket_counts
+        assert (stats.minimum, stats.maximum) == (reference.minimum, reference.maximum)
+        assert [stats.quantile(q) for q in (0.1, 0.5, 0.9)] == [reference.quantile(q) for q in (0.1, 0.5, 0.9)]
+        assert stats.mean == pytest.approx(reference.mean, rel=1e-15)
+        assert stats.std == pytest.approx(reference.std, rel=1e-12)
+
+
+def test_merge_equals_adding_all_values(parts):
+    whole = accumulate(np.concatenate(parts))
+    stats = merged(parts)
+    assert stats.count == whole.count and stats.bucket_counts == whole.bucket_counts
+    assert stats.mean == pytest.approx(whole.mean, rel=1e-15)
+    assert stats.std == pytest.approx(whole.std, rel=1e-12)
+
+
+def test_non_finite_values():
+    stats = accumulate(np.array([1.0, math.nan, 3.0]))
+    assert stats.count == 3 and stats.finite_count == 2
+    assert math.isnan(stats.mean) and math.isnan(stats.std)
+    assert stats.quantile(0.5) == 1.0
+
+    infinite = accumulate(np.array([2.0, math.inf]))
+    assert infinite.mean == math.inf
+    infinite.merge(accumulate(np.array([-math.inf])))
+    assert math.isnan(infinite.mean)
@@ -0,0 +1,74 @@
+"""Ядро анализа (analysis.RuleEngine) против исходного построчного алгоритма"""
+import pandas as pd
+import pytest
+
+import analysis
+import reader
+from original import ORIGINAL_ANALYSES
+from workbooks import menu_rows, mixed_rows, score5_rows, write_workbook
+
+DISTRICTS = list(analysis.DISTRICTS)
+
+
+def engine_results(analysis_type, frame):
+    engine = analysis.create_engine(analysis_type, DISTRICTS)
+    engine.update(frame)
+    return engine
+
+
+def assert_same_results(actual, expected):
+    """Результаты совпадают полностью, включая порядок строк и типы чисел"""
+    assert actual == expected
+    assert [type(row['score']) for row in actual] == [type(row['score']) for row in expected]
+
+
+@pytest.mark.parametrize('seed', range(24))
+def test_score5_matches_original(seed):
+    frame = score5_rows(seed=seed, width=(2, 5, 8, 14)[seed % 4])
+    assert_same_results(analysis.analyze_score5(frame, DISTRICTS),
+                        ORIGINAL_ANALYSES['score5'](frame, DISTRICTS))
+
+
+@pytest.mark.parametrize('seed', range(24))
+def test_menu_compliance_matches_original(seed):
+    frame = menu_rows(seed=seed, width=(2, 3, 6, 10)[seed % 4])
+    assert_same_results(analysis.analyze_menu_compliance(frame, DISTRICTS),
+                        ORIGINAL_ANALYSES['menu_compliance'](frame, DISTRICTS))
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_all_analyses_in_one_pass_match_original(seed):
+    frame = mixed_rows(seed=seed, width=(4, 8, 12)[seed % 3])
+    combined = analysis.analyze_all(frame, DISTRICTS)
+    for analysis_type, original in ORIGINAL_ANALYSES.items():
+        assert_same_results(combined[analysis_type], original(frame, DISTRICTS))
+
+
+@pytest.mark.parametrize('analysis_type, frame', [
+    ('score5', score5_rows(80, seed=11, width=8)),
+    ('score5', score5_rows(80, seed=12, width=20)),
+    ('menu_compliance', menu_rows(600, seed=13, width=12)),
+    (analysis.ALL_ANALYSES, mixed_rows(seed=14, width=16)),
+])
+def test_read_paths_match_original(tmp_path, analysis_type, frame):
+    """Лист, прочитанный по нужным столбцам в компактных типах или потоком, дает результаты исходного алгоритма
+    по pd.read_excel"""
+    path = write_workbook(tmp_path / 'report.xlsx', frame)
+    expected_frame = pd.read_excel(path, header=None)
+    expected = {name: original(expected_frame, DISTRICTS) for name, original in ORIGINAL_ANALYSES.items()}
+
+    engine = engine_results(analysis_type, reader.read_sheet(path, analysis_type, use_cache=False))
+    *_, (_, streamed) = reader.stream_analysis(path, analysis_type, DISTRICTS, chunk_size=97)
+    for result in (engine, streamed):
+        for name, results in result.results_by_type().items():
+            assert_same_results(results, expected[name])
+
+
+def test_one_column_sheet_with_institution_rows():
+    """На листе из одного столбца нет района учреждений: в режиме 'all' остается результат балла"""
+    institutions = pd.DataFrame({0: ['МБОУ "СОШ №1"', 'Школа-интернат', None] * 20})
+    frame = pd.concat([score5_rows(30, seed=3, width=2).iloc[:, :1], institutions], ignore_index=True)
+
+    combined = engine_results(analysis.ALL_ANALYSES, frame)
+    assert combined.results_by_type()['score5'] == engine_results('score5', frame).results()
+    assert combined.results_by_type()['menu_compliance'] == engine_results('menu_compliance', frame).results()
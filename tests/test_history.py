@@ -0,0 +1,17 @@
+"""История результатов: динамика по месячным периодам"""
+import history
+
+
+def district_results(score):
+    return [{'district': 'Аргун', 'analysis_type': 'score5', 'score': score, 'record_count': 3}]
+
+
+def test_trends_skip_periods_without_date():
+    """Имя файла без распознанного периода не вытесняет месяцы из последних N периодов"""
+    with history.HistoryStore(':memory:') as store:
+        for period, score in [('2024-01', 1.0), ('2024-02', 2.0), ('отчет_итоговый', 9.0), ('2024-03', 3.0)]:
+            store.record(district_results(score), period, 'hash')
+
+        assert store.periods('score5') == ['2024-01', '2024-02', '2024-03']
+        assert store.district_trend('Аргун', 'score5', months=2) == [('2024-02', 2.0, 3), ('2024-03', 3.0, 3)]
+        assert store.trends('score5', months=2) == {'Аргун': [('2024-02', 2.0, 3), ('2024-03', 3.0, 3)]}
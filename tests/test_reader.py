@@ -0,0 +1,89 @@
+"""Чтение листов против pd.read_excel: только нужные анализу столбцы (ColumnParser) и поток"""
+import pandas as pd
+import pytest
+
+import analysis
+import cache
+import reader
+from workbooks import menu_rows, mixed_rows, score5_rows, write_workbook
+
+
+def expected_frame(path, requirements):
+    """Лист, прочитанный pd.read_excel, только со столбцами, которые выбирает plan_columns"""
+    full = pd.read_excel(path, header=None)
+    keywords = requirements[2]
+    header_columns = set()
+    for _, row in full.iterrows():
+        hits = [j for j, value in enumerate(row, 1)
+                if isinstance(value, str) and any(keyword in value.lower() for keyword in keywords)]
+        if hits:
+            header_columns.add(hits[0])
+    columns = reader.plan_columns(full.shape[1], header_columns, requirements)
+    if columns is None:
+        return full
+    subset = pd.read_excel(path, header=None, usecols=[column - 1 for column in columns])
+    subset.columns = range(subset.shape[1])
+    return subset
+
+
+@pytest.mark.parametrize('analysis_type, frame', [
+    ('score5', score5_rows(60, seed=1, width=8)),
+    ('score5', score5_rows(60, seed=2, width=24)),
+    ('menu_compliance', menu_rows(400, seed=3, width=6)),
+    ('menu_compliance', menu_rows(400, seed=4, width=16)),
+    ('all', mixed_rows(seed=5, width=20)),
+    ('score5', score5_rows(60, seed=6, width=2).iloc[:, :1]),
+])
+def test_needed_columns_match_read_excel(tmp_path, analysis_type, frame):
+    path = write_workbook(tmp_path / 'report.xlsx', frame)
+    requirements = analysis.column_requirements(analysis_type)
+    pd.testing.assert_frame_equal(reader.read_needed_columns(path, requirements),
+                                  expected_frame(path, requirements), check_dtype=False)
+
+
+def test_unsupported_openpyxl_falls_back_to_read_excel(tmp_path, monkeypatch):
+    path = write_workbook(tmp_path / 'report.xlsx', score5_rows(30, seed=7, width=16))
+
+    def changed_parser(*args, **kwargs):
+        raise AttributeError("'ReadOnlyWorksheet' object has no attribute '_shared_strings'")
+
+    monkeypatch.setattr(reader, 'ColumnParser', changed_parser)
+    frame = reader.read_needed_columns(path, analysis.column_requirements('score5'))
+    pd.testing.assert_frame_equal(frame, pd.read_excel(path, header=None))
+
+
+@pytest.mark.parametrize('width', [8, 12])
+def test_needed_columns_taken_from_cached_whole_sheet(tmp_path, monkeypatch, width):
+    """Лист, сохраненный в кэше целиком, не разбирается заново для анализа с другими столбцами"""
+    path = write_workbook(tmp_path / 'report.xlsx', mixed_rows(seed=10, width=width))
+    monkeypatch.setattr(cache, '_default_cache', cache.ParseCache(str(tmp_path / 'cache')))
+    whole = reader.read_sheet(path, 'score5')
+    assert whole.attrs[reader.READ_COLUMNS_ATTR] is None
+    expected = reader.read_sheet(path, 'menu_compliance', use_cache=False)
+
+    def parse_again(*args, **kwargs):
+        raise AssertionError("лист разобран повторно")
+
+    monkeypatch.setattr(reader, 'read_needed_columns', parse_again)
+    selected = reader.read_sheet(path, 'menu_compliance')
+    pd.testing.assert_frame_equal(selected, expected)
+    assert selected.attrs[reader.READ_COLUMNS_ATTR] == expected.attrs[reader.READ_COLUMNS_ATTR]
+
+
+@pytest.mark.parametrize('width', [1, 4])
+def test_stream_keeps_blank_rows(tmp_path, width):
+    """Блоки из одних пустых строк не прерывают потоковый анализ и не сдвигают строки"""
+    blank = pd.DataFrame([[None] * width] * 25)
+    frame = pd.concat([score5_rows(10, seed=8, width=max(width, 2)).iloc[:, :width], blank,
+                       score5_rows(10, seed=9, width=max(width, 2)).iloc[:, :width]], ignore_index=True)
+    path = write_workbook(tmp_path / 'report.xlsx', frame)
+
+    # Пустые строки в конце листа pd.read_excel отбрасывает, поток - нет
+    expected = pd.read_excel(path, header=None)
+    streamed_rows = pd.concat(reader.SheetStream(path, chunk_size=10).chunks(width), ignore_index=True)
+    blank_rows = streamed_rows.isna().all(axis=1)
+    assert blank_rows.iloc[:len(expected)].tolist() == expected.isna().all(axis=1).tolist()
+    assert blank_rows.iloc[len(expected):].all()
+
+    *_, (_, streamed) = reader.stream_analysis(path, 'score5', list(analysis.DISTRICTS), chunk_size=10)
+    assert streamed.results() == analysis.analyze(expected, 'score5', list(analysis.DISTRICTS))
@@ -0,0 +1,37 @@
+"""Сервис анализа: ответ на задание против анализа в этом процессе"""
+import json
+
+import pandas as pd
+import pytest
+
+import analysis
+import institutions
+import service
+from workbooks import menu_rows, write_workbook
+
+DISTRICTS = list(analysis.DISTRICTS)
+
+
+@pytest.fixture
+def analysis_service(tmp_path, monkeypatch):
+    monkeypatch.setenv('DISTRICT_ANALYZER_CACHE_DIR', str(tmp_path / 'cache'))
+    analysis_service = service.AnalysisService(DISTRICTS, workers=1)
+    yield analysis_service
+    analysis_service.close()
+
+
+def test_response_carries_institutions(tmp_path, analysis_service):
+    """По учреждениям из ответа сервиса строится тот же указатель, что и при анализе в окне программы"""
+    path = write_workbook(tmp_path / 'report.xlsx', menu_rows(300, seed=41, width=6))
+    request = {'file_path': path, 'analysis_type': 'menu_compliance', 'record_history': False}
+    response = json.loads(service.to_json(analysis_service.analyze(request)))
+
+    engine = analysis.create_engine('menu_compliance', DISTRICTS)
+    engine.update(pd.read_excel(path, header=None))
+    expected = engine.institution_index()
+    records = response['institutions']
+    index = institutions.InstitutionIndex(records['names'], records['districts'], records['values'], DISTRICTS)
+    assert len(index) == len(expected) > 0
+    assert [index.record(number) for number in range(len(index))] == \
+        [expected.record(number) for number in range(len(expected))]
+    assert response['results'] == engine.results()
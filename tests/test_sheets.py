@@ -0,0 +1,51 @@
+"""Анализ листов книги: объединение листов против анализа всех строк вместе"""
+import pandas as pd
+import pytest
+
+import analysis
+import sheets
+from workbooks import menu_rows, mixed_rows, score5_rows, write_workbook
+
+DISTRICTS = list(analysis.DISTRICTS)
+
+
+def own_block(frame, district):
+    """Лист, начинающийся со строки района: при анализе строк всех листов подряд блок района
+    предыдущего листа на него не переходит (листы книги независимы)"""
+    return pd.concat([pd.DataFrame([[district] + [None] * (frame.shape[1] - 1)]), frame], ignore_index=True)
+
+
+@pytest.fixture
+def workbook_path(tmp_path):
+    frames = [score5_rows(40, seed=31, width=8), menu_rows(300, seed=32, width=8), mixed_rows(seed=33, width=8)]
+    return write_workbook(tmp_path / 'book.xlsx', *(own_block(frame, district)
+                                                    for frame, district in zip(frames, DISTRICTS)))
+
+
+def test_merged_sheets_match_concatenated_rows(workbook_path):
+    workbook = sheets.run_sheets(workbook_path, analysis.ALL_ANALYSES, DISTRICTS, max_workers=2, use_cache=False)
+    assert not workbook.errors
+
+    frames = [pd.read_excel(workbook_path, header=None, sheet_name=name) for name in workbook.sheets]
+    together = analysis.analyze(pd.concat(frames, ignore_index=True), analysis.ALL_ANALYSES, DISTRICTS)
+    assert workbook.results == together
+
+    # Результаты по листам - результаты анализа каждого листа отдельно
+    expected_sheets = [dict(row, sheet=name) for name, frame in zip(workbook.sheets, frames)
+                       for row in analysis.analyze(frame, analysis.ALL_ANALYSES, DISTRICTS)]
+    assert workbook.sheet_results == expected_sheets
+
+
+def test_merge_does_not_depend_on_completion_order(workbook_path):
+    """Листы объединяются в порядке книги, в каком бы порядке ни завершились процессы"""
+    names = [name for name, _ in sheets.list_sheets(workbook_path)]
+    engines = {name: sheets.analyze_sheet(workbook_path, name, analysis.ALL_ANALYSES, DISTRICTS, use_cache=False)
+               for name in names}
+
+    results = []
+    for completion_order in (names, names[::-1], names[1:] + names[:1]):
+        workbook = sheets.WorkbookResult(workbook_path, names, analysis.ALL_ANALYSES, DISTRICTS)
+        for name in completion_order:
+            workbook.engines[name] = engines[name]
+        results.append((workbook.results, workbook.merged_engine().statistics()))
+    assert results[1:] == results[:1] * 2
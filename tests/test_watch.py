@@ -0,0 +1,66 @@
+"""Инкрементальный анализ дописываемого файла против полного пересчета"""
+import os
+
+import pandas as pd
+import pytest
+
+import analysis
+import watch
+from workbooks import menu_rows, mixed_rows, score5_rows, write_workbook
+
+DISTRICTS = list(analysis.DISTRICTS)
+
+
+def save_rows(path, frame, version):
+    """Перезаписывает файл; время изменения задается явно, чтобы изменение было видно и в пределах секунды"""
+    write_workbook(path, frame)
+    os.utime(path, ns=(version, version))
+
+
+def full_results(path, analysis_type):
+    return analysis.analyze(pd.read_excel(path, header=None), analysis_type, DISTRICTS)
+
+
+@pytest.mark.parametrize('analysis_type, frame', [
+    ('score5', score5_rows(60, seed=21, width=8)),
+    ('menu_compliance', menu_rows(700, seed=22, width=6)),
+    (analysis.ALL_ANALYSES, mixed_rows(seed=23, width=8)),
+])
+def test_appended_rows_match_full_recompute(tmp_path, analysis_type, frame):
+    path = str(tmp_path / 'report.xlsx')
+    incremental = watch.IncrementalAnalysis(path, analysis_type, DISTRICTS, chunk_size=37, block_size=50)
+
+    modes = []
+    for version, stop in enumerate([len(frame) // 3, len(frame) // 2, len(frame) // 2, len(frame)], 1):
+        save_rows(path, frame.iloc[:stop], version)
+        modes.append(incremental.refresh())
+        assert incremental.results() == full_results(path, analysis_type)
+    assert modes[0] == watch.FULL
+    assert modes[1] == watch.INCREMENTAL and modes[3] == watch.INCREMENTAL
+
+    # Изменение уже прочитанной строки - полный пересчет
+    edited = frame.copy()
+    edited.iloc[3, 0] = 'Грозный'
+    save_rows(path, edited, 10)
+    assert incremental.refresh() == watch.FULL
+    assert incremental.results() == full_results(path, analysis_type)
+
+
+def test_cancelled_refresh_keeps_previous_results(tmp_path):
+    """Прерванный пересчет не меняет накопленных данных; следующее обновление выполняется заново"""
+    path = str(tmp_path / 'report.xlsx')
+    frame = score5_rows(60, seed=24, width=8)
+    incremental = watch.IncrementalAnalysis(path, 'score5', DISTRICTS, chunk_size=37, block_size=50)
+    save_rows(path, frame.iloc[:len(frame) // 2], 1)
+    incremental.refresh()
+    before = incremental.results()
+
+    edited = frame.copy()
+    edited.iloc[3, 0] = 'Грозный'
+    save_rows(path, edited, 2)
+    checks = iter([False, True])
+    assert incremental.refresh(cancelled=lambda: next(checks)) == watch.CANCELLED
+    assert incremental.results() == before
+
+    assert incremental.refresh() == watch.FULL
+    assert incremental.results() == full_results(path, 'score5')
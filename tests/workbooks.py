@@ -0,0 +1,58 @@
+"""Сгенерированные листы отчетов для тестов: строки как в реальных файлах и искаженные"""
+import datetime
+import random
+
+import pandas as pd
+
+from analysis import DISTRICTS
+
+
+def score5_rows(blocks=40, seed=0, width=8):
+    """Лист отчета 'Балл нормированный к 5': блоки районов со строками дат"""
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(blocks):
+        rows.append([rng.choice(DISTRICTS + ["Неизвестный", " Грозный ", "итого"])] + [None] * (width - 1))
+        header = [None] * width
+        header[0], header[1] = 'Дата', 'всего'
+        header_column = rng.choice([None, min(3, width - 1), min(5, width - 1), width - 1])
+        if header_column is not None:
+            header[header_column] = rng.choice(['Балл Нормированный к5', 'нормированный к5 (балл)'])
+        rows.append(header)
+        for _ in range(rng.randint(0, 12)):
+            date = rng.choice([f"{rng.randint(1, 28)}.{rng.randint(1, 12)}.2024",
+                               f"{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.2024 г.",
+                               datetime.datetime(2024, 1, 2), "текст", None])
+            rows.append([date] + [rng.choice([rng.uniform(0, 5), rng.uniform(0, 100), rng.randint(0, 5),
+                                              str(round(rng.uniform(0, 5), 2)), None, "н/д",
+                                              datetime.datetime(2024, 1, 1), float('nan')])
+                                  for _ in range(width - 1)])
+    return pd.DataFrame(rows)
+
+
+def menu_rows(count=500, seed=0, width=6):
+    """Лист отчета 'Соответствие типовому меню': строки учреждений с районом во втором столбце"""
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        institution = rng.choice(['МБОУ "СОШ №1"', 'ГБОУ Лицей', 'Школа-интернат', 'ДОУ Сказка', None, 'Итого', 123])
+        district = rng.choice(DISTRICTS + ["г. Грозный", "Гудермесский район", "Аргун Гудермес", "Неизвестный", None,
+                                           "Грозненский район, Грозный"])
+        rows.append([institution, district] + [rng.choice([None, 'x', rng.uniform(0, 120), 100, 100.0, 75,
+                                                           str(rng.randint(0, 100)), datetime.datetime(2024, 1, 1),
+                                                           float('nan')])
+                                               for _ in range(width - 2)])
+    return pd.DataFrame(rows)
+
+
+def mixed_rows(seed=0, width=8):
+    """Лист с блоками обоих отчетов (для режима 'all')"""
+    return pd.concat([score5_rows(20, seed, width), menu_rows(200, seed, width)], ignore_index=True)
+
+
+def write_workbook(path, *sheets):
+    """Книга .xlsx с листами из таблиц (без заголовков и индекса, как отчеты)"""
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        for number, frame in enumerate(sheets, 1):
+            frame.to_excel(writer, sheet_name=f"Лист{number}", header=False, index=False)
+    return str(path)
@@ -0,0 +1,236 @@
+"""Замеры времени и памяти по этапам анализа
+
+Каждый запуск собирает записи по этапам (чтение, анализ, таблица, диаграмма):
+время, количество строк и изменение занятой процессом памяти. Краткая сводка
+выводится в строке состояния, записи в формате JSON пишутся в журнал.
+"""
+import cProfile
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger('district_analyzer.timing')
+
+# Переменная окружения, включающая профилирование первого запуска анализа в графическом интерфейсе
+PROFILE_ENV = 'DISTRICT_ANALYZER_PROFILE'
+
+
+def profile_requested():
+    return os.environ.get(PROFILE_ENV, '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def log_dir():
+    """Папка журналов: переменная DISTRICT_ANALYZER_LOG_DIR или локальная папка пользователя"""
+    directory = os.environ.get('DISTRICT_ANALYZER_LOG_DIR')
+    if directory:
+        return directory
+    base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'district_analyzer', 'logs')
+
+
+def setup_logging():
+    """Подключает запись замеров в timing.log (однократно)"""
+    if logger.handlers:
+        return
+    try:
+        os.makedirs(log_dir(), exist_ok=True)
+        handler = logging.FileHandler(os.path.join(log_dir(), 'timing.log'), encoding='utf-8')
+    except OSError:
+        # Без доступной папки журналов замеры только показываются в интерфейсе
+        handler = logging.NullHandler()
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def current_rss_mb():
+    """Занятая процессом память (МБ) или None, если определить не удалось"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2 ** 20
+    except ImportError:
+        pass
+
+    if sys.platform.startswith('linux'):
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+        except (OSError, ValueError, IndexError):
+            return None
+
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [
+                ('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t),
+            ]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize / 2 ** 20
+    return None
+
+
+def process_uptime():
+    """Время с запуска процесса (с) или None, если определить не удалось
+
+    Включает запуск интерпретатора и распаковку собранного приложения, которые не
+    видны из кода программы.
+    """
+    if sys.platform.startswith('linux'):
+        try:
+            with open('/proc/self/stat') as f:
+                # Поля после имени процесса; время запуска (в тиках от загрузки системы) - 22-е поле
+                started = int(f.read().rsplit(')', 1)[1].split()[19]) / os.sysconf('SC_CLK_TCK')
+            with open('/proc/uptime') as f:
+                return float(f.read().split()[0]) - started
+        except (OSError, ValueError, IndexError):
+            return None
+
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        created, exited, kernel, user, now = (wintypes.FILETIME() for _ in range(5))
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.kernel32.GetProcessTimes(process, ctypes.byref(created), ctypes.byref(exited),
+                                                      ctypes.byref(kernel), ctypes.byref(user)):
+            return None
+        ctypes.windll.kernel32.GetSystemTimeAsFileTime(ctypes.byref(now))
+
+        def ticks(filetime):
+            # FILETIME - интервалы по 100 нс
+            return (filetime.dwHighDateTime << 32) | filetime.dwLowDateTime
+
+        return (ticks(now) - ticks(created)) / 1e7
+    return None
+
+
+class StageRecord:
+    """Замер одного этапа (при повторных замерах значения суммируются)"""
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.rows = 0
+        self.memory_delta_mb = None
+
+    def add(self, seconds, rows=0, memory_delta_mb=None):
+        self.seconds += seconds
+        self.rows += rows or 0
+        if memory_delta_mb is not None:
+            self.memory_delta_mb = (self.memory_delta_mb or 0) + memory_delta_mb
+
+    def as_dict(self):
+        return {
+            'stage': self.name,
+            'seconds': round(self.seconds, 4),
+            'rows': self.rows,
+            'memory_delta_mb': None if self.memory_delta_mb is None else round(self.memory_delta_mb, 1),
+        }
+
+
+class RunTimer:
+    """Замеры одного запуска анализа"""
+
+    def __init__(self, label, file_path=None):
+        self.label = label
+        self.file_path = file_path
+        self.stages = {}
+        self.footprints = {}  # Объем данных до и после сжатия: {название: (МБ до, МБ после)}
+
+    def record(self, name):
+        if name not in self.stages:
+            self.stages[name] = StageRecord(name)
+        return self.stages[name]
+
+    @contextmanager
+    def stage(self, name, rows=0):
+        """Замер этапа: with timer.stage('чтение') as stage: ...; stage.rows = n"""
+        record = StageRecord(name)
+        rss_before = current_rss_mb()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            rss_after = current_rss_mb()
+            delta = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+            self.record(name).add(time.perf_counter() - start, record.rows or rows, delta)
+
+    def add(self, name, seconds, rows=0):
+        """Добавляет время к этапу, который выполняется частями (например, по блокам строк)"""
+        self.record(name).add(seconds, rows)
+
+    def add_footprint(self, name, before_mb, after_mb):
+        """Объем данных в памяти до и после сжатия (например, таблицы листа), МБ"""
+        self.footprints[name] = (before_mb, after_mb)
+
+    def summary(self):
+        """Краткая сводка для строки состояния"""
+        parts = [f"{record.name} {record.seconds:.2f} с" for record in self.stages.values()]
+        parts += [f"{name} {before:.1f} → {after:.1f} МБ" for name, (before, after) in self.footprints.items()]
+        return ", ".join(parts)
+
+    def log(self):
+        """Записывает замеры этапов в журнал (по строке JSON на этап)"""
+        setup_logging()
+        timestamp = time.strftime('%Y-%m-%dT%H:%M:%S')
+        for record in self.stages.values():
+            entry = dict(record.as_dict(), time=timestamp, run=self.label,
+                         file=os.path.basename(self.file_path) if self.file_path else None)
+            logger.info(json.dumps(entry, ensure_ascii=False))
+        for name, (before, after) in self.footprints.items():
+            entry = {'footprint': name, 'before_mb': round(before, 1), 'after_mb': round(after, 1),
+                     'time': timestamp, 'run': self.label,
+                     'file': os.path.basename(self.file_path) if self.file_path else None}
+            logger.info(json.dumps(entry, ensure_ascii=False))
+
+
+def timed(iterable, timer, name):
+    """Итерация с учетом времени получения каждого элемента в этапе name"""
+    if timer is None:
+        yield from iterable
+        return
+
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            timer.add(name, time.perf_counter() - start)
+            return
+        timer.add(name, time.perf_counter() - start, len(item) if hasattr(item, '__len__') else 1)
+        yield item
+
+
+@contextmanager
+def profiled(enabled, label='run'):
+    """Профилирование cProfile текущего потока; дамп сохраняется в папку журналов"""
+    if not enabled:
+        yield None
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        os.makedirs(log_dir(), exist_ok=True)
+        path = os.path.join(log_dir(), f"profile_{label}_{time.strftime('%Y%m%d_%H%M%S')}.prof")
+        profiler.dump_stats(path)
+        setup_logging()
+        logger.info(json.dumps({'profile': path, 'run': label}, ensure_ascii=False))
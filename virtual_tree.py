@@ -0,0 +1,134 @@
+"""Таблица Treeview, показывающая только видимые строки большого списка
+
+В Treeview всегда столько элементов, сколько строк помещается в окне; при прокрутке
+меняются только их значения. Поэтому тысячи строк отображаются без вставки
+каждой строки в таблицу, а новый список показывается мгновенно.
+"""
+import tkinter as tk
+from tkinter import ttk
+
+# Высота строки Treeview по умолчанию (пиксели), если стиль ее не задает
+DEFAULT_ROW_HEIGHT = 20
+
+
+class VirtualTree(ttk.Frame):
+    """Таблица с собственной прокруткой; строки запрашиваются функцией row(номер) -> (значения, теги)"""
+
+    def __init__(self, parent, columns, height=10, style=None):
+        super().__init__(parent)
+        options = {'style': style} if style else {}
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", height=height,
+                                 selectmode="browse", **options)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.on_scroll)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.row_count = 0
+        self.row = None
+        self.first = 0  # Номер первой видимой строки
+        self.selected = None  # Номер выбранной строки (выделение сохраняется при прокрутке)
+        self.visible = height  # Сколько строк помещается в окне
+        self.items = []  # Элементы Treeview для видимых строк
+
+        self.tree.bind("<Configure>", self.on_resize)
+        self.tree.bind("<MouseWheel>", self.on_wheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll_by(-3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll_by(3))
+        self.tree.bind("<Prior>", lambda event: self.scroll_by(-self.visible))
+        self.tree.bind("<Next>", lambda event: self.scroll_by(self.visible))
+        self.tree.bind("<Up>", self.on_key_up)
+        self.tree.bind("<Down>", self.on_key_down)
+        self.tree.bind("<<TreeviewSelect>>", self.on_select, add="+")
+
+    def heading(self, column, **options):
+        self.tree.heading(column, **options)
+
+    def column(self, column, **options):
+        self.tree.column(column, **options)
+
+    def tag_configure(self, tag, **options):
+        self.tree.tag_configure(tag, **options)
+
+    def set_rows(self, row_count, row):
+        """Новый список строк; показ начинается с первой строки"""
+        self.row_count = row_count
+        self.row = row
+        self.first = 0
+        self.selected = None
+        self.render()
+
+    def render(self):
+        """Заполняет элементы Treeview значениями видимых строк"""
+        self.first = max(0, min(self.first, self.row_count - self.visible))
+        shown = min(self.visible, self.row_count - self.first)
+        while len(self.items) < shown:
+            self.items.append(self.tree.insert("", "end"))
+        if len(self.items) > shown:
+            self.tree.delete(*self.items[shown:])
+            del self.items[shown:]
+
+        for offset, item in enumerate(self.items):
+            values, tags = self.row(self.first + offset)
+            self.tree.item(item, values=values, tags=tags)
+
+        offset = None if self.selected is None else self.selected - self.first
+        if offset is not None and 0 <= offset < shown:
+            if self.tree.selection() != (self.items[offset],):
+                self.tree.selection_set(self.items[offset])
+                self.tree.focus(self.items[offset])
+        elif self.tree.selection():
+            self.tree.selection_remove(self.tree.selection())
+
+        if self.row_count:
+            self.scrollbar.set(self.first / self.row_count, (self.first + shown) / self.row_count)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def scroll_by(self, rows):
+        self.first += rows
+        self.render()
+        return "break"
+
+    def on_scroll(self, action, amount, unit=None):
+        """Команда полосы прокрутки: ('moveto', доля) или ('scroll', число, 'units' | 'pages')"""
+        if action == 'moveto':
+            self.first = int(float(amount) * self.row_count)
+            self.render()
+        else:
+            step = self.visible if unit == 'pages' else 1
+            self.scroll_by(int(amount) * step)
+
+    def on_select(self, event):
+        selection = self.tree.selection()
+        # Снятие выделения при прокрутке не меняет выбранную строку
+        if selection and selection[0] in self.items:
+            self.selected = self.first + self.items.index(selection[0])
+
+    def on_key_up(self, event):
+        if self.items and self.tree.focus() == self.items[0] and self.first > 0:
+            if self.selected is not None:
+                self.selected -= 1
+            return self.scroll_by(-1)
+        return None
+
+    def on_key_down(self, event):
+        if self.items and self.tree.focus() == self.items[-1] and self.first + len(self.items) < self.row_count:
+            if self.selected is not None:
+                self.selected += 1
+            return self.scroll_by(1)
+        return None
+
+    def on_wheel(self, event):
+        return self.scroll_by(-3 if event.delta > 0 else 3)
+
+    def on_resize(self, event):
+        """Число видимых строк пересчитывается по высоте таблицы"""
+        row_height = ttk.Style().lookup(self.tree.cget('style') or 'Treeview', 'rowheight')
+        row_height = int(row_height or DEFAULT_ROW_HEIGHT)
+        heading = self.tree.bbox(self.items[0])[1] if self.items and self.tree.bbox(self.items[0]) \
+            else row_height
+        visible = max(1, (event.height - heading) // row_height)
+        if visible != self.visible:
+            self.visible = visible
+            if self.row is not None:
+                self.render()
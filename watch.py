@@ -0,0 +1,177 @@
+"""Инкрементальный анализ книг, в которые в течение месяца дописываются строки
+
+Накопленные по районам данные сохраняются между запусками. При изменении файла
+уже обработанные строки только сверяются по контрольным суммам блоков, а в анализ
+передаются лишь новые строки. Полный пересчет выполняется, если ранее
+обработанные строки были изменены или удалены либо изменилась ширина листа.
+Обновление можно прервать между блоками строк (cancelled); прерванное обновление
+не меняет накопленных данных.
+"""
+import hashlib
+import itertools
+import os
+
+import analysis
+import reader
+import regions
+
+# Количество строк листа в одном блоке контрольной суммы
+CHECKSUM_BLOCK_SIZE = 1000
+
+# Результат обновления
+UNCHANGED = 'unchanged'
+INCREMENTAL = 'incremental'
+FULL = 'full'
+CANCELLED = 'cancelled'
+
+
+def file_signature(file_path):
+    """Размер и время изменения файла для быстрой проверки изменений"""
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class RefreshCancelled(Exception):
+    """Обновление прервано вызовом cancelled()"""
+
+
+def check_cancelled(cancelled):
+    if cancelled is not None and cancelled():
+        raise RefreshCancelled()
+
+
+class BlockChecksums:
+    """Контрольные суммы строк листа по блокам фиксированного размера"""
+
+    def __init__(self, block_size=CHECKSUM_BLOCK_SIZE):
+        self.block_size = block_size
+        self.blocks = []  # Суммы завершенных блоков
+        self.rows = 0
+        self._current = hashlib.blake2b(digest_size=16)
+
+    def add(self, row):
+        """Добавляет строку; возвращает True, если завершился очередной блок"""
+        self._current.update(repr(row).encode())
+        self.rows += 1
+        if self.rows % self.block_size:
+            return False
+        self.blocks.append(self._current.hexdigest())
+        self._current = hashlib.blake2b(digest_size=16)
+        return True
+
+    @property
+    def tail(self):
+        """Сумма незавершенного последнего блока"""
+        return self._current.hexdigest()
+
+
+class IncrementalAnalysis:
+    """Анализ файла с сохранением накопленных данных между обновлениями"""
+
+    def __init__(self, file_path, analysis_type, districts=None,
+                 chunk_size=reader.CHUNK_SIZE, block_size=CHECKSUM_BLOCK_SIZE):
+        self.file_path = file_path
+        self.analysis_type = analysis_type
+        self.districts = regions.as_registry(districts)
+        self.chunk_size = chunk_size
+        self.block_size = block_size
+        self.engine = None
+        self.checksums = None
+        self.width = None
+        self.signature = None
+
+    @property
+    def rows_consumed(self):
+        return self.checksums.rows if self.checksums else 0
+
+    def changed(self):
+        """Изменился ли файл с момента последнего обновления"""
+        return file_signature(self.file_path) != self.signature
+
+    def results(self):
+        return self.engine.results() if self.engine else []
+
+    def institution_index(self):
+        """Указатель учреждений накопленного анализа (None для анализов без учреждений)"""
+        return analysis.institution_index(self.engine)
+
+    def refresh(self, cancelled=None):
+        """Обновляет результаты; возвращает UNCHANGED, INCREMENTAL, FULL или CANCELLED
+
+        cancelled() проверяется между блоками строк; если он вернул True, обновление
+        прерывается, а накопленные данные остаются прежними (CANCELLED).
+        """
+        signature = file_signature(self.file_path)
+        if self.engine is not None and signature == self.signature:
+            return UNCHANGED
+
+        mode = FULL
+        try:
+            if self.engine is None or not self.append_new_rows(cancelled):
+                self.recompute(cancelled)
+            else:
+                mode = INCREMENTAL
+        except RefreshCancelled:
+            return CANCELLED
+        self.signature = signature
+        return mode
+
+    def recompute(self, cancelled=None):
+        """Полный пересчет с запоминанием контрольных сумм всех строк (RefreshCancelled, если прерван)"""
+        stream = reader.SheetStream(self.file_path, self.chunk_size)
+        width = stream.declared_width
+        while True:
+            engine = analysis.create_engine(self.analysis_type, self.districts)
+            checksums = BlockChecksums(self.block_size)
+            for chunk in stream.chunks(width, self.checksummed(stream.rows(), checksums)):
+                check_cancelled(cancelled)
+                engine.update(chunk)
+
+            if stream.data_width == width:
+                break
+            # Заявленные размеры листа не совпали с данными - повторяем проход с фактической шириной
+            width = stream.data_width
+
+        self.engine, self.checksums, self.width = engine, checksums, width
+
+    @staticmethod
+    def checksummed(rows, checksums):
+        for row in rows:
+            checksums.add(row)
+            yield row
+
+    def append_new_rows(self, cancelled=None):
+        """Добавляет в анализ только новые строки; False, если нужен полный пересчет
+        (RefreshCancelled, если прерван)"""
+        stream = reader.SheetStream(self.file_path, self.chunk_size)
+        rows = stream.rows()
+        checksums = BlockChecksums(self.block_size)
+        try:
+            # Ранее обработанные строки только сверяются с сохраненными контрольными суммами
+            for row in itertools.islice(rows, self.rows_consumed):
+                if not checksums.add(row):
+                    continue
+                if checksums.blocks[-1] != self.checksums.blocks[len(checksums.blocks) - 1]:
+                    return False
+                check_cancelled(cancelled)
+            if checksums.rows != self.rows_consumed or checksums.tail != self.checksums.tail:
+                return False
+
+            # Новые строки читаются целиком до изменения накопленных данных:
+            # более широкие строки меняют выбор столбцов и для старых строк
+            new_rows = []
+            for row in rows:
+                if len(row) > self.width:
+                    return False
+                if checksums.add(row):
+                    check_cancelled(cancelled)
+                new_rows.append(row)
+        finally:
+            rows.close()
+
+        # Прочитанные новые строки добавляются в накопленные данные без остановки: прерванное
+        # добавление оставило бы их учтенными частично
+        for chunk in stream.chunks(self.width, new_rows):
+            self.engine.update(chunk)
+        self.checksums = checksums
+        return True
@@ -0,0 +1,360 @@
+"""Фоновое выполнение анализа с передачей хода работы через очередь"""
+import os
+import queue
+import threading
+
+import analysis
+import batch
+import export
+import history
+import institutions
+import reader
+import regions
+import sheets
+import timing
+import watch
+
+# Блок листа, который ядро анализа получает за раз в полном (не потоковом) анализе:
+# между блоками проверяется остановка; мелкие блоки заметно замедлили бы векторизованный разбор
+ANALYSIS_BLOCK_ROWS = 10 * reader.CHUNK_SIZE
+# Интервал проверки остановки при ожидании ответа сервиса анализа (с)
+SERVICE_POLL_SECONDS = 0.2
+
+
+class AnalysisCancelled(Exception):
+    """Анализ остановлен пользователем"""
+
+
+class AnalysisWorker(threading.Thread):
+    """Поток анализа файла. Сообщения для интерфейса помещаются в очередь events:
+
+    ('progress', текст состояния, промежуточные результаты или None)
+    ('done', результаты, ошибки по отдельным файлам)
+    ('cancelled', None)
+    ('error', текст ошибки)
+    """
+
+    def __init__(self, file_path, analysis_type, districts, streaming=False, chunk_size=reader.CHUNK_SIZE,
+                 profile=False, record_history=True):
+        super().__init__(daemon=True)
+        self.file_path = file_path
+        self.analysis_type = analysis_type
+        self.districts = regions.as_registry(districts)
+        self.streaming = streaming
+        self.chunk_size = chunk_size
+        self.events = queue.Queue()
+        self.summary = None  # Итоговое сообщение для строки состояния (если отличается от стандартного)
+        self.sheet_results = None  # Результаты по листам книги (анализ нескольких листов)
+        self.institutions = None  # Указатель учреждений для детализации по районам (InstitutionIndex)
+        self.statistics = None  # Разброс и процентили по районам
+        self.timer = timing.RunTimer(analysis_type, file_path)  # Замеры этапов запуска
+        self.profile = profile  # Сохранить профиль cProfile этого запуска
+        self.record_history = record_history  # Сохранять результаты в историю
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        """Запрашивает остановку анализа (проверяется между блоками строк)"""
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise AnalysisCancelled()
+
+    def run(self):
+        try:
+            with timing.profiled(self.profile, self.analysis_type):
+                if self.streaming and self.file_path.lower().endswith('.xlsx'):
+                    results = self.run_streaming()
+                else:
+                    results = self.run_full()
+            if self.record_history:
+                history.record_results(results, self.file_path)
+            self.events.put(('done', results, []))
+        except AnalysisCancelled:
+            self.events.put(('cancelled', None))
+        except Exception as e:
+            self.events.put(('error', str(e)))
+
+    def run_full(self):
+        """Чтение нужных анализу столбцов листа (через кэш разобранных книг) и анализ целиком"""
+        with self.timer.stage('чтение') as stage:
+            df = reader.read_sheet(self.file_path, self.analysis_type, progress=self.report_read)
+            stage.rows = len(df)
+        self.timer.add_footprint('таблица', *reader.frame_memory(df))
+        self.check_cancelled()
+
+        # Ядро получает лист блоками: между блоками проверяется остановка и сообщается ход анализа
+        with self.timer.stage('анализ', len(df)):
+            engine = analysis.create_engine(self.analysis_type, self.districts)
+            for start in range(0, len(df), ANALYSIS_BLOCK_ROWS):
+                engine.update(df.iloc[start:start + ANALYSIS_BLOCK_ROWS])
+                self.check_cancelled()
+                status = f"Анализ файла... Обработано строк: {min(start + ANALYSIS_BLOCK_ROWS, len(df))} из {len(df)}"
+                if engine.current_district:
+                    status += f", район: {engine.current_district}"
+                self.events.put(('progress', status, None))
+        del df
+        self.collect_details(engine)
+        return engine.results()
+
+    def report_read(self, rows_read):
+        """Ход чтения листа; остановка анализа прерывает чтение, не дожидаясь конца листа"""
+        self.check_cancelled()
+        self.events.put(('progress', f"Чтение файла... Прочитано строк: {rows_read}", None))
+
+    def run_streaming(self):
+        """Потоковый анализ с промежуточными результатами после каждого блока"""
+        stream = reader.stream_analysis(self.file_path, self.analysis_type, self.districts, self.chunk_size,
+                                        timer=self.timer)
+        try:
+            for rows_read, engine in stream:
+                self.check_cancelled()
+                status = f"Анализ файла... Обработано строк: {rows_read}"
+                if engine.current_district:
+                    status += f", район: {engine.current_district}"
+                self.events.put(('progress', status, engine.results()))
+        finally:
+            # Закрываем книгу сразу, не дожидаясь сборщика мусора
+            stream.close()
+        self.collect_details(engine)
+        return engine.results()
+
+    def collect_details(self, engine):
+        """Разброс по районам и указатель учреждений (строятся в фоновом потоке, а не при выборе района)"""
+        if engine is None:
+            return
+        self.statistics = engine.statistics()
+        if engine.collects_institutions:
+            with self.timer.stage('учреждения'):
+                self.institutions = engine.institution_index()
+
+
+class BatchWorker(AnalysisWorker):
+    """Поток пакетного анализа: файлы обрабатываются в пуле процессов"""
+
+    def __init__(self, file_paths, analysis_type, districts, profile=False, record_history=True):
+        super().__init__(None, analysis_type, districts, profile=profile, record_history=record_history)
+        self.file_paths = list(file_paths)
+
+    def run(self):
+        try:
+            # Чтение и анализ идут в дочерних процессах, поэтому замеряется пакет целиком
+            with timing.profiled(self.profile, 'batch'), self.timer.stage('пакет') as stage:
+                result = batch.run_batch(self.file_paths, self.analysis_type, self.districts,
+                                         progress=self.report_progress, cancelled=lambda: self.cancelled)
+                stage.rows = result.files_done
+            if self.record_history:
+                # Каждый файл пакета сохраняется в историю под своим периодом
+                for file_path, file_results in result.file_results.items():
+                    history.record_results(file_results, file_path)
+            self.check_cancelled()
+            self.events.put(('done', result.results, result.errors))
+        except AnalysisCancelled:
+            self.events.put(('cancelled', None))
+        except Exception as e:
+            self.events.put(('error', str(e)))
+
+    def report_progress(self, files_done, files_total, file_path):
+        status = f"Пакетный анализ... Обработано файлов: {files_done} из {files_total}"
+        self.events.put(('progress', status, None))
+
+
+class SheetsWorker(AnalysisWorker):
+    """Поток анализа нескольких листов книги: листы обрабатываются в пуле процессов
+
+    Результаты объединяются по районам; результаты по листам (sheet_results) доступны после завершения.
+    """
+
+    def __init__(self, file_path, analysis_type, districts, sheet_names=None, profile=False, record_history=True):
+        super().__init__(file_path, analysis_type, districts, profile=profile, record_history=record_history)
+        self.sheet_names = sheet_names  # Выбранные листы (None - все листы книги)
+
+    def run(self):
+        try:
+            with timing.profiled(self.profile, 'sheets'), self.timer.stage('листы') as stage:
+                workbook = sheets.run_sheets(self.file_path, self.analysis_type, self.districts, self.sheet_names,
+                                             progress=self.report_progress, cancelled=lambda: self.cancelled)
+                stage.rows = workbook.sheets_done
+            self.check_cancelled()
+            engine = workbook.merged_engine()
+            results = engine.results()
+            self.sheet_results = workbook.sheet_results
+            self.collect_details(engine)
+            if self.record_history:
+                history.record_results(results, self.file_path)
+            self.events.put(('done', results, workbook.errors))
+        except AnalysisCancelled:
+            self.events.put(('cancelled', None))
+        except Exception as e:
+            self.events.put(('error', str(e)))
+
+    def report_progress(self, sheets_done, sheets_total, sheet):
+        status = f"Анализ листов книги... Обработано листов: {sheets_done} из {sheets_total}"
+        self.events.put(('progress', status, None))
+
+
+class ServiceWorker(SheetsWorker):
+    """Поток ожидания результата от локального сервиса анализа (графический интерфейс как тонкий клиент)
+
+    Доступность сервиса проверяется в этом потоке; если сервис не отвечает, тот же поток
+    выполняет анализ локально (как AnalysisWorker или SheetsWorker).
+    """
+
+    def __init__(self, client, file_path, analysis_type, districts, sheet_names=None, multi_sheet=False,
+                 profile=False, record_history=True):
+        super().__init__(file_path, analysis_type, districts, sheet_names, profile=profile,
+                         record_history=record_history)
+        self.client = client
+        self.multi_sheet = multi_sheet  # Анализ листов книги (sheet_names: None - все листы)
+
+    def run(self):
+        try:
+            self.events.put(('progress', f"Подключение к сервису {self.client.url}...", None))
+            available = self.client.available()
+            self.check_cancelled()
+        except AnalysisCancelled:
+            self.events.put(('cancelled', None))
+            return
+        if not available:
+            self.events.put(('progress', f"Сервис {self.client.url} недоступен, анализ выполняется локально...",
+                             None))
+            if self.multi_sheet:
+                SheetsWorker.run(self)
+            else:
+                AnalysisWorker.run(self)
+            return
+
+        try:
+            self.events.put(('progress', f"Анализ файла в сервисе {self.client.url}...", None))
+            with self.timer.stage('сервис'):
+                response = self.wait_for_service()
+            self.sheet_results = response['sheet_results']
+            self.statistics = response['statistics']
+            records = response.get('institutions')
+            if records is not None:
+                with self.timer.stage('учреждения'):
+                    self.institutions = institutions.InstitutionIndex(records['names'], records['districts'],
+                                                                      records['values'], self.districts.names)
+            # История сохраняется самим сервисом
+            self.events.put(('done', response['results'], [tuple(error) for error in response['errors']]))
+        except AnalysisCancelled:
+            self.events.put(('cancelled', None))
+        except Exception as e:
+            self.events.put(('error', str(e)))
+
+    def wait_for_service(self):
+        """Ответ сервиса на задание анализа
+
+        Запрос выполняется во вспомогательном потоке, а ожидание прерывается остановкой
+        анализа: задание в сервисе дорабатывает, его ответ отбрасывается.
+        """
+        sheets = (self.sheet_names or 'all') if self.multi_sheet else None
+        replies = queue.Queue(maxsize=1)
+
+        def request():
+            try:
+                replies.put((self.client.analyze(self.file_path, self.analysis_type, sheets, self.record_history),
+                             None))
+            except Exception as e:
+                replies.put((None, e))
+
+        threading.Thread(target=request, daemon=True).start()
+        while True:
+            try:
+                response, error = replies.get(timeout=SERVICE_POLL_SECONDS)
+                break
+            except queue.Empty:
+                self.check_cancelled()
+        self.check_cancelled()
+        if error is not None:
+            raise error
+        return response
+
+
+class IncrementalWorker(AnalysisWorker):
+    """Поток обновления результатов по изменившемуся файлу (режим наблюдения)"""
+
+    def __init__(self, incremental):
+        super().__init__(incremental.file_path, incremental.analysis_type, incremental.districts)
+        self.incremental = incremental
+
+    def run(self):
+        try:
+            rows_before = self.incremental.rows_consumed
+            with self.timer.stage('обновление') as stage:
+                mode = self.incremental.refresh(cancelled=lambda: self.cancelled)
+                self.check_cancelled()
+                stage.rows = self.incremental.rows_consumed - rows_before if mode == watch.INCREMENTAL \
+                    else self.incremental.rows_consumed
+            if mode == watch.INCREMENTAL:
+                added = self.incremental.rows_consumed - rows_before
+                self.summary = f"Файл обновлен: добавлено строк {added}"
+            elif mode == watch.FULL and rows_before:
+                self.summary = "Файл изменен: выполнен полный пересчет"
+            results = self.incremental.results()
+            self.collect_details(self.incremental.engine)
+            if self.record_history and mode != watch.UNCHANGED:
+                history.record_results(results, self.file_path)
+            self.events.put(('done', results, []))
+        except AnalysisCancelled:
+            self.events.put(('cancelled', None))
+        except Exception as e:
+            self.events.put(('error', str(e)))
+
+
+class ChartWorker(threading.Thread):
+    """Поток построения отчета PDF. Сообщения: ('done', отчет построен) или ('error', текст ошибки)
+
+    Если результаты не изменились с прошлого сохранения в тот же файл (last_export),
+    отчет не перестраивается.
+    """
+
+    def __init__(self, results, analysis_type, pdf_path, last_export=None, timer=None):
+        super().__init__(daemon=True)
+        self.results = results
+        self.analysis_type = analysis_type
+        self.pdf_path = pdf_path
+        self.last_export = last_export
+        self.export_key = None  # (путь, отпечаток результатов) сохраненного отчета
+        self.timer = timer or timing.RunTimer('chart', pdf_path)
+        self.events = queue.Queue()
+
+    def run(self):
+        try:
+            export_key = (self.pdf_path, export.results_fingerprint(self.results, self.analysis_type))
+            if export_key == self.last_export and os.path.exists(self.pdf_path):
+                self.export_key = export_key
+                self.events.put(('done', False))
+                return
+
+            with self.timer.stage('диаграмма', len(self.results)):
+                # matplotlib загружается только при сохранении диаграммы, в этом же потоке
+                import charts
+                charts.create_chart_pdf(self.results, self.analysis_type, self.pdf_path)
+            self.export_key = export_key
+            self.events.put(('done', True))
+        except Exception as e:
+            self.events.put(('error', str(e)))
+
+
+class ExportWorker(threading.Thread):
+    """Поток сохранения таблиц результатов. Сообщения: ('done', сохраненные файлы) или ('error', текст ошибки)"""
+
+    def __init__(self, tables, file_path, timer=None):
+        super().__init__(daemon=True)
+        self.tables = tables
+        self.file_path = file_path
+        self.timer = timer or timing.RunTimer('save', file_path)
+        self.events = queue.Queue()
+
+    def run(self):
+        try:
+            with self.timer.stage('сохранение', sum(len(table) for _, table in self.tables)):
+                paths = export.export_tables(self.tables, self.file_path)
+            self.events.put(('done', paths))
+        except Exception as e:
+            self.events.put(('error', str(e)))